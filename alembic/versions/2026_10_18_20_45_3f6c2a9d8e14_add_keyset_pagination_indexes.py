@@ -0,0 +1,33 @@
+# type: ignore
+"""add keyset pagination indexes
+
+Revision ID: 3f6c2a9d8e14
+Revises: b1a559c9fdf3
+Create Date: 2026-10-18 20:45:12.418203+00:00
+
+"""
+# pylint: skip-file
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "3f6c2a9d8e14"
+down_revision = "b1a559c9fdf3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_users_created_at_id", "users", ["created_at", "id"], unique=False
+    )
+    op.create_index(
+        "ix_posts_created_at_id", "posts", ["created_at", "id"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index("ix_posts_created_at_id", table_name="posts")
+    op.drop_index("ix_users_created_at_id", table_name="users")
@@ -0,0 +1,33 @@
+# type: ignore
+"""unique user email and sms
+
+Revision ID: 8d41b7e2c5a0
+Revises: 3f6c2a9d8e14
+Create Date: 2026-10-18 21:30:27.915604+00:00
+
+Fails if users already holds duplicates, find them with:
+    SELECT email, count(*) FROM users GROUP BY email HAVING count(*) > 1;
+    SELECT sms, count(*) FROM users GROUP BY sms HAVING count(*) > 1;
+
+"""
+# pylint: skip-file
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "8d41b7e2c5a0"
+down_revision = "3f6c2a9d8e14"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("ix_users_sms", "users", ["sms"], unique=True)
+
+
+def downgrade():
+    op.drop_index("ix_users_sms", table_name="users")
+    op.drop_index("ix_users_email", table_name="users")
@@ -0,0 +1,40 @@
+# type: ignore
+"""add access path indexes
+
+Revision ID: c72e9f1a4b36
+Revises: 8d41b7e2c5a0
+Create Date: 2026-10-18 22:10:44.270519+00:00
+
+"""
+
+# pylint: skip-file
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "c72e9f1a4b36"
+down_revision = "8d41b7e2c5a0"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_users_and_posts_post_id_user_id",
+        "users_and_posts",
+        ["post_id", "user_id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_users_last_updated_id", "users", ["last_updated", "id"], unique=False
+    )
+    op.create_index(
+        "ix_posts_last_updated_id", "posts", ["last_updated", "id"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index("ix_posts_last_updated_id", table_name="posts")
+    op.drop_index("ix_users_last_updated_id", table_name="users")
+    op.drop_index("ix_users_and_posts_post_id_user_id", table_name="users_and_posts")
@@ -0,0 +1,40 @@
+# type: ignore
+"""created_at not null
+
+Revision ID: 0662f744f809
+Revises: c72e9f1a4b36
+Create Date: 2026-10-18 23:40:12.508311+00:00
+
+Keyset pagination orders by (created_at, id), rows with a NULL created_at
+dropped out of every page. They're backfilled with their last_updated, or the
+migration's time when that's NULL too.
+
+"""
+# pylint: skip-file
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0662f744f809"
+down_revision = "c72e9f1a4b36"
+branch_labels = None
+depends_on = None
+
+TABLES = ("users", "posts")
+
+
+def upgrade():
+    for table in TABLES:
+        op.execute(
+            f"UPDATE {table} "
+            "SET created_at = COALESCE(last_updated, TIMEZONE('utc', CURRENT_TIMESTAMP)) "
+            "WHERE created_at IS NULL"
+        )
+        op.alter_column(table, "created_at", existing_nullable=True, nullable=False)
+
+
+def downgrade():
+    for table in TABLES:
+        op.alter_column(table, "created_at", existing_nullable=False, nullable=True)
@@ -0,0 +1,41 @@
+# type: ignore
+"""statement time server defaults
+
+Revision ID: 67732502f344
+Revises: 0662f744f809
+Create Date: 2026-10-18 23:55:03.112874+00:00
+
+utcnow() compiles to clock_timestamp(), the time of the statement, so two
+writes in one transaction get different last_updated (the row version behind
+ETags). Brings the server defaults created by earlier migrations, still on the
+transaction's CURRENT_TIMESTAMP, in line with it.
+
+"""
+# pylint: skip-file
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "67732502f344"
+down_revision = "0662f744f809"
+branch_labels = None
+depends_on = None
+
+TABLES = ("users", "posts")
+COLUMNS = ("created_at", "last_updated")
+
+
+def set_server_default(default: str) -> None:
+    for table in TABLES:
+        for column in COLUMNS:
+            op.alter_column(table, column, server_default=sa.text(default))
+
+
+def upgrade():
+    set_server_default("TIMEZONE('utc', clock_timestamp())")
+
+
+def downgrade():
+    set_server_default("TIMEZONE('utc', CURRENT_TIMESTAMP)")
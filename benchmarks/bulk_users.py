@@ -0,0 +1,92 @@
+"""
+Rows per second of POST /users/bulk's upsert against create_or_update.
+
+Upserts N users twice, once as inserts and once as updates of the same users,
+first one create_or_update call (and commit) per user, then through
+bulk_create_or_update in a single transaction. Rows are tagged with a run id
+and removed afterwards.
+
+    python -m benchmarks.bulk_users --database-url postgresql://localhost/test_users_api
+    python -m benchmarks.bulk_users --database-url sqlite:////tmp/users_api_bench.db
+"""
+
+import argparse
+import time
+import uuid
+from typing import Callable, List
+
+from sqlalchemy import create_engine, delete
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from users_api import settings
+from users_api.managers.users import users_manager
+from users_api.models.base import Base
+from users_api.models.orm.users import UsersORM
+from users_api.schemas.users import CreateUsersRequest
+
+
+def make_items(run_id: str, count: int, sms_suffix: str) -> List[CreateUsersRequest]:
+    return [
+        CreateUsersRequest(
+            email=f"bench-{run_id}-{i}@example.com", sms=f"{run_id}-{i}-{sms_suffix}"
+        )
+        for i in range(count)
+    ]
+
+
+def one_by_one(db_session: Session, items: List[CreateUsersRequest]) -> None:
+    for item in items:
+        users_manager.create_or_update(db_session, obj_in=item)
+
+
+def bulk(db_session: Session, items: List[CreateUsersRequest]) -> None:
+    users_manager.bulk_create_or_update(
+        db_session, items, batch_size=settings.BULK_BATCH_SIZE
+    )
+
+
+def rows_per_second(
+    engine: Engine,
+    upsert: Callable[[Session, List[CreateUsersRequest]], None],
+    items: List[CreateUsersRequest],
+) -> float:
+    with Session(bind=engine, expire_on_commit=False) as db_session:
+        started = time.perf_counter()
+        upsert(db_session, items)
+        return len(items) / (time.perf_counter() - started)
+
+
+def cleanup(engine: Engine, run_id: str) -> None:
+    with Session(bind=engine) as db_session:
+        db_session.execute(
+            delete(UsersORM).where(UsersORM.email.like(f"bench-{run_id}-%"))
+        )
+        db_session.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    parser.add_argument("--rows", type=int, default=5000)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(bind=engine)
+
+    print(f"{'method':<12} {'phase':<7} {'rows/s':>10}")
+    for name, upsert in (("one-by-one", one_by_one), ("bulk", bulk)):
+        run_id = uuid.uuid4().hex[:8]
+        try:
+            for phase, sms_suffix in (("insert", "a"), ("update", "b")):
+                items = make_items(run_id, args.rows, sms_suffix)
+                rps = rows_per_second(engine, upsert, items)
+                print(f"{name:<12} {phase:<7} {rps:>10.1f}")
+        finally:
+            cleanup(engine, run_id)
+
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
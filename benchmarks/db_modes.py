@@ -0,0 +1,125 @@
+"""
+Concurrent-request throughput of the sync and async database modes.
+
+Seeds a handful of users, then fires GET /users/{id} at an in-process app
+with N requests in flight at once. In sync mode every handler blocks the event
+loop for each round trip, so throughput stays flat as concurrency grows; in
+async mode it should scale until the pool or the database saturates. The gap
+only shows when round trips are slow enough to matter, so point this at a
+database over the network rather than a local socket.
+
+    python -m benchmarks.db_modes --database-url postgresql://localhost/test_users_api
+    python -m benchmarks.db_modes --database-url sqlite:////tmp/users_api_bench.db
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from typing import List
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import Session
+
+from users_api import settings
+from users_api.api.async_users import async_users_router
+from users_api.api.users import users_router
+from users_api.db.connection import (
+    close_async_db_conn,
+    set_async_db_conn,
+    set_db_conn,
+    to_async_url,
+)
+from users_api.models.base import Base
+from users_api.models.orm.users import UsersORM
+
+
+def seed_users(database_url: str, count: int) -> List[uuid.UUID]:
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    user_ids = [uuid.uuid4() for _ in range(count)]
+    with Session(bind=engine) as db_session:
+        db_session.add_all(
+            UsersORM(id=user_id, email=f"bench-{user_id}@example.com")
+            for user_id in user_ids
+        )
+        db_session.commit()
+    engine.dispose()
+    return user_ids
+
+
+async def run_load(
+    app: FastAPI, user_ids: List[uuid.UUID], requests: int, concurrency: int
+) -> float:
+    """Returns requests per second"""
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+
+        async def one(i: int) -> None:
+            async with semaphore:
+                response = await client.get(f"/users/{user_ids[i % len(user_ids)]}")
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        return requests / (time.perf_counter() - started)
+
+
+async def bench_mode(
+    mode: str,
+    database_url: str,
+    user_ids: List[uuid.UUID],
+    requests: int,
+    concurrency: int,
+) -> float:
+    app = FastAPI()
+    if mode == "async":
+        engine = create_async_engine(
+            to_async_url(database_url), pool_size=concurrency, max_overflow=0
+        )
+        set_async_db_conn(engine)
+        app.include_router(async_users_router, prefix="/users")
+        try:
+            return await run_load(app, user_ids, requests, concurrency)
+        finally:
+            await close_async_db_conn()
+
+    sync_engine = create_engine(database_url, pool_size=concurrency, max_overflow=0)
+    set_db_conn(sync_engine)
+    app.include_router(users_router, prefix="/users")
+    try:
+        return await run_load(app, user_ids, requests, concurrency)
+    finally:
+        sync_engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+
+    user_ids = seed_users(args.database_url, args.users)
+
+    print(f"{'mode':<6} {'concurrency':>11} {'req/s':>10}")
+    for concurrency in args.concurrency:
+        for mode in ("sync", "async"):
+            rps = asyncio.run(
+                bench_mode(
+                    mode, args.database_url, user_ids, args.requests, concurrency
+                )
+            )
+            print(f"{mode:<6} {concurrency:>11} {rps:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+First-request latency of a fresh worker, with and without the startup
+warm-up (users_api.warmup).
+
+Every trial starts a new process, since mapper configuration and compiled
+statement caches live for the whole process, builds the app, runs its
+startup and, when warming up, waits for /health to report ready. It then
+times the first and second request to each endpoint. Startup time is
+reported separately: warm-up moves cost out of the first requests, it
+doesn't make it go away.
+
+    python -m benchmarks.first_request --database-url postgresql://localhost/test_users_api
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from typing import Dict, List
+
+ENDPOINTS = [
+    "/users/?limit=10",
+    f"/users/{uuid.UUID(int=0)}",
+    "/posts/?limit=10",
+    f"/posts/{uuid.UUID(int=0)}",
+]
+
+
+def child() -> None:
+    """One fresh worker, prints its timings as JSON"""
+    # pylint: disable=import-outside-toplevel
+    from fastapi.testclient import TestClient
+
+    from users_api.app import app
+
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    with TestClient(app) as client:
+        while client.get("/health").status_code != 200:
+            time.sleep(0.001)
+        timings["ready"] = time.perf_counter() - started
+        for attempt in ("first", "second"):
+            for endpoint in ENDPOINTS:
+                request_started = time.perf_counter()
+                client.get(endpoint)
+                timings[f"{attempt} {endpoint}"] = time.perf_counter() - request_started
+    print(json.dumps(timings))
+
+
+def run_trial(database_url: str, warm_up: bool) -> Dict[str, float]:
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "WARMUP_ENABLED": "true" if warm_up else "false",
+    }
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.first_request", "--child"],
+        env=env,
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    results: Dict[bool, List[Dict[str, float]]] = {
+        warm_up: [run_trial(args.database_url, warm_up) for _ in range(args.trials)]
+        for warm_up in (False, True)
+    }
+    print(f"median of {args.trials} fresh workers, ms")
+    print(f"{'':<52} {'cold':>8} {'warm':>8}")
+    for key in results[False][0]:
+        cold, warm = (
+            statistics.median(trial[key] for trial in results[warm_up]) * 1000
+            for warm_up in (False, True)
+        )
+        print(f"{key:<52} {cold:>8.1f} {warm:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Cost of one log call on the calling (request) thread.
+
+Logs N records through a logger with each handler setup and times the
+calls alone:
+
+- stream: a StreamHandler formatting text and writing on the caller's
+  thread, as UsersLogger used to
+- stream-json: the same with the JsonFormatter
+- queue: RequestQueueHandler, the JSON formatting and writing happen on the
+  QueueListener thread, which is drained before the next run
+- queue-debug: logger.debug() through the queue with LOG_DEBUG_SAMPLE_RATE
+  sampling, what high-volume debug logs cost
+
+Output goes to /dev/null. --write-latency-us makes every write sleep,
+like a slow pipe or a full terminal, which the stream handlers pay on the
+request thread and the queue doesn't.
+
+    python -m benchmarks.log_calls --records 100000
+    python -m benchmarks.log_calls --records 20000 --write-latency-us 20
+"""
+
+import argparse
+import logging
+import os
+import queue
+import time
+from logging.handlers import QueueListener
+from typing import IO, Callable, Optional, Tuple
+
+from users_api import settings
+from users_api.logger import DebugSampler, JsonFormatter, RequestQueueHandler
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class SlowOutput:
+    """A stream whose writes take `latency` seconds"""
+
+    def __init__(self, output: IO[str], latency: float) -> None:
+        self.output = output
+        self.latency = latency
+
+    def write(self, text: str) -> int:
+        time.sleep(self.latency)
+        return self.output.write(text)
+
+    def flush(self) -> None:
+        self.output.flush()
+
+
+def stream(output: IO[str], formatter: logging.Formatter) -> logging.Handler:
+    handler = logging.StreamHandler(output)
+    handler.setFormatter(formatter)
+    return handler
+
+
+def queued(
+    output: IO[str], sample_rate: float = 1.0
+) -> Tuple[logging.Handler, QueueListener]:
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue()
+    handler = RequestQueueHandler(log_queue)
+    handler.addFilter(DebugSampler(sample_rate))
+    return handler, QueueListener(log_queue, stream(output, JsonFormatter()))
+
+
+def info(logger: logging.Logger, i: int) -> None:
+    logger.info("Upserted user %s", i, extra={"batch": i // 100})
+
+
+def debug(logger: logging.Logger, i: int) -> None:
+    logger.debug("Upserted user %s", i)
+
+
+def nanoseconds_per_call(
+    handler: logging.Handler,
+    call: Callable[[logging.Logger, int], None],
+    records: int,
+    listener: Optional[QueueListener] = None,
+) -> float:
+    """Time spent in the calls only, a listener is drained afterwards"""
+    logger = logging.getLogger(f"benchmarks.log_calls.{id(handler)}")
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    logger.addHandler(handler)
+    if listener:
+        listener.start()
+    try:
+        started = time.perf_counter()
+        for i in range(records):
+            call(logger, i)
+        elapsed = time.perf_counter() - started
+    finally:
+        if listener:
+            listener.stop()
+        logger.removeHandler(handler)
+    return elapsed / records * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--write-latency-us", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with open(os.devnull, "w", encoding="utf-8") as null:
+        devnull: IO[str] = null
+        if args.write_latency_us:
+            devnull = SlowOutput(null, args.write_latency_us / 1e6)  # type: ignore
+        runs = {
+            "stream": (stream(devnull, logging.Formatter(TEXT_FORMAT)), None, info),
+            "stream-json": (stream(devnull, JsonFormatter()), None, info),
+            "queue": (*queued(devnull), info),
+            "queue-debug": (
+                *queued(devnull, settings.LOG_DEBUG_SAMPLE_RATE),
+                debug,
+            ),
+        }
+        print(f"{'handler':<12} {'ns/call':>10}")
+        for name, (handler, listener, call) in runs.items():
+            cost = nanoseconds_per_call(handler, call, args.records, listener)
+            print(f"{name:<12} {cost:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
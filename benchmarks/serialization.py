@@ -0,0 +1,159 @@
+"""
+Per-row CPU cost of serializing the list endpoints' responses.
+
+Builds N in-memory users (or posts with their user) and times turning them
+into response bytes three ways:
+
+- per-row: one model_validate per row, then FastAPI's response_model
+  validation and JSONResponse, as the routes used to
+- type-adapter: one TypeAdapter call for the list, one model_dump_json
+- rows: plain dicts of the rows rendered by orjson (RowsResponse), what the
+  routes do now
+
+No database is involved, this is the serialization alone.
+
+    python -m benchmarks.serialization --rows 1000 10000
+"""
+
+import argparse
+import asyncio
+import datetime
+import time
+import uuid
+from typing import Any, Callable, Dict, List
+
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from users_api.api.responses import RowsResponse
+from users_api.models.orm.posts import PostsORM
+from users_api.models.orm.users import UsersORM
+from users_api.models.users import User
+from users_api.schemas.helpers import (
+    post_response,
+    posts_page,
+    posts_payload,
+    users_page,
+    users_payload,
+)
+from users_api.schemas.posts import PostsResponse
+from users_api.schemas.users import UsersResponse
+
+USERS_FIELD = create_model_field(name="Response_get_users", type_=UsersResponse)
+POSTS_FIELD = create_model_field(name="Response_get_posts", type_=PostsResponse)
+
+
+def make_users(count: int) -> List[UsersORM]:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return [
+        UsersORM(
+            id=uuid.uuid4(),
+            username=f"user-{i}",
+            name=f"User {i}",
+            email=f"user-{i}@example.com",
+            sms=f"555{i:07d}",
+            created_at=now,
+            last_updated=now,
+        )
+        for i in range(count)
+    ]
+
+
+def make_posts(count: int) -> List[PostsORM]:
+    return [
+        PostsORM(
+            id=uuid.uuid4(),
+            title=f"Post {i}",
+            description="A description",
+            content="Some content " * 10,
+            created_at=user.created_at,
+            last_updated=user.last_updated,
+            users=[user],
+        )
+        for i, user in enumerate(make_users(count))
+    ]
+
+
+def through_response_model(field: Any, content: Any) -> bytes:
+    validated = asyncio.run(serialize_response(field=field, response_content=content))
+    return JSONResponse(validated).body
+
+
+def users_per_row(users: List[UsersORM]) -> bytes:
+    content = UsersResponse(users=[User.model_validate(user) for user in users])
+    return through_response_model(USERS_FIELD, content)
+
+
+def users_type_adapter(users: List[UsersORM]) -> bytes:
+    content = UsersResponse(users=users_payload(users))
+    return Response(content.model_dump_json()).body
+
+
+def users_rows(users: List[UsersORM]) -> bytes:
+    return RowsResponse(users_page(users, None)).body
+
+
+def posts_per_row(posts: List[PostsORM]) -> bytes:
+    content = PostsResponse(posts=[post_response(post) for post in posts])
+    return through_response_model(POSTS_FIELD, content)
+
+
+def posts_type_adapter(posts: List[PostsORM]) -> bytes:
+    content = PostsResponse(posts=posts_payload(posts))
+    return Response(content.model_dump_json()).body
+
+
+def posts_rows(posts: List[PostsORM]) -> bytes:
+    return RowsResponse(posts_page(posts, None)).body
+
+
+SERIALIZERS: Dict[str, Dict[str, Callable[[List[Any]], bytes]]] = {
+    "users": {
+        "per-row": users_per_row,
+        "type-adapter": users_type_adapter,
+        "rows": users_rows,
+    },
+    "posts": {
+        "per-row": posts_per_row,
+        "type-adapter": posts_type_adapter,
+        "rows": posts_rows,
+    },
+}
+FIXTURES = {"users": make_users, "posts": make_posts}
+
+
+def microseconds_per_row(
+    serialize: Callable[[List[Any]], bytes], items: List[Any], repeat: int
+) -> float:
+    """Best of `repeat` runs, which is the least disturbed by the rest of the box"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        serialize(items)
+        best = min(best, time.perf_counter() - started)
+    return best / len(items) * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'payload':<8} {'rows':>6} {'method':<13} {'us/row':>8} {'speedup':>8}")
+    for payload, serializers in SERIALIZERS.items():
+        for rows in args.rows:
+            items = FIXTURES[payload](rows)
+            baseline = None
+            for name, serialize in serializers.items():
+                cost = microseconds_per_row(serialize, items, args.repeat)
+                baseline = baseline or cost
+                print(
+                    f"{payload:<8} {rows:>6} {name:<13} {cost:>8.2f} "
+                    f"{baseline / cost:>7.1f}x"
+                )
+
+
+if __name__ == "__main__":
+    main()
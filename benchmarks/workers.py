@@ -0,0 +1,127 @@
+"""
+Throughput of `python -m users_api.server` as its worker count grows.
+
+For each worker count, starts the server, waits for it to report ready,
+then has --clients load generator processes (each with --concurrency
+requests in flight) fire GET /users/{id} at seeded users for --seconds.
+Scaling should be close to linear up to the number of CPUs, as long as the
+load generators have CPUs of their own and the database keeps up. On a
+machine with fewer cores than workers plus clients the numbers only show
+the contention.
+
+    python -m benchmarks.workers --database-url postgresql://localhost/test_users_api --workers 1 2 4
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from typing import List
+
+import httpx
+
+from benchmarks.db_modes import seed_users
+
+
+async def generate_load(
+    url: str, user_ids: List[uuid.UUID], concurrency: int, seconds: float
+) -> int:
+    """Requests completed in `seconds`"""
+    deadline = time.perf_counter() + seconds
+    completed = 0
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal completed
+        while time.perf_counter() < deadline:
+            response = await client.get(f"{url}/users/{random.choice(user_ids)}")
+            response.raise_for_status()
+            completed += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return completed
+
+
+def load_process(
+    url: str, user_ids: List[uuid.UUID], concurrency: int, seconds: float
+) -> int:
+    return asyncio.run(generate_load(url, user_ids, concurrency, seconds))
+
+
+def wait_until_ready(url: str, workers: int, timeout: float = 60) -> None:
+    """Until /health is 200 on enough fresh connections to reach every worker"""
+    deadline = time.monotonic() + timeout
+    ready = 0
+    while ready < workers * 4:
+        if time.monotonic() > deadline:
+            raise TimeoutError("The server never reported ready")
+        try:
+            ok = httpx.get(f"{url}/health").status_code == 200
+        except httpx.TransportError:
+            ok = False
+        ready = ready + 1 if ok else 0
+        if not ok:
+            time.sleep(0.1)
+
+
+def measure(args: argparse.Namespace, workers: int, user_ids: List[uuid.UUID]) -> float:
+    """Requests per second"""
+    url = f"http://127.0.0.1:{args.port}"
+    env = {**os.environ, "DATABASE_URL": args.database_url, "LOG_LEVEL": "WARNING"}
+    server = subprocess.Popen(  # pylint: disable=consider-using-with
+        [
+            sys.executable,
+            "-m",
+            "users_api.server",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(args.port),
+            "--workers",
+            str(workers),
+        ],
+        env=env,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(url, workers)
+        with multiprocessing.Pool(args.clients) as pool:
+            counts = pool.starmap(
+                load_process,
+                [(url, user_ids, args.concurrency, args.seconds)] * args.clients,
+            )
+        return sum(counts) / args.seconds
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--port", type=int, default=3099)
+    args = parser.parse_args()
+
+    user_ids = seed_users(args.database_url, args.users)
+    print(f"{os.cpu_count()} CPUs, {args.clients} load generator processes")
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8}")
+    baseline = None
+    for workers in args.workers:
+        throughput = measure(args, workers, user_ids)
+        baseline = baseline or throughput
+        print(f"{workers:>8} {throughput:>10.0f} {throughput / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
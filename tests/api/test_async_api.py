@@ -0,0 +1,194 @@
+import asyncio
+import json
+
+import httpx
+from fastapi.testclient import TestClient
+
+from users_api.cache.singleflight import async_flights
+from users_api.cache.store import get_cache
+
+TEST_AUTH_HEADERS = {"Authorization": "Bearer test_token"}
+
+
+def create_user(async_client: TestClient, email: str, sms: str) -> dict:
+    response = async_client.post(
+        "/users/", headers=TEST_AUTH_HEADERS, json={"email": email, "sms": sms}
+    )
+    assert response.status_code == 200
+    return response.json()["users"][0]
+
+
+def test_async_post_and_get_user(async_client: TestClient) -> None:
+    user = create_user(async_client, "async@example.com", "5550000001")
+
+    response = async_client.get(f"/users/{user['id']}", headers=TEST_AUTH_HEADERS)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["users"][0]["email"] == "async@example.com"
+    assert data["users"][0]["created_at"] is not None
+
+
+def test_async_post_user_updates_existing(async_client: TestClient) -> None:
+    user = create_user(async_client, "async-update@example.com", "5550000002")
+    updated = create_user(async_client, "async-update@example.com", "5550000003")
+
+    assert updated["id"] == user["id"]
+    assert updated["sms"] == "5550000003"
+
+
+def test_async_post_user_matches_on_sms(async_client: TestClient) -> None:
+    user = create_user(async_client, "async-sms@example.com", "5550000005")
+    updated = create_user(async_client, "async-sms-new@example.com", "5550000005")
+
+    assert updated["id"] == user["id"]
+    assert updated["email"] == "async-sms-new@example.com"
+
+
+def test_async_post_user_rejects_an_email_and_sms_of_different_users(
+    async_client: TestClient,
+) -> None:
+    create_user(async_client, "async-holder-a@example.com", "5550000006")
+    create_user(async_client, "async-holder-b@example.com", "5550000007")
+
+    response = async_client.post(
+        "/users/",
+        headers=TEST_AUTH_HEADERS,
+        json={"email": "async-holder-a@example.com", "sms": "5550000007"},
+    )
+    assert response.status_code == 409
+
+
+def test_async_get_users(async_client: TestClient) -> None:
+    create_user(async_client, "async-list@example.com", "5550000004")
+
+    response = async_client.get("/users/", headers=TEST_AUTH_HEADERS)
+    assert response.status_code == 200
+    emails = [user["email"] for user in response.json()["users"]]
+    assert "async-list@example.com" in emails
+
+
+def test_async_delete_user(async_client: TestClient) -> None:
+    user = create_user(async_client, "async-delete@example.com", "5550000005")
+
+    response = async_client.delete(f"/users/{user['id']}", headers=TEST_AUTH_HEADERS)
+    assert response.status_code == 200
+    assert response.json()["status"] == f"Successfully deleted user: {user['id']}"
+
+
+def test_async_post_lifecycle(async_client: TestClient) -> None:
+    user = create_user(async_client, "async-posts@example.com", "5550000006")
+
+    request_body = {
+        "title": "Async Post",
+        "description": "A description for the new post",
+        "content": "This is the content of the new post",
+        "user_id": user["id"],
+    }
+    response = async_client.post(
+        "/posts/", headers=TEST_AUTH_HEADERS, json=request_body
+    )
+    assert response.status_code == 200
+    post = response.json()
+    assert post["user"]["id"] == user["id"]
+    assert post["description"] == request_body["description"]
+
+    response = async_client.get(f"/posts/{post['id']}", headers=TEST_AUTH_HEADERS)
+    assert response.status_code == 200
+    assert response.json()["title"] == "Async Post"
+
+    response = async_client.put(
+        f"/posts/{post['id']}",
+        headers=TEST_AUTH_HEADERS,
+        json={"title": "Updated Async Post", "user_id": user["id"]},
+    )
+    assert response.status_code == 200
+    assert response.json()["title"] == "Updated Async Post"
+
+    response = async_client.get("/posts/", headers=TEST_AUTH_HEADERS)
+    assert response.status_code == 200
+    assert any(p["id"] == post["id"] for p in response.json()["posts"])
+
+    response = async_client.delete(f"/posts/{post['id']}", headers=TEST_AUTH_HEADERS)
+    assert response.status_code == 204
+
+    response = async_client.get(f"/posts/{post['id']}", headers=TEST_AUTH_HEADERS)
+    assert response.status_code == 404
+
+
+def test_async_export_users(async_client: TestClient) -> None:
+    user = create_user(async_client, "async-export@example.com", "5550000007")
+
+    response = async_client.get(
+        "/users/export", headers={**TEST_AUTH_HEADERS, "Accept-Encoding": "gzip"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-encoding"] == "gzip"
+    exported_ids = [json.loads(line)["id"] for line in response.text.splitlines()]
+    assert user["id"] in exported_ids
+
+
+def test_async_conditional_gets(async_client: TestClient) -> None:
+    user = create_user(async_client, "async-etag@example.com", "5550000009")
+    post = async_client.post(
+        "/posts/",
+        headers=TEST_AUTH_HEADERS,
+        json={
+            "title": "Async ETag Post",
+            "description": "A description for the new post",
+            "content": "This is the content of the new post",
+            "user_id": user["id"],
+        },
+    ).json()
+
+    for path in [f"/users/{user['id']}", f"/posts/{post['id']}", "/users/", "/posts/"]:
+        etag = async_client.get(path, headers=TEST_AUTH_HEADERS).headers["etag"]
+        # A cache miss is answered from the versions query
+        get_cache().clear()
+        response = async_client.get(
+            path, headers={**TEST_AUTH_HEADERS, "If-None-Match": etag}
+        )
+        assert response.status_code == 304, path
+
+
+def test_async_sparse_fieldsets(async_client: TestClient) -> None:
+    user = create_user(async_client, "async-fields@example.com", "5550000010")
+    async_client.post(
+        "/posts/",
+        headers=TEST_AUTH_HEADERS,
+        json={
+            "title": "Async Sparse Post",
+            "description": "A description for the new post",
+            "content": "This is the content of the new post",
+            "user_id": user["id"],
+        },
+    )
+
+    response = async_client.get("/users/?fields=sms", headers=TEST_AUTH_HEADERS)
+    assert {"sms": "5550000010"} in response.json()["users"]
+
+    response = async_client.get("/posts/?fields=title,user", headers=TEST_AUTH_HEADERS)
+    posts = response.json()["posts"]
+    assert {"title": "Async Sparse Post", "user": user} in posts
+
+    response = async_client.get("/posts/?fields=nope", headers=TEST_AUTH_HEADERS)
+    assert response.status_code == 400
+
+
+def test_async_concurrent_gets_share_one_load(async_client: TestClient) -> None:
+    user = create_user(async_client, "async-flight@example.com", "5550000042")
+    get_cache().clear()
+    shared = async_flights.stats.shared
+
+    async def get_concurrently():
+        transport = httpx.ASGITransport(app=async_client.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            return await asyncio.gather(
+                *(client.get(f"/users/{user['id']}") for _ in range(10))
+            )
+
+    responses = asyncio.run(get_concurrently())
+    assert [response.status_code for response in responses] == [200] * 10
+    assert async_flights.stats.shared - shared == 9
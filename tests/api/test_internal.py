@@ -0,0 +1,35 @@
+from typing import Dict
+
+import pytest
+from fastapi.testclient import TestClient
+
+from users_api import settings
+
+INTERNAL_PATHS = [
+    "/internal/db-executor",
+    "/internal/pool",
+    "/internal/compiled-cache",
+    "/internal/cache",
+    "/internal/slow-queries",
+]
+
+
+@pytest.mark.parametrize("path", INTERNAL_PATHS)
+def test_internal_endpoints_are_off_without_a_token(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch, path: str
+) -> None:
+    monkeypatch.setattr(settings, "INTERNAL_API_TOKEN", "")
+
+    response = client.get(path, headers={"Authorization": "Bearer "})
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("path", INTERNAL_PATHS)
+def test_internal_endpoints_require_the_token(
+    client: TestClient, internal_headers: Dict[str, str], path: str
+) -> None:
+    assert client.get(path).status_code == 401
+    response = client.get(path, headers={"Authorization": "Bearer wrong"})
+    assert response.status_code == 401
+
+    assert client.get(path, headers=internal_headers).status_code == 200
@@ -0,0 +1,65 @@
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from users_api.metrics import PrometheusText, RequestMetrics
+from users_api.models.orm.users import UsersORM
+
+TEST_AUTH_HEADERS = {"Authorization": "Bearer test_token"}
+
+
+def test_metrics_endpoint(client: TestClient, db_session: Session) -> None:
+    user_id = uuid.uuid4()
+    db_session.add(
+        UsersORM(id=user_id, name="Test User", email=f"{user_id}@example.com")
+    )
+    db_session.commit()
+    client.get(f"/users/{user_id}", headers=TEST_AUTH_HEADERS)
+    client.get(f"/users/{user_id}", headers=TEST_AUTH_HEADERS)
+    client.get("/no-such-route", headers=TEST_AUTH_HEADERS)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+
+    # Labelled by route template, never by the raw path
+    assert str(user_id) not in body
+    assert (
+        'users_api_http_request_duration_seconds_bucket{method="GET",'
+        'route="/users/{user_id}",le="+Inf"}' in body
+    )
+    assert (
+        'users_api_http_responses_total{method="GET",route="unmatched",status="404"}'
+        in body
+    )
+    assert "users_api_http_requests_in_flight 1" in body
+    assert 'users_api_db_pool_checked_out{pool="primary"}' in body
+    assert 'users_api_cache_hit_ratio{tier="all"}' in body
+    assert 'users_api_single_flight_shared_total{mode="tasks"}' in body
+
+
+def test_request_metrics() -> None:
+    metrics = RequestMetrics(buckets=(0.1, 1))
+    metrics.observe("GET", "/users/{user_id}", 200, 0.05)
+    metrics.observe("GET", "/users/{user_id}", 200, 0.5)
+    metrics.observe("GET", "/users/{user_id}", 500, 5)
+
+    histogram = metrics.durations()[("GET", "/users/{user_id}")].snapshot()
+    assert [bucket["count"] for bucket in histogram["buckets"]] == [1, 2, 3]
+    assert metrics.responses() == {
+        ("GET", "/users/{user_id}", 200): 2,
+        ("GET", "/users/{user_id}", 500): 1,
+    }
+
+
+def test_prometheus_text_escapes_label_values() -> None:
+    text = PrometheusText()
+    text.metric("requests_total", "counter", "Requests")
+    text.sample("requests_total", 3, route='/a"b\\c')
+    assert text.render() == (
+        "# HELP requests_total Requests\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{route="/a\\"b\\\\c"} 3\n'
+    )
@@ -1,9 +1,14 @@
+import json
 import uuid
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
+from users_api import settings
 from users_api.api.deps.db import get_db
 from users_api.app import app
+from users_api.cache.store import get_cache
+from users_api.db.session import LazySession
+from users_api.managers.posts import RETURNING_JOINS
 from users_api.models.orm.posts import PostsORM
 from users_api.models.orm.users import UsersORM
 from users_api.schemas.posts import CreatePostRequest
@@ -15,7 +20,7 @@ TEST_AUTH_HEADERS = {"Authorization": "Bearer test_token"}
 def override_get_db():
     db = Session()
     try:
-        yield db
+        yield LazySession(lambda: db)
     finally:
         db.close()
 
@@ -25,7 +30,9 @@ app.dependency_overrides[get_db] = override_get_db
 
 def test_get_posts(client: TestClient, db_session: Session) -> None:
     user_id = uuid.uuid4()
-    db_session.add(UsersORM(id=user_id, name="Test User", email="test@example.com"))
+    db_session.add(
+        UsersORM(id=user_id, name="Test User", email=f"{user_id}@example.com")
+    )
     db_session.commit()
 
     request_body = {
@@ -44,9 +51,47 @@ def test_get_posts(client: TestClient, db_session: Session) -> None:
     assert data["posts"][0]["title"] == "Test Post"
 
 
+def test_get_posts_paginates_with_cursor(
+    client: TestClient, db_session: Session
+) -> None:
+    user_id = uuid.uuid4()
+    db_session.add(
+        UsersORM(id=user_id, name="Test User", email=f"{user_id}@example.com")
+    )
+    db_session.commit()
+
+    created_ids = set()
+    for i in range(3):
+        request_body = {
+            "title": f"Paged Post {i}",
+            "description": "A description for the new post",
+            "content": "This is the content of the new post",
+            "user_id": str(user_id),
+        }
+        response = client.post("/posts/", headers=TEST_AUTH_HEADERS, json=request_body)
+        created_ids.add(response.json()["id"])
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/posts/", headers=TEST_AUTH_HEADERS, params=params)
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["posts"]) <= 2
+        seen.extend(post["id"] for post in data["posts"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(seen) == len(set(seen))
+    assert created_ids <= set(seen)
+
+
 def test_create_post(client: TestClient, db_session: Session) -> None:
     user_id = uuid.uuid4()
-    db_session.add(UsersORM(id=user_id, name="Test User", email="test@example.com"))
+    db_session.add(
+        UsersORM(id=user_id, name="Test User", email=f"{user_id}@example.com")
+    )
     db_session.commit()
 
     request_body = {
@@ -60,11 +105,59 @@ def test_create_post(client: TestClient, db_session: Session) -> None:
     assert response.status_code == 200
     data = response.json()
     assert data["title"] == request_body["title"]
+    assert data["description"] == request_body["description"]
+
+
+def test_create_post_is_one_insert_per_table(
+    client: TestClient, db_session: Session, record_statements, monkeypatch
+) -> None:
+    # As on the app's sessions, otherwise serializing reloads the post
+    monkeypatch.setattr(db_session, "expire_on_commit", False)
+    user_id = uuid.uuid4()
+    db_session.add(
+        UsersORM(id=user_id, name="Test User", email=f"{user_id}@example.com")
+    )
+    db_session.commit()
+
+    request_body = {
+        "title": "New Post",
+        "description": "A description for the new post",
+        "content": "This is the content of the new post",
+        "user_id": str(user_id),
+    }
+    with record_statements() as statements:
+        response = client.post("/posts/", headers=TEST_AUTH_HEADERS, json=request_body)
+
+    assert response.status_code == 200
+    assert response.json()["created_at"] is not None
+    assert [s.split()[0] for s in statements] == ["SELECT", "INSERT", "INSERT"]
+    assert "RETURNING" in statements[1]
+
+
+def test_many_posts_insert_in_batches(db_session: Session, record_statements) -> None:
+    user_id = uuid.uuid4()
+    user = UsersORM(id=user_id, name="Test User", email=f"{user_id}@example.com")
+    db_session.add(user)
+    db_session.flush()
+    posts = [PostsORM(title=f"Batched {i}", users=[user]) for i in range(5)]
+
+    with record_statements() as statements:
+        db_session.add_all(posts)
+        db_session.flush()
+
+    # One multi-row INSERT per table, created_at comes back with the posts
+    assert [s.split()[:3] for s in statements] == [
+        ["INSERT", "INTO", "posts"],
+        ["INSERT", "INTO", "users_and_posts"],
+    ]
+    assert all(post.__dict__.get("created_at") is not None for post in posts)
 
 
 def test_get_post(client: TestClient, db_session: Session) -> None:
     user_id = uuid.uuid4()
-    db_session.add(UsersORM(id=user_id, name="Test User", email="test@example.com"))
+    db_session.add(
+        UsersORM(id=user_id, name="Test User", email=f"{user_id}@example.com")
+    )
     db_session.commit()
 
     request_body = {
@@ -88,7 +181,9 @@ def test_get_post(client: TestClient, db_session: Session) -> None:
 
 def test_update_post(client: TestClient, db_session: Session) -> None:
     user_id = uuid.uuid4()
-    db_session.add(UsersORM(id=user_id, name="Test User", email="test@example.com"))
+    db_session.add(
+        UsersORM(id=user_id, name="Test User", email=f"{user_id}@example.com")
+    )
     db_session.commit()
 
     request_body = {
@@ -119,7 +214,55 @@ def test_update_post(client: TestClient, db_session: Session) -> None:
     assert data["content"] == "Updated content"
 
 
-def test_delete_post(client: TestClient, db_session: Session) -> None:
+def test_update_post_is_one_statement(
+    client: TestClient, db_session: Session, record_statements
+) -> None:
+    user_id = uuid.uuid4()
+    db_session.add(
+        UsersORM(id=user_id, name="Test User", email=f"{user_id}@example.com")
+    )
+    db_session.commit()
+    post_id = client.post(
+        "/posts/",
+        headers=TEST_AUTH_HEADERS,
+        json={
+            "title": "Post",
+            "description": "Description",
+            "content": "Content",
+            "user_id": str(user_id),
+        },
+    ).json()["id"]
+
+    update_data = {"title": "Updated", "content": "Updated", "user_id": str(user_id)}
+    with record_statements() as statements:
+        response = client.put(
+            f"/posts/{post_id}", headers=TEST_AUTH_HEADERS, json=update_data
+        )
+
+    assert response.status_code == 200
+    assert response.json()["title"] == "Updated"
+    assert response.json()["user"]["id"] == str(user_id)
+    # The user comes back with the UPDATE where the dialect can join it in
+    expected = ["UPDATE"]
+    if db_session.get_bind().dialect.name not in RETURNING_JOINS:
+        expected.append("SELECT")
+    assert [s.split()[0] for s in statements] == expected
+
+    response = client.put(
+        f"/posts/{uuid.uuid4()}", headers=TEST_AUTH_HEADERS, json=update_data
+    )
+    assert response.status_code == 404
+    response = client.put(
+        f"/posts/{post_id}",
+        headers=TEST_AUTH_HEADERS,
+        json={**update_data, "user_id": str(uuid.uuid4())},
+    )
+    assert response.status_code == 400
+
+
+def test_delete_post(
+    client: TestClient, db_session: Session, record_statements
+) -> None:
     post_id = uuid.uuid4()
     db_session.add(
         PostsORM(
@@ -131,5 +274,190 @@ def test_delete_post(client: TestClient, db_session: Session) -> None:
     )
     db_session.commit()
 
-    response = client.delete(f"/posts/{post_id}", headers=TEST_AUTH_HEADERS)
+    with record_statements() as statements:
+        response = client.delete(f"/posts/{post_id}", headers=TEST_AUTH_HEADERS)
     assert response.status_code == 204
+    assert [s.split()[0] for s in statements] == ["DELETE", "DELETE"]
+    assert (
+        client.delete(f"/posts/{post_id}", headers=TEST_AUTH_HEADERS).status_code == 404
+    )
+
+
+def test_export_posts_streams_ndjson(
+    client: TestClient, db_session: Session, monkeypatch
+) -> None:
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 2)
+    user_id = uuid.uuid4()
+    db_session.add(
+        UsersORM(id=user_id, name="Test User", email=f"{user_id}@example.com")
+    )
+    db_session.commit()
+
+    created_ids = set()
+    for i in range(3):
+        request_body = {
+            "title": f"Exported Post {i}",
+            "description": "A description for the new post",
+            "content": "This is the content of the new post",
+            "user_id": str(user_id),
+        }
+        response = client.post("/posts/", headers=TEST_AUTH_HEADERS, json=request_body)
+        created_ids.add(response.json()["id"])
+
+    response = client.get("/posts/export", headers=TEST_AUTH_HEADERS)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    posts = [json.loads(line) for line in response.text.splitlines()]
+    assert created_ids <= {post["id"] for post in posts}
+    assert all(
+        post["user"]["id"] == str(user_id)
+        for post in posts
+        if post["id"] in created_ids
+    )
+
+
+def test_get_post_is_invalidated_by_writes(
+    client: TestClient, db_session: Session
+) -> None:
+    user_id = uuid.uuid4()
+    email = f"{user_id}@example.com"
+    db_session.add(UsersORM(id=user_id, name="Test User", email=email))
+    db_session.commit()
+
+    post_id = client.post(
+        "/posts/",
+        headers=TEST_AUTH_HEADERS,
+        json={
+            "title": "Cached Post",
+            "description": "A description for the new post",
+            "content": "This is the content of the new post",
+            "user_id": str(user_id),
+        },
+    ).json()["id"]
+    assert client.get(f"/posts/{post_id}", headers=TEST_AUTH_HEADERS).status_code == 200
+
+    client.put(
+        f"/posts/{post_id}",
+        headers=TEST_AUTH_HEADERS,
+        json={"title": "Updated Title", "content": "Updated", "user_id": str(user_id)},
+    )
+    data = client.get(f"/posts/{post_id}", headers=TEST_AUTH_HEADERS).json()
+    assert data["title"] == "Updated Title"
+
+    # The cached post embeds its user, a write to the user drops it too
+    client.post(
+        "/users/", headers=TEST_AUTH_HEADERS, json={"email": email, "sms": "5553330000"}
+    )
+    data = client.get(f"/posts/{post_id}", headers=TEST_AUTH_HEADERS).json()
+    assert data["user"]["sms"] == "5553330000"
+
+
+def test_get_post_etag_follows_its_user(
+    client: TestClient, db_session: Session
+) -> None:
+    user_id = uuid.uuid4()
+    email = f"{user_id}@example.com"
+    db_session.add(UsersORM(id=user_id, name="Test User", email=email))
+    db_session.commit()
+    post_id = client.post(
+        "/posts/",
+        headers=TEST_AUTH_HEADERS,
+        json={
+            "title": "ETag Post",
+            "description": "A description for the new post",
+            "content": "This is the content of the new post",
+            "user_id": str(user_id),
+        },
+    ).json()["id"]
+
+    etag = client.get(f"/posts/{post_id}", headers=TEST_AUTH_HEADERS).headers["etag"]
+    headers = {**TEST_AUTH_HEADERS, "If-None-Match": etag}
+    assert client.get(f"/posts/{post_id}", headers=headers).status_code == 304
+    # Checked against a projection query on a cache miss
+    get_cache().clear()
+    assert client.get(f"/posts/{post_id}", headers=headers).status_code == 304
+
+    # The payload embeds the user
+    client.post(
+        "/users/", headers=TEST_AUTH_HEADERS, json={"email": email, "sms": "5556660000"}
+    )
+    get_cache().clear()
+    assert client.get(f"/posts/{post_id}", headers=headers).status_code == 200
+
+
+def test_etags_agree_for_a_post_with_many_users(
+    client: TestClient, db_session: Session
+) -> None:
+    users = [
+        UsersORM(id=uuid.uuid4(), email=f"{uuid.uuid4()}@example.com") for _ in range(2)
+    ]
+    post_id = uuid.uuid4()
+    db_session.add(PostsORM(id=post_id, title="Shared Post", users=users))
+    db_session.commit()
+    # Makes the second user the most recently updated one
+    client.post(
+        "/users/",
+        headers=TEST_AUTH_HEADERS,
+        json={"email": users[1].email, "sms": "5557770000"},
+    )
+
+    response = client.get(f"/posts/{post_id}", headers=TEST_AUTH_HEADERS)
+    assert response.json()["user"]["id"] == str(users[1].id)
+    headers = {**TEST_AUTH_HEADERS, "If-None-Match": response.headers["etag"]}
+    get_cache().clear()
+    assert client.get(f"/posts/{post_id}", headers=headers).status_code == 304
+
+    response = client.get("/posts/?limit=500", headers=TEST_AUTH_HEADERS)
+    assert str(post_id) in {post["id"] for post in response.json()["posts"]}
+    headers = {**TEST_AUTH_HEADERS, "If-None-Match": response.headers["etag"]}
+    assert client.get("/posts/?limit=500", headers=headers).status_code == 304
+
+
+def test_get_posts_etag(client: TestClient) -> None:
+    response = client.get("/posts/?limit=5", headers=TEST_AUTH_HEADERS)
+    etag = response.headers["etag"]
+    headers = {**TEST_AUTH_HEADERS, "If-None-Match": etag}
+
+    response = client.get("/posts/?limit=5", headers=headers)
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+
+def test_get_posts_sparse_fieldset(
+    client: TestClient, db_session: Session, record_statements
+) -> None:
+    user_id = uuid.uuid4()
+    db_session.add(
+        UsersORM(id=user_id, name="Test User", email=f"{user_id}@example.com")
+    )
+    db_session.commit()
+    client.post(
+        "/posts/",
+        headers=TEST_AUTH_HEADERS,
+        json={
+            "title": "Sparse Post",
+            "description": "A description for the new post",
+            "content": "A long content that isn't read",
+            "user_id": str(user_id),
+        },
+    )
+
+    with record_statements() as statements:
+        response = client.get(
+            "/posts/?fields=user,title&limit=500", headers=TEST_AUTH_HEADERS
+        )
+
+    assert response.status_code == 200
+    posts = response.json()["posts"]
+    assert all(list(post) == ["title", "user"] for post in posts)
+    sparse = next(post for post in posts if post["title"] == "Sparse Post")
+    assert sparse["user"]["id"] == str(user_id)
+    assert len(statements) == 2
+    assert not any("posts.content" in statement for statement in statements)
+
+    response = client.get("/posts/?fields=title", headers=TEST_AUTH_HEADERS)
+    assert all(list(post) == ["title"] for post in response.json()["posts"])
+
+    response = client.get("/posts/?fields=users", headers=TEST_AUTH_HEADERS)
+    assert response.status_code == 400
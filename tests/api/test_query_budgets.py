@@ -0,0 +1,96 @@
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from users_api import settings
+from users_api.managers.posts import RETURNING_JOINS
+from users_api.models.orm.users import UsersORM
+
+TEST_AUTH_HEADERS = {"Authorization": "Bearer test_token"}
+
+
+@pytest.fixture
+def seeded(client: TestClient, db_session: Session, monkeypatch):
+    # As on the app's sessions, otherwise serializing reloads the rows
+    monkeypatch.setattr(db_session, "expire_on_commit", False)
+    user_ids = [uuid.uuid4() for _ in range(10)]
+    db_session.add_all(
+        UsersORM(id=user_id, email=f"{user_id}@example.com") for user_id in user_ids
+    )
+    db_session.commit()
+    post_ids = [
+        client.post(
+            "/posts/",
+            headers=TEST_AUTH_HEADERS,
+            json={
+                "title": "Budget",
+                "description": "Budget",
+                "content": "Budget",
+                "user_id": str(user_id),
+            },
+        ).json()["id"]
+        for user_id in user_ids
+    ]
+    return {"user_id": user_ids[0], "post_id": post_ids[0]}
+
+
+# The post's user is returned by the UPDATE where the dialect can join it in,
+# otherwise read by a second statement
+UPDATE_POST_QUERIES = (
+    1
+    if make_url(settings.TEST_DATABASE_URL).get_backend_name() in RETURNING_JOINS
+    else 2
+)
+
+# Statements each endpoint may run, on a cold cache
+BUDGETS = [
+    ("GET", "/users/", 1),
+    ("GET", "/users/{user_id}", 1),
+    ("GET", "/users/?fields=id,email", 1),
+    ("GET", "/posts/", 2),
+    ("GET", "/posts/{post_id}", 1),
+    ("GET", "/posts/?fields=title,user", 2),
+    ("PUT", "/posts/{post_id}", UPDATE_POST_QUERIES),
+    ("DELETE", "/posts/{post_id}", 2),
+    ("DELETE", "/users/{user_id}", 2),
+]
+
+
+@pytest.mark.parametrize("method, path, max_queries", BUDGETS)
+def test_endpoint_query_budget(
+    client: TestClient, seeded, query_budget, method: str, path: str, max_queries: int
+) -> None:
+    json = None
+    if method == "PUT":
+        json = {
+            "title": "Updated",
+            "content": "Updated",
+            "user_id": str(seeded["user_id"]),
+        }
+
+    with query_budget(max_queries):
+        response = client.request(
+            method, path.format(**seeded), headers=TEST_AUTH_HEADERS, json=json
+        )
+    assert response.status_code < 300
+
+
+def test_responses_report_server_timing(client: TestClient, seeded) -> None:
+    response = client.get(f"/users/{seeded['user_id']}", headers=TEST_AUTH_HEADERS)
+
+    server_timing = response.headers["server-timing"]
+    assert server_timing.startswith("db;dur=")
+    assert server_timing.endswith('desc="1 queries"')
+
+    # Now served from the cache
+    response = client.get(f"/users/{seeded['user_id']}", headers=TEST_AUTH_HEADERS)
+    assert response.headers["server-timing"].endswith('desc="0 queries"')
+
+
+def test_query_budget_fails_over_budget(client: TestClient, query_budget) -> None:
+    with pytest.raises(AssertionError, match="over a budget of 0"):
+        with query_budget(0):
+            client.get("/users/", headers=TEST_AUTH_HEADERS)
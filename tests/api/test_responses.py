@@ -0,0 +1,66 @@
+import datetime
+import uuid
+
+from users_api.api.responses import RowsResponse
+from users_api.models.orm.posts import PostsORM
+from users_api.models.orm.users import UsersORM
+from users_api.schemas.helpers import (
+    post_response,
+    posts_page,
+    posts_payload,
+    users_page,
+    users_payload,
+)
+from users_api.schemas.posts import PostsResponse
+from users_api.schemas.users import UsersResponse
+
+NOW = datetime.datetime(2024, 10, 22, 23, 47, 1, 123456, tzinfo=datetime.timezone.utc)
+
+
+def make_users() -> list:
+    return [
+        UsersORM(
+            id=uuid.uuid4(),
+            username=None,
+            name="Row User",
+            email=f"row-{i}@example.com",
+            sms=None,
+            created_at=NOW,
+            last_updated=NOW.replace(microsecond=0),
+        )
+        for i in range(3)
+    ]
+
+
+def make_posts() -> list:
+    return [
+        PostsORM(
+            id=uuid.uuid4(),
+            title="Row Post",
+            description=None,
+            content="Content",
+            created_at=NOW,
+            last_updated=NOW,
+            users=[user],
+        )
+        for user in make_users()
+    ]
+
+
+def test_users_page_renders_like_pydantic() -> None:
+    users = make_users()
+
+    expected = UsersResponse(users=users_payload(users), next_cursor="next")
+
+    body = RowsResponse(users_page(users, "next")).body
+    assert body == expected.model_dump_json().encode()
+
+
+def test_posts_page_renders_like_pydantic() -> None:
+    posts = make_posts()
+
+    expected = PostsResponse(posts=[post_response(post) for post in posts])
+
+    body = RowsResponse(posts_page(posts, None)).body
+    assert body == expected.model_dump_json().encode()
+    assert posts_payload(posts) == expected.posts
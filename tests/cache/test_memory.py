@@ -0,0 +1,78 @@
+from users_api.cache.memory import InProcessCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_get_counts_hits_and_misses() -> None:
+    cache = InProcessCache(max_entries=10, ttl=30)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+
+    stats = cache.snapshot()
+    assert (stats["hits"], stats["misses"], stats["sets"]) == (1, 1, 1)
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_evicts_least_recently_used() -> None:
+    cache = InProcessCache(max_entries=2, ttl=30)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert len(cache) == 2
+    assert cache.snapshot()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl() -> None:
+    clock = FakeClock()
+    cache = InProcessCache(max_entries=10, ttl=30, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=60)
+
+    clock.now = 30
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert len(cache) == 1
+    assert cache.snapshot()["expirations"] == 1
+
+
+def test_invalidate_drops_dependents() -> None:
+    cache = InProcessCache(max_entries=10, ttl=30)
+    cache.set("user:1", "user")
+    cache.set("post:1", "post", depends_on=["user:1"])
+    cache.set("post:2", "other post", depends_on=["user:2"])
+
+    cache.invalidate("user:1")
+
+    assert cache.get("user:1") is None
+    assert cache.get("post:1") is None
+    assert cache.get("post:2") == "other post"
+    assert cache.snapshot()["invalidations"] == 2
+
+
+def test_invalidate_dependency_that_is_not_cached() -> None:
+    cache = InProcessCache(max_entries=10, ttl=30)
+    cache.set("post:1", "post", depends_on=["user:1"])
+
+    cache.invalidate("user:1")
+
+    assert cache.get("post:1") is None
+
+
+def test_zero_max_entries_disables_caching() -> None:
+    cache = InProcessCache(max_entries=0, ttl=30)
+    cache.set("a", 1)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from users_api.cache.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def wait_for(condition) -> None:
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_concurrent_threads_share_one_call() -> None:
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def load() -> str:
+        calls.append(1)
+        release.wait()
+        return "row"
+
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        results = [pool.submit(flight.do, "user:1", load) for _ in range(10)]
+        wait_for(lambda: flight.stats.shared == 9)
+        release.set()
+        assert [result.result() for result in results] == ["row"] * 10
+
+    assert len(calls) == 1
+    assert flight.stats.snapshot() == {"leads": 1, "shared": 9}
+    # Nothing in flight any more, the next call runs again
+    assert flight.do("user:1", lambda: "again") == "again"
+
+
+def test_threads_share_the_error() -> None:
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def load() -> str:
+        release.wait()
+        raise LookupError("missing")
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        results = [pool.submit(flight.do, "post:1", load) for _ in range(3)]
+        wait_for(lambda: flight.stats.shared == 2)
+        release.set()
+        for result in results:
+            with pytest.raises(LookupError):
+                result.result()
+
+
+def test_forgotten_key_starts_a_new_call() -> None:
+    flight = SingleFlight()
+    release = threading.Event()
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        stale = pool.submit(flight.do, "user:1", lambda: release.wait() and "old")
+        wait_for(lambda: flight.stats.leads == 1)
+        flight.forget("user:1")
+        assert flight.do("user:1", lambda: "new") == "new"
+        release.set()
+        assert stale.result() == "old"
+
+
+def test_concurrent_tasks_share_one_call() -> None:
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def load() -> str:
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "row"
+
+    async def run():
+        return await asyncio.gather(*(flight.do("user:1", load) for _ in range(10)))
+
+    assert asyncio.run(run()) == ["row"] * 10
+    assert len(calls) == 1
+    assert flight.stats.snapshot() == {"leads": 1, "shared": 9}
+
+
+def test_follower_takes_over_from_a_cancelled_leader() -> None:
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def load() -> str:
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "row"
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do("post:1", load))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("post:1", load))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower, leader.cancelled()
+
+    assert asyncio.run(run()) == ("row", True)
+    assert len(calls) == 2
+
+
+def test_cancelled_follower_leaves_the_load_running() -> None:
+    flight = AsyncSingleFlight()
+
+    async def load() -> str:
+        await asyncio.sleep(0.01)
+        return "row"
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do("post:1", load))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("post:1", load))
+        await asyncio.sleep(0)
+        follower.cancel()
+        return await leader, follower.cancelled()
+
+    assert asyncio.run(run()) == ("row", True)
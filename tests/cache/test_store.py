@@ -0,0 +1,35 @@
+import uuid
+
+from users_api.cache.keys import user_key
+from users_api.cache.store import fill, generation, get_cache, invalidate
+from users_api.models.users import User
+
+
+def make_user() -> User:
+    return User(
+        id=uuid.uuid4(),
+        username=None,
+        name="Test User",
+        email="store@example.com",
+        sms=None,
+        created_at=None,
+        last_updated=None,
+    )
+
+
+def test_fill_caches_a_load() -> None:
+    user = make_user()
+    since = generation()
+    fill(user_key(user.id), user, since)
+
+    assert get_cache().get(user_key(user.id)) == user
+
+
+def test_fill_drops_a_load_that_raced_a_write() -> None:
+    user = make_user()
+    since = generation()
+    # Written and invalidated while the load was reading the old row
+    invalidate(user_key(user.id))
+    fill(user_key(user.id), user, since)
+
+    assert get_cache().get(user_key(user.id)) is None
@@ -0,0 +1,130 @@
+import time
+import uuid
+from typing import Callable, Iterator
+
+import pytest
+
+from users_api.cache.keys import post_key, user_key
+from users_api.cache.memory import InProcessCache
+from users_api.cache.tiered import TieredCache
+from users_api.models.posts import Post
+from users_api.models.users import User
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from users_api.cache.shared import RedisCache  # noqa: E402
+
+CHANNEL = "test:cache:invalidate"
+
+
+@pytest.fixture
+def worker() -> Iterator[Callable[[], TieredCache]]:
+    """Builds caches as separate workers would, sharing one server"""
+    server = fakeredis.FakeServer()
+    caches = []
+
+    def build() -> TieredCache:
+        cache = TieredCache(
+            InProcessCache(max_entries=100, ttl=30),
+            RedisCache(fakeredis.FakeRedis(server=server), ttl=300),
+            channel=CHANNEL,
+            poll_interval=0.05,
+        )
+        cache.listen()
+        caches.append(cache)
+        return cache
+
+    yield build
+    for cache in caches:
+        cache.close()
+
+
+def make_user() -> User:
+    return User(
+        id=uuid.uuid4(),
+        username=None,
+        name="Test User",
+        email="tiered@example.com",
+        sms=None,
+        created_at=None,
+        last_updated=None,
+    )
+
+
+def make_post(user: User) -> Post:
+    return Post(
+        id=uuid.uuid4(),
+        title="Title",
+        description="Description",
+        content="Content",
+        user=user,
+        created_at=None,
+        last_updated=None,
+    )
+
+
+def eventually(condition: Callable[[], bool], timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_shared_hit_fills_local_without_hydration(worker) -> None:
+    first, second = worker(), worker()
+    user = make_user()
+    first.set(user_key(user.id), user)
+
+    cached = second.get(user_key(user.id))
+
+    assert cached == user and isinstance(cached, User)
+    assert second.local.snapshot()["misses"] == 1
+    assert second.shared.snapshot()["hits"] == 1
+    assert second.get(user_key(user.id)) == user
+    assert second.local.snapshot()["hits"] == 1
+
+
+def test_invalidation_reaches_other_workers(worker) -> None:
+    first, second = worker(), worker()
+    user = make_user()
+    post = make_post(user)
+    first.set(post_key(post.id), post, depends_on=[user_key(user.id)])
+    assert second.get(post_key(post.id)) == post
+
+    # The second worker filled its L1 from L2, which doesn't carry the
+    # dependency: the published keys include the dependents L2 expanded
+    first.invalidate(user_key(user.id))
+
+    assert first.get(post_key(post.id)) is None
+    assert eventually(lambda: second.local.get(post_key(post.id)) is None)
+    assert second.get(post_key(post.id)) is None
+
+
+def test_own_invalidations_are_not_applied_twice(worker) -> None:
+    first = worker()
+    user = make_user()
+    first.invalidate(user_key(user.id))
+    first.set(user_key(user.id), user)
+
+    time.sleep(0.1)
+    assert first.local.get(user_key(user.id)) == user
+
+
+def test_unreachable_shared_tier_degrades_to_local() -> None:
+    server = fakeredis.FakeServer()
+    server.connected = False
+    cache = TieredCache(
+        InProcessCache(max_entries=100, ttl=30),
+        RedisCache(fakeredis.FakeRedis(server=server), ttl=300),
+        channel=CHANNEL,
+    )
+    user = make_user()
+
+    cache.set(user_key(user.id), user)
+    assert cache.get(user_key(user.id)) == user
+    cache.invalidate(user_key(user.id))
+    assert cache.get(user_key(user.id)) is None
+
+    assert cache.snapshot()["l2"]["errors"] >= 3
@@ -1,17 +1,34 @@
 # conftest.py
 
+import contextlib
+
 import pytest
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
 
 from users_api import settings
 from users_api.app import app  # Adjust to your actual app import
-from users_api.api.deps.db import get_db
+from users_api.api.async_posts import async_posts_router
+from users_api.api.async_users import async_users_router
+from users_api.api.deps.db import (
+    get_async_db,
+    get_async_read_db,
+    get_async_streaming_db,
+    get_db,
+    get_read_db,
+    get_streaming_db,
+)
+from users_api.api.middleware import QueryTimingMiddleware, ReadYourWritesMiddleware
+from users_api.cache.store import get_cache
+from users_api.db.query_metrics import RequestQueries, instrument_queries
+from users_api.db.session import LazySession
 from users_api.models.base import Base  # Your SQLAlchemy Base class
 
-
 # SQLALCHEMY_DATABASE_URL = "postgresql:///./test.db"
 engine = create_engine(
     settings.TEST_DATABASE_URL,
@@ -22,6 +39,7 @@ TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engin
 
 # Set up the test database
 Base.metadata.create_all(bind=engine)
+instrument_queries(engine)
 
 
 @pytest.fixture(scope="module")
@@ -38,6 +56,61 @@ def db_session():
     connection.close()
 
 
+@pytest.fixture
+def record_statements(db_session: Session):
+    """
+    Context manager collecting the SQL run on db_session's connection:
+
+        with record_statements() as statements:
+            client.get(...)
+    """
+
+    @contextlib.contextmanager
+    def record():
+        statements = []
+        bind = db_session.get_bind()
+
+        def listener(*args):
+            statements.append(args[2])
+
+        event.listen(bind, "before_cursor_execute", listener)
+        try:
+            yield statements
+        finally:
+            event.remove(bind, "before_cursor_execute", listener)
+
+    return record
+
+
+@pytest.fixture
+def query_budget(record_statements):
+    """
+    Fails the test when the block runs more than `max_queries` statements,
+    or repeats one statement `max_repeats` times (a likely N+1):
+
+        with query_budget(2):
+            client.get(...)
+    """
+
+    @contextlib.contextmanager
+    def budget(max_queries: int, max_repeats: int = settings.QUERY_REPEAT_THRESHOLD):
+        with record_statements() as statements:
+            yield statements
+
+        queries = RequestQueries()
+        for statement in statements:
+            queries.record(statement, 0.0)
+        listing = "\n".join(statements)
+        assert (
+            queries.count <= max_queries
+        ), f"{queries.count} statements over a budget of {max_queries}:\n{listing}"
+        assert not queries.repeated(
+            max_repeats
+        ), f"Likely N+1, statements repeated: {queries.repeated(max_repeats)}"
+
+    return budget
+
+
 @pytest.fixture(scope="module")
 def client(db_session: Session):
     """Fixture to create a TestClient for the FastAPI app with a mock DB session."""
@@ -45,11 +118,66 @@ def client(db_session: Session):
     # Override the dependency to use the test DB session
     def override_get_db():
         try:
-            yield db_session
+            yield LazySession(lambda: db_session)
         finally:
             db_session.close()
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    app.dependency_overrides[get_streaming_db] = lambda: lambda: db_session
 
     with TestClient(app) as test_client:
         yield test_client
+
+
+@pytest.fixture(scope="module")
+def async_client(tmp_path_factory: pytest.TempPathFactory):
+    """Fixture to create a TestClient for the async routers backed by aiosqlite."""
+    db_path = tmp_path_factory.mktemp("async_db") / "users_api.db"
+    Base.metadata.create_all(bind=create_engine(f"sqlite:///{db_path}"))
+
+    # NullPool keeps aiosqlite connections from outliving the TestClient's loop
+    async_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool
+    )
+    instrument_queries(async_engine)
+
+    async def override_get_async_db():
+        async with AsyncSession(
+            bind=async_engine, autoflush=False, expire_on_commit=False
+        ) as db_session:
+            yield db_session
+
+    def override_get_async_streaming_db():
+        return lambda: AsyncSession(
+            bind=async_engine, autoflush=False, expire_on_commit=False
+        )
+
+    async_app = FastAPI()
+    async_app.add_middleware(QueryTimingMiddleware)
+    async_app.add_middleware(ReadYourWritesMiddleware)
+    async_app.include_router(async_users_router, prefix="/users")
+    async_app.include_router(async_posts_router, prefix="/posts")
+    async_app.dependency_overrides[get_async_db] = override_get_async_db
+    async_app.dependency_overrides[get_async_read_db] = override_get_async_db
+    async_app.dependency_overrides[get_async_streaming_db] = (
+        override_get_async_streaming_db
+    )
+
+    with TestClient(async_app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def internal_headers(monkeypatch: pytest.MonkeyPatch):
+    """Enables /internal/* for the test, returns the headers it requires"""
+    monkeypatch.setattr(settings, "INTERNAL_API_TOKEN", "internal_token")
+    return {"Authorization": "Bearer internal_token"}
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """The manager cache outlives requests, don't let it leak between tests."""
+    get_cache().clear()
+    yield
+    get_cache().clear()
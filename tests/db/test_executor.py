@@ -0,0 +1,93 @@
+import asyncio
+import threading
+from typing import Dict
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from users_api.db.executor import DBExecutor
+from users_api.db.session import LazySession
+
+TEST_AUTH_HEADERS = {"Authorization": "Bearer test_token"}
+
+
+def test_executor_runs_off_the_event_loop() -> None:
+    db_executor = DBExecutor(max_workers=2)
+
+    async def run() -> str:
+        return await db_executor.run(lambda: threading.current_thread().name)
+
+    try:
+        assert asyncio.run(run()).startswith("users_api_db")
+    finally:
+        db_executor.shutdown()
+
+
+def test_executor_reports_queue_depth_when_thread_starved() -> None:
+    db_executor = DBExecutor(max_workers=1)
+    release = threading.Event()
+
+    async def run() -> None:
+        blocked = asyncio.ensure_future(db_executor.run(release.wait))
+        queued = asyncio.ensure_future(db_executor.run(lambda: None))
+        await asyncio.sleep(0.05)
+
+        snapshot = db_executor.stats.snapshot()
+        assert snapshot["active"] == 1
+        assert snapshot["queue_depth"] == 1
+
+        release.set()
+        await asyncio.gather(blocked, queued)
+
+    try:
+        asyncio.run(run())
+    finally:
+        db_executor.shutdown()
+
+    snapshot = db_executor.stats.snapshot()
+    assert snapshot["completed"] == 2
+    assert snapshot["queue_depth"] == 0
+    assert snapshot["queue_wait_max_ms"] >= 50
+
+
+def test_executor_measures_pool_wait(db_session: Session) -> None:
+    db_executor = DBExecutor(max_workers=1)
+
+    async def run() -> None:
+        await db_executor.run(lambda db_session: None, db_session=db_session)
+
+    try:
+        asyncio.run(run())
+    finally:
+        db_executor.shutdown()
+
+    assert db_executor.stats.pool_waits == 1
+
+
+def test_executor_runs_managers_on_the_real_session(db_session: Session) -> None:
+    db_executor = DBExecutor(max_workers=1)
+    lazy_session = LazySession(lambda: db_session)
+
+    async def run() -> bool:
+        return await db_executor.run_in_session(
+            lambda session: session is db_session, lazy_session
+        )
+
+    try:
+        assert asyncio.run(run())
+    finally:
+        db_executor.shutdown()
+
+    assert db_executor.stats.pool_waits == 1
+
+
+def test_db_executor_stats_endpoint(
+    client: TestClient, internal_headers: Dict[str, str]
+) -> None:
+    client.get("/users/", headers=TEST_AUTH_HEADERS)
+
+    response = client.get("/internal/db-executor", headers=internal_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["max_workers"] > 0
+    assert data["completed"] >= 1
@@ -0,0 +1,56 @@
+from pathlib import Path
+from typing import Dict
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, exc as sa_exc, text
+
+from users_api.db.pool_metrics import InstrumentedQueuePool, PoolMetrics
+
+
+def test_pool_metrics_track_checkouts_overflow_and_timeouts(tmp_path: Path) -> None:
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.05,
+    )
+    metrics = PoolMetrics("test").attach(engine)
+
+    first = engine.connect()
+    second = engine.connect()
+    first.execute(text("SELECT 1"))
+
+    snapshot = metrics.snapshot()
+    assert snapshot["checked_out"] == 2
+    assert snapshot["overflow"] == 1
+
+    with pytest.raises(sa_exc.TimeoutError):
+        engine.connect()
+    assert metrics.timeouts == 1
+
+    first.close()
+    second.close()
+
+    snapshot = metrics.snapshot()
+    assert snapshot["checked_out"] == 0
+    assert snapshot["checkouts"] == 2
+    assert snapshot["checkout_wait_ms"]["count"] == 3
+
+    # dispose() swaps in a new pool, the metrics should follow it
+    engine.dispose()
+    with engine.connect():
+        pass
+    assert metrics.checkouts == 3
+    assert metrics.checkout_wait_ms.snapshot()["count"] == 4
+
+
+def test_pool_stats_endpoint(
+    client: TestClient, internal_headers: Dict[str, str]
+) -> None:
+    response = client.get("/internal/pool", headers=internal_headers)
+    assert response.status_code == 200
+    primary = next(pool for pool in response.json() if pool["name"] == "primary")
+    assert primary["size"] > 0
+    assert "checkout_wait_ms" in primary
@@ -0,0 +1,61 @@
+import logging
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, exc as sa_exc, text
+
+from users_api.api.middleware import QueryTimingMiddleware
+from users_api.db.query_metrics import RequestQueries, instrument_queries, track_queries
+
+
+def test_track_queries_counts_statements_in_its_context(tmp_path: Path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'queries.db'}")
+    instrument_queries(engine)
+    instrument_queries(engine)  # Idempotent
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        with track_queries() as queries:
+            for _ in range(3):
+                connection.execute(text("SELECT 2"))
+            try:
+                connection.execute(text("SELECT * FROM missing"))
+            except sa_exc.OperationalError:
+                pass
+            connection.execute(text("SELECT 3"))
+        connection.execute(text("SELECT 4"))
+
+    assert queries.count == 4
+    assert queries.duration > 0
+    assert queries.repeated(3) == [("SELECT 2", 3)]
+    assert queries.repeated(4) == []
+    engine.dispose()
+
+
+def test_server_timing() -> None:
+    queries = RequestQueries()
+    queries.record("SELECT 1", 0.0015)
+    queries.record("SELECT 1", 0.001)
+    assert queries.server_timing() == 'db;dur=2.5;desc="2 queries"'
+
+
+def test_middleware_logs_likely_n_plus_one(tmp_path: Path, caplog) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'n_plus_one.db'}")
+    instrument_queries(engine)
+    app = FastAPI()
+    app.add_middleware(QueryTimingMiddleware)
+
+    @app.get("/loop")
+    def loop() -> dict:
+        with engine.connect() as connection:
+            for i in range(6):
+                connection.execute(text("SELECT :i"), {"i": i})
+        return {}
+
+    with caplog.at_level(logging.WARNING, logger="users_api.api.middleware"):
+        response = TestClient(app).get("/loop")
+
+    assert response.headers["server-timing"].endswith('desc="6 queries"')
+    assert "Likely N+1 on GET /loop, statement run 6 times: SELECT ?" in caplog.text
+    engine.dispose()
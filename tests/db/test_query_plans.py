@@ -0,0 +1,273 @@
+"""
+Query plan regression checks.
+
+Seeds the test database, runs each manager call, and EXPLAINs every
+statement it sent. At seeded sizes Postgres may rightly prefer a sequential
+scan where it wouldn't at production sizes, so plans are made with
+enable_seqscan off: a Seq Scan is only left where no index can serve the
+query. Reads are EXPLAIN ANALYZEd as well, which also catches a full index
+walk standing in for a missing index.
+
+A test fails when a scan reads more than SCAN_ROW_THRESHOLD rows (for
+unanalyzed writes, when it sequentially scans a table that big), unless the
+call reads the whole table anyway (exports) and the relation is allowed.
+
+Unbounded reads kept for backwards compatibility (get_all_posts, the OFFSET
+based get_multi) aren't covered.
+"""
+
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, List, Tuple
+
+import pytest
+from sqlalchemy import create_engine, event, insert, make_url, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from users_api import settings
+from users_api.db.query_plans import (
+    SEQ_SCAN,
+    Plan,
+    explain,
+    is_explainable,
+    rows_read,
+    scan_nodes,
+)
+from users_api.managers.posts import posts_manager
+from users_api.managers.users import users_manager
+from users_api.models.orm.posts import PostsORM
+from users_api.models.orm.users import UsersORM
+from users_api.models.orm.users_and_posts import users_and_posts
+from users_api.schemas.pagination import KeysetKey
+from users_api.schemas.posts import CreatePostRequest, UpdatePostRequest
+from users_api.schemas.users import CreateUsersRequest
+
+SEED_ROWS = 5000
+SCAN_ROW_THRESHOLD = 1000
+
+pytestmark = pytest.mark.skipif(
+    make_url(settings.TEST_DATABASE_URL).get_backend_name() != "postgresql",
+    reason="EXPLAIN checks need Postgres",
+)
+
+
+@dataclass
+class Seeded:
+    user_ids: List[uuid.UUID]
+    post_ids: List[uuid.UUID]
+    # Keyset key halfway through the users
+    middle_user_key: KeysetKey
+
+
+@dataclass
+class PlanCase:
+    call: Callable[[Session, Seeded], Any]
+    # Relations the call's first statement may read in full since it reads
+    # the whole table anyway. Follow-up statements (per batch eager loads)
+    # get no allowance.
+    allow_full_scan: FrozenSet[str] = frozenset()
+
+
+CASES: Dict[str, PlanCase] = {
+    "users.get": PlanCase(lambda s, d: users_manager.get(s, id=d.user_ids[10])),
+    "users.get_page": PlanCase(lambda s, d: users_manager.get_page(s, limit=100)),
+    "users.get_page_after": PlanCase(
+        lambda s, d: users_manager.get_page(s, after=d.middle_user_key, limit=100)
+    ),
+    "users.get_version": PlanCase(
+        lambda s, d: users_manager.get_version(s, id=d.user_ids[10])
+    ),
+    "users.get_page_versions": PlanCase(
+        lambda s, d: users_manager.get_page_versions(s, after=d.middle_user_key)
+    ),
+    "users.get_page_fields": PlanCase(
+        lambda s, d: users_manager.get_page_fields(
+            s, ["email"], after=d.middle_user_key
+        )
+    ),
+    "users.create_or_update": PlanCase(
+        lambda s, d: users_manager.create_or_update(
+            s, obj_in=CreateUsersRequest(email="seed-20@example.com", sms="plan")
+        )
+    ),
+    "users.bulk_create_or_update": PlanCase(
+        lambda s, d: users_manager.bulk_create_or_update(
+            s,
+            [
+                CreateUsersRequest(email=f"seed-{i}@example.com", sms=f"bulk-{i}")
+                for i in range(30, 40)
+            ]
+            + [CreateUsersRequest(email="plan-new@example.com", sms=None)],
+        )
+    ),
+    "users.delete_user": PlanCase(
+        lambda s, d: users_manager.delete_user(s, id=d.user_ids[14])
+    ),
+    "users.stream": PlanCase(
+        lambda s, d: next(users_manager.stream(s, batch_size=100)),
+        allow_full_scan=frozenset({"users"}),
+    ),
+    "posts.get_posts_page": PlanCase(
+        lambda s, d: posts_manager.get_posts_page(s, limit=100)
+    ),
+    "posts.get_post_by_id": PlanCase(
+        lambda s, d: posts_manager.get_post_by_id(s, post_id=d.post_ids[10])
+    ),
+    "posts.get_post_version": PlanCase(
+        lambda s, d: posts_manager.get_post_version(s, post_id=d.post_ids[10])
+    ),
+    "posts.get_posts_page_versions": PlanCase(
+        lambda s, d: posts_manager.get_posts_page_versions(s, limit=100)
+    ),
+    "posts.get_posts_page_fields": PlanCase(
+        lambda s, d: posts_manager.get_posts_page_fields(s, ["title"], limit=100)
+    ),
+    "posts.get_users_of_posts": PlanCase(
+        lambda s, d: posts_manager.get_users_of_posts(s, d.post_ids[:100])
+    ),
+    "posts.create_post": PlanCase(
+        lambda s, d: posts_manager.create_post(
+            s,
+            obj_in=CreatePostRequest(
+                title="plan",
+                description="plan",
+                content="plan",
+                user_id=d.user_ids[11],
+            ),
+        )
+    ),
+    "posts.update_post": PlanCase(
+        lambda s, d: posts_manager.update_post(
+            s,
+            post_id=d.post_ids[12],
+            obj_in=UpdatePostRequest(title="plan", user_id=d.user_ids[12]),
+        )
+    ),
+    "posts.delete_post": PlanCase(
+        lambda s, d: posts_manager.delete_post(s, post_id=d.post_ids[13])
+    ),
+    "posts.stream_posts": PlanCase(
+        lambda s, d: next(posts_manager.stream_posts(s, batch_size=100)),
+        allow_full_scan=frozenset({"posts", "users_and_posts", "users"}),
+    ),
+}
+
+
+@pytest.fixture(scope="module")
+def seeded_connection():
+    """Seeded rows live in a transaction that's rolled back afterwards"""
+    engine = create_engine(settings.TEST_DATABASE_URL)
+    connection = engine.connect()
+    transaction = connection.begin()
+
+    user_ids = [uuid.uuid4() for _ in range(SEED_ROWS)]
+    post_ids = [uuid.uuid4() for _ in range(SEED_ROWS)]
+    connection.execute(
+        insert(UsersORM),
+        [
+            {"id": user_id, "email": f"seed-{i}@example.com", "sms": f"seed-{i}"}
+            for i, user_id in enumerate(user_ids)
+        ],
+    )
+    connection.execute(
+        insert(PostsORM),
+        [{"id": post_id, "title": f"seed {i}"} for i, post_id in enumerate(post_ids)],
+    )
+    connection.execute(
+        insert(users_and_posts),
+        [
+            {"user_id": user_id, "post_id": post_id}
+            for user_id, post_id in zip(user_ids, post_ids)
+        ],
+    )
+    # Counts our own uncommitted rows, so the planner sees the seeded sizes
+    connection.exec_driver_sql("ANALYZE users, posts, users_and_posts")
+    connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+
+    middle_user_key = connection.execute(
+        select(UsersORM.created_at, UsersORM.id)
+        .order_by(UsersORM.created_at, UsersORM.id)
+        .offset(SEED_ROWS // 2)
+        .limit(1)
+    ).one()
+
+    yield connection, Seeded(
+        user_ids=user_ids,
+        post_ids=post_ids,
+        middle_user_key=tuple(middle_user_key),
+    )
+
+    transaction.rollback()
+    connection.close()
+    engine.dispose()
+
+
+def captured_statements(
+    connection: Connection, call: Callable[[], Any]
+) -> List[Tuple[str, Any]]:
+    statements: List[Tuple[str, Any]] = []
+
+    def before_cursor_execute(
+        _conn, _cursor, statement, parameters, _context, executemany
+    ):
+        if is_explainable(statement):
+            statements.append((statement, parameters[0] if executemany else parameters))
+
+    event.listen(connection, "before_cursor_execute", before_cursor_execute)
+    try:
+        call()
+    finally:
+        event.remove(connection, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+def row_estimate(connection: Connection, relation: str) -> float:
+    return connection.exec_driver_sql(
+        "SELECT reltuples FROM pg_class WHERE relname = %(relation)s",
+        {"relation": relation},
+    ).scalar_one()
+
+
+def scanned_rows(connection: Connection, node: Plan) -> float:
+    read = rows_read(node)
+    if read is not None:
+        return read
+    # Writes are planned but not analyzed, only a Seq Scan reads everything
+    if node["Node Type"] == SEQ_SCAN:
+        return row_estimate(connection, node["Relation Name"])
+    return 0
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_manager_query_plans(seeded_connection, name: str) -> None:
+    connection, seeded = seeded_connection
+    case = CASES[name]
+
+    # Manager commits only release a savepoint of the seeding transaction
+    with Session(
+        bind=connection,
+        join_transaction_mode="create_savepoint",
+        expire_on_commit=False,
+    ) as db_session:
+        statements = captured_statements(
+            connection, lambda: case.call(db_session, seeded)
+        )
+
+    assert statements, f"{name} sent no statements"
+    regressions = []
+    for position, (statement, parameters) in enumerate(statements):
+        is_read = statement.lstrip().upper().startswith("SELECT")
+        plan = explain(connection, statement, parameters, analyze=is_read)
+        for node in scan_nodes(plan):
+            relation = node["Relation Name"]
+            if position == 0 and relation in case.allow_full_scan:
+                continue
+            read = scanned_rows(connection, node)
+            if read > SCAN_ROW_THRESHOLD:
+                regressions.append(
+                    f"{node['Node Type']} on {relation} read {read:.0f} rows: "
+                    f"{statement}"
+                )
+
+    assert not regressions, "\n".join(regressions)
@@ -0,0 +1,177 @@
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from users_api import settings
+from users_api.api.deps.db import LAST_WRITE_COOKIE
+from users_api.api.middleware import ReadYourWritesMiddleware
+from users_api.api.posts import posts_router
+from users_api.api.users import users_router
+from users_api.db.connection import (
+    get_db_conn_DO_NOT_USE,
+    get_replica_db_conn_DO_NOT_USE,
+    set_db_conn,
+)
+from users_api.models.base import Base
+from users_api.models.orm.posts import PostsORM
+from users_api.models.orm.users import UsersORM
+
+TEST_AUTH_HEADERS = {"Authorization": "Bearer test_token"}
+
+
+def sqlite_engine(path: Path, email: str) -> Engine:
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with Session(bind=engine) as db_session:
+        db_session.add(UsersORM(id=uuid.uuid4(), email=email))
+        db_session.commit()
+    return engine
+
+
+@pytest.fixture
+def replica_client(tmp_path: Path):
+    """Primary and replica stand-ins, each seeded with a user only it has"""
+    original_db_conn = get_db_conn_DO_NOT_USE()
+    primary = sqlite_engine(tmp_path / "primary.db", "primary@example.com")
+    replica = sqlite_engine(tmp_path / "replica.db", "replica@example.com")
+    set_db_conn(primary, replicas=[replica])
+
+    replica_app = FastAPI()
+    replica_app.add_middleware(ReadYourWritesMiddleware)
+    replica_app.include_router(users_router, prefix="/users")
+    replica_app.include_router(posts_router, prefix="/posts")
+    try:
+        with TestClient(replica_app) as test_client:
+            yield test_client
+    finally:
+        set_db_conn(original_db_conn)
+        primary.dispose()
+        replica.dispose()
+
+
+def emails(client: TestClient) -> set:
+    response = client.get("/users/", headers=TEST_AUTH_HEADERS)
+    assert response.status_code == 200
+    return {user["email"] for user in response.json()["users"]}
+
+
+def test_reads_go_to_replica(replica_client: TestClient) -> None:
+    assert emails(replica_client) == {"replica@example.com"}
+
+
+def test_reads_after_write_stick_to_primary(replica_client: TestClient) -> None:
+    response = replica_client.post(
+        "/users/",
+        headers=TEST_AUTH_HEADERS,
+        json={"email": "new@example.com", "sms": "5551234567"},
+    )
+    assert response.status_code == 200
+    assert LAST_WRITE_COOKIE in response.cookies
+
+    assert emails(replica_client) == {"primary@example.com", "new@example.com"}
+
+
+def test_reads_return_to_replica_after_window(
+    replica_client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    replica_client.post(
+        "/users/",
+        headers=TEST_AUTH_HEADERS,
+        json={"email": "new@example.com", "sms": "5551234567"},
+    )
+    monkeypatch.setattr(settings, "READ_YOUR_WRITES_WINDOW_SECONDS", 0)
+
+    assert emails(replica_client) == {"replica@example.com"}
+
+
+@pytest.mark.parametrize(
+    "method, path, json",
+    [
+        # Routes returning a model
+        ("POST", "/users/", {"email": "new@example.com", "sms": "5551234567"}),
+        (
+            "POST",
+            "/users/bulk",
+            {"users": [{"email": "bulk@example.com", "sms": None}]},
+        ),
+        ("DELETE", "/users/{user_id}", None),
+        (
+            "POST",
+            "/posts/",
+            {
+                "title": "t",
+                "description": None,
+                "content": None,
+                "user_id": "{user_id}",
+            },
+        ),
+        ("PUT", "/posts/{post_id}", {"title": "updated", "user_id": "{user_id}"}),
+        # 204 without a body
+        ("DELETE", "/posts/{post_id}", None),
+        # Failed writes, answered by an exception handler
+        ("PUT", "/posts/{missing_id}", {"title": "updated", "user_id": "{user_id}"}),
+    ],
+)
+def test_every_write_sticks_reads_to_primary(
+    replica_client: TestClient,
+    method: str,
+    path: str,
+    json: Optional[Dict[str, Any]],
+) -> None:
+    primary = get_db_conn_DO_NOT_USE()
+    with Session(bind=primary) as db_session:
+        user = UsersORM(id=uuid.uuid4(), email="poster@example.com")
+        user.posts.append(PostsORM(id=uuid.uuid4(), title="t"))
+        db_session.add(user)
+        db_session.commit()
+        ids = {
+            "user_id": str(user.id),
+            "post_id": str(user.posts[0].id),
+            "missing_id": str(uuid.uuid4()),
+        }
+
+    if json:
+        json = {
+            key: value.format(**ids) if isinstance(value, str) else value
+            for key, value in json.items()
+        }
+    response = replica_client.request(
+        method, path.format(**ids), headers=TEST_AUTH_HEADERS, json=json
+    )
+    assert LAST_WRITE_COOKIE in response.cookies
+
+    with Session(bind=primary) as db_session:
+        primary_emails = {user.email for user in db_session.query(UsersORM)}
+    assert emails(replica_client) == primary_emails
+
+
+def test_stale_replica_reads_are_not_cached(replica_client: TestClient) -> None:
+    user_id = uuid.uuid4()
+    for engine in (get_db_conn_DO_NOT_USE(), get_replica_db_conn_DO_NOT_USE()):
+        with Session(bind=engine) as db_session:
+            db_session.add(UsersORM(id=user_id, email="lagging@example.com"))
+            db_session.commit()
+
+    response = replica_client.post(
+        "/users/",
+        headers=TEST_AUTH_HEADERS,
+        json={"email": "lagging@example.com", "sms": "5559876543"},
+    )
+    assert response.status_code == 200
+
+    # Another client, outside of the write's window, reads the replica
+    # before it caught up
+    stale = TestClient(replica_client.app).get(
+        f"/users/{user_id}", headers=TEST_AUTH_HEADERS
+    )
+    assert stale.json()["users"][0]["sms"] is None
+
+    response = replica_client.get(f"/users/{user_id}", headers=TEST_AUTH_HEADERS)
+    assert response.json()["users"][0]["sms"] == "5559876543"
@@ -0,0 +1,127 @@
+import asyncio
+import threading
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel, model_serializer
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from users_api.api.deps import db as db_deps
+from users_api.api.deps.db import get_db
+from users_api.api.router import UsersRouter
+from users_api.db.connection import get_db_conn_DO_NOT_USE, set_db_conn
+from users_api.db.executor import DBExecutor
+from users_api.db.session import LazySession
+
+
+class CheckedOutProbe(BaseModel):
+    """Records how many connections are checked out while being serialized"""
+
+    seen: List[int]
+
+    @model_serializer
+    def record(self) -> Dict[str, Any]:
+        self.seen.append(get_db_conn_DO_NOT_USE().pool.checkedout())
+        return {"checked_out": self.seen[-1]}
+
+
+class Body(BaseModel):
+    value: int
+
+
+@pytest.fixture
+def lazy_client(tmp_path: Path):
+    original_db_conn = get_db_conn_DO_NOT_USE()
+    engine = create_engine(f"sqlite:///{tmp_path / 'lazy.db'}")
+    set_db_conn(engine)
+
+    router = UsersRouter()
+
+    @router.get("/read")
+    def read(db_session: Session = Depends(get_db)) -> CheckedOutProbe:
+        db_session.execute(text("SELECT 1"))
+        return CheckedOutProbe(seen=[])
+
+    @router.post("/write")
+    async def write(body: Body, db_session: Session = Depends(get_db)) -> dict:
+        return {"value": body.value}
+
+    lazy_app = FastAPI()
+    lazy_app.include_router(router)
+    try:
+        with TestClient(lazy_app) as test_client:
+            yield test_client
+    finally:
+        set_db_conn(original_db_conn)
+        engine.dispose()
+
+
+def test_lazy_session_is_only_built_on_use() -> None:
+    built = []
+    lazy_session = LazySession(lambda: built.append(1) or Session())
+
+    assert not lazy_session.is_open
+    lazy_session.release()
+    assert built == []
+
+    lazy_session.add_all([])
+    assert lazy_session.is_open
+    assert built == [1]
+
+
+def test_no_session_for_invalid_request(
+    lazy_client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    built = []
+    monkeypatch.setattr(
+        db_deps, "Session", lambda **kwargs: built.append(1) or Session(**kwargs)
+    )
+
+    response = lazy_client.post("/write", json={"value": "not-an-int"})
+    assert response.status_code == 422
+
+    response = lazy_client.post("/write", json={"value": 1})
+    assert response.status_code == 200
+
+    assert built == []
+
+
+def test_connection_released_before_serialization(lazy_client: TestClient) -> None:
+    response = lazy_client.get("/read")
+    assert response.status_code == 200
+    assert response.json() == {"checked_out": 0}
+
+
+def test_release_waits_for_a_running_executor_call() -> None:
+    engine = create_engine("sqlite://")
+    lazy_session = LazySession(lambda: Session(bind=engine))
+    db_executor = DBExecutor(max_workers=1)
+    started, finish = threading.Event(), threading.Event()
+
+    def query(session: Session) -> bool:
+        started.set()
+        finish.wait()
+        return session.execute(text("SELECT 1")).scalar_one() == 1
+
+    async def cancel_mid_call() -> "asyncio.Future[bool]":
+        task = asyncio.ensure_future(db_executor.run_in_session(query, lazy_session))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        task.cancel()
+        # What UsersRouter does once the cancelled endpoint exits
+        lazy_session.release()
+        assert lazy_session.is_open
+        return task
+
+    try:
+        task = asyncio.run(cancel_mid_call())
+        assert task.cancelled()
+    finally:
+        finish.set()
+        db_executor.shutdown()
+        engine.dispose()
+
+    assert not lazy_session.is_open
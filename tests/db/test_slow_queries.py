@@ -0,0 +1,110 @@
+import datetime
+import uuid
+from types import SimpleNamespace
+from typing import Dict
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.engine import make_url
+
+from users_api import settings
+from users_api.db import slow_queries
+from users_api.db.query_metrics import track_queries
+from users_api.db.slow_queries import REDACTED, SlowQueryLog, redact
+from users_api.models.orm.users import UsersORM
+
+
+@pytest.fixture
+def postgres():
+    engine = create_engine(settings.TEST_DATABASE_URL)
+    yield engine
+    engine.dispose()
+
+
+def test_redact_keeps_only_values_without_pii() -> None:
+    user_id = uuid.uuid4()
+    at = datetime.datetime(2024, 1, 1)
+    parameters = {
+        "id_1": user_id,
+        "id_2": str(user_id),
+        "email_1": "someone@example.com",
+        "limit_1": 10,
+        "at": at,
+        "flag": True,
+        "missing": None,
+    }
+    assert redact(parameters) == {
+        "id_1": str(user_id),
+        "id_2": str(user_id),
+        "email_1": REDACTED,
+        "limit_1": 10,
+        "at": str(at),
+        "flag": True,
+        "missing": None,
+    }
+    assert redact(("5551110000", 3)) == [REDACTED, 3]
+    assert redact([{"sms": "5551110000"}, {"sms": "5551110001"}], executemany=True) == {
+        "rows": 2,
+        "first": {"sms": REDACTED},
+    }
+
+
+@pytest.mark.skipif(
+    make_url(settings.TEST_DATABASE_URL).get_backend_name() != "postgresql",
+    reason="EXPLAIN plans are only sampled on Postgres",
+)
+def test_slow_queries_are_logged_with_their_plan(postgres) -> None:
+    log = SlowQueryLog(
+        threshold_ms=0, max_entries=10, explain_sample_rate=0.5, sample=lambda: 0.0
+    ).attach(postgres, "primary")
+    route = SimpleNamespace(path="/users/{user_id}")
+
+    with postgres.connect() as connection, connection.begin():
+        with track_queries({"route": route}):
+            connection.execute(
+                select(UsersORM.id).where(UsersORM.email == "secret@example.com")
+            )
+
+    [slow_query] = log.entries()
+    assert slow_query["route"] == "/users/{user_id}"
+    assert slow_query["engine"] == "primary"
+    assert list(slow_query["parameters"].values()) == [REDACTED]
+    assert slow_query["plan"]["Node Type"]
+    assert "secret@example.com" not in str(slow_query)
+
+
+def test_slow_query_log_is_bounded(postgres) -> None:
+    log = SlowQueryLog(threshold_ms=0, max_entries=2).attach(postgres, "primary")
+
+    with postgres.connect() as connection:
+        for i in range(3):
+            connection.exec_driver_sql(f"SELECT {i}")
+
+    assert [entry["statement"] for entry in log.entries()] == ["SELECT 2", "SELECT 1"]
+    assert log.entries()[0]["route"] is None
+    assert log.entries()[0]["plan"] is None
+
+
+def test_failed_explain_keeps_the_transaction(postgres, monkeypatch) -> None:
+    def failing_explain(conn, statement, parameters, analyze):
+        conn.exec_driver_sql("SELECT 1 / 0")
+
+    monkeypatch.setattr(slow_queries, "explain", failing_explain)
+    log = SlowQueryLog(
+        threshold_ms=0, max_entries=10, explain_sample_rate=1, sample=lambda: 0.0
+    ).attach(postgres, "primary")
+
+    with postgres.connect() as connection, connection.begin():
+        connection.exec_driver_sql("SELECT 1")
+        assert connection.exec_driver_sql("SELECT 2").scalar() == 2
+
+    assert [entry["plan"] for entry in log.entries()] == [None, None]
+
+
+def test_slow_queries_endpoint(
+    client: TestClient, internal_headers: Dict[str, str]
+) -> None:
+    response = client.get("/internal/slow-queries", headers=internal_headers)
+    assert response.status_code == 200
+    assert isinstance(response.json(), list)
@@ -0,0 +1,44 @@
+import uuid
+import warnings
+from pathlib import Path
+
+import pytest
+from sqlalchemy import Column, create_engine, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.cache_key import NO_CACHE
+
+from users_api.db.compiled_cache_metrics import CompiledCacheMetrics
+from users_api.managers.users import users_manager
+from users_api.models.base import Base
+
+ALL_COLUMNS = [
+    column for table in Base.metadata.sorted_tables for column in table.columns
+]
+
+
+@pytest.mark.parametrize("column", ALL_COLUMNS, ids=str)
+def test_column_types_are_cache_safe(column: Column) -> None:
+    """
+    A TypeDecorator without `cache_ok = True` silently disables SQLAlchemy's
+    compiled statement cache for every statement that touches its column.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert column.type._static_cache_key is not NO_CACHE
+
+    assert select(column)._generate_cache_key() is not None
+
+
+def test_compiled_cache_metrics_count_hits(tmp_path: Path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    Base.metadata.create_all(bind=engine)
+    metrics = CompiledCacheMetrics("test").attach(engine)
+
+    with Session(bind=engine) as db_session:
+        for _ in range(3):
+            users_manager.get(db_session=db_session, id=uuid.uuid4())
+
+    snapshot = metrics.snapshot()
+    assert snapshot["misses"] == 1
+    assert snapshot["hits"] == 2
+    assert snapshot["no_cache_key"] == 0
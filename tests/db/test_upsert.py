@@ -0,0 +1,115 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, delete, func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from users_api import settings
+from users_api.managers.users import plan_bulk_upsert, users_manager
+from users_api.models.base import Base
+from users_api.models.orm.users import UsersORM
+from users_api.schemas.users import CreateUsersRequest
+
+
+@pytest.fixture(params=["postgresql", "sqlite"])
+def engine(request: pytest.FixtureRequest, tmp_path: Path):
+    """Committing engine, unlike the transaction-per-module client fixture"""
+    if request.param == "sqlite":
+        engine = create_engine(f"sqlite:///{tmp_path / 'upsert.db'}")
+    else:
+        engine = create_engine(settings.TEST_DATABASE_URL)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def upsert(engine: Engine, email: str, sms: str) -> uuid.UUID:
+    with Session(bind=engine, expire_on_commit=False) as db_session:
+        user = users_manager.create_or_update(
+            db_session, obj_in=CreateUsersRequest(email=email, sms=sms)
+        )
+        return user.id
+
+
+def test_parallel_upserts_create_one_user(engine: Engine) -> None:
+    email = f"{uuid.uuid4()}@example.com"
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            user_ids = set(
+                pool.map(lambda i: upsert(engine, email, f"{email}-{i}"), range(32))
+            )
+
+        with Session(bind=engine) as db_session:
+            count = db_session.scalar(
+                select(func.count())
+                .select_from(UsersORM)
+                .where(UsersORM.email == email)
+            )
+        assert count == 1
+        assert len(user_ids) == 1
+    finally:
+        with Session(bind=engine) as db_session:
+            db_session.execute(delete(UsersORM).where(UsersORM.email == email))
+            db_session.commit()
+
+
+def test_upsert_matches_on_sms_without_email(engine: Engine) -> None:
+    sms = uuid.uuid4().hex
+    try:
+        assert upsert(engine, None, sms) == upsert(engine, None, sms)
+    finally:
+        with Session(bind=engine) as db_session:
+            db_session.execute(delete(UsersORM).where(UsersORM.sms == sms))
+            db_session.commit()
+
+
+def test_upsert_matches_on_sms_without_an_email_match(engine: Engine) -> None:
+    email, sms = f"{uuid.uuid4()}@example.com", uuid.uuid4().hex
+    try:
+        assert upsert(engine, email, sms) == upsert(engine, f"other-{email}", sms)
+    finally:
+        with Session(bind=engine) as db_session:
+            db_session.execute(delete(UsersORM).where(UsersORM.sms == sms))
+            db_session.commit()
+
+
+def test_upsert_rejects_taking_another_users_sms(engine: Engine) -> None:
+    emails = [f"{uuid.uuid4()}@example.com" for _ in range(2)]
+    smses = [uuid.uuid4().hex for _ in range(2)]
+    try:
+        for email, sms in zip(emails, smses):
+            upsert(engine, email, sms)
+        with pytest.raises(HTTPException) as exc_info:
+            upsert(engine, emails[0], smses[1])
+        assert exc_info.value.status_code == 409
+    finally:
+        with Session(bind=engine) as db_session:
+            db_session.execute(delete(UsersORM).where(UsersORM.sms.in_(smses)))
+            db_session.commit()
+
+
+def test_plan_bulk_upsert_reports_conflicts() -> None:
+    holder = {"id": uuid.uuid4(), "email": "a@example.com", "sms": "1"}
+    other = {"id": uuid.uuid4(), "email": "b@example.com", "sms": "2"}
+    plan = plan_bulk_upsert(
+        [
+            CreateUsersRequest(email="a@example.com", sms="2"),
+            CreateUsersRequest(email="c@example.com", sms="1"),
+            CreateUsersRequest(email="a@example.com", sms="3"),
+        ],
+        [type("Row", (), {"_mapping": row})() for row in (holder, other)],
+    )
+
+    assert [result.status for result in plan.results] == [
+        "conflict",
+        "updated",
+        # The second item moved a@example.com off the holder
+        "created",
+    ]
+    assert [row["id"] for row in plan.updates] == [holder["id"]]
+    assert plan.updates[0]["email"] == "c@example.com"
+    assert [row["email"] for row in plan.inserts] == ["a@example.com"]
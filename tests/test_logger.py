@@ -0,0 +1,92 @@
+import io
+import json
+import logging
+import queue
+
+import pytest
+from fastapi.testclient import TestClient
+
+from users_api import settings
+from users_api.logger import (
+    DebugSampler,
+    JsonFormatter,
+    RequestQueueHandler,
+    configure_logging,
+    request_id,
+    stop_logging,
+)
+
+
+@pytest.fixture
+def log_output(monkeypatch):
+    monkeypatch.setattr(settings, "LOG_LEVEL", "DEBUG")
+    monkeypatch.setattr(settings, "LOG_DEBUG_SAMPLE_RATE", 0.0)
+    output = io.StringIO()
+    configure_logging(output)
+    yield output
+    stop_logging()
+    configure_logging()
+
+
+def lines(output: io.StringIO):
+    return [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_records_are_written_as_json_lines(log_output) -> None:
+    # Configuring again replaces the handler instead of adding another one
+    configure_logging(log_output)
+    logger = logging.getLogger("users_api.test")
+
+    token = request_id.set("abc123")
+    try:
+        logger.info("Created %s", "thing", extra={"user_id": 7})
+    finally:
+        request_id.reset(token)
+    logger.debug("Sampled out")
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("Failed")
+    stop_logging()
+
+    created, failed = lines(log_output)
+    assert created["message"] == "Created thing"
+    assert created["level"] == "INFO"
+    assert created["logger"] == "users_api.test"
+    assert created["request_id"] == "abc123"
+    assert created["user_id"] == 7
+    assert failed["request_id"] is None
+    assert "ValueError: boom" in failed["exception"]
+
+
+def test_debug_sampler() -> None:
+    sampler = DebugSampler(0.1, sample=iter([0.05, 0.5]).__next__)
+    debug = logging.LogRecord("x", logging.DEBUG, "", 0, "debug", None, None)
+    warning = logging.LogRecord("x", logging.WARNING, "", 0, "warning", None, None)
+
+    assert sampler.filter(debug)
+    assert not sampler.filter(debug)
+    assert sampler.filter(warning)
+
+
+def test_full_queue_drops_records() -> None:
+    handler = RequestQueueHandler(queue.Queue(1))
+    record = logging.LogRecord("x", logging.INFO, "", 0, "message", None, None)
+    handler.handle(record)
+    handler.handle(record)
+    assert handler.dropped == 1
+
+
+def test_json_formatter_serializes_any_extra() -> None:
+    record = logging.LogRecord("x", logging.INFO, "", 0, "message", None, None)
+    record.payload = object()
+    assert json.loads(JsonFormatter().format(record))["payload"].startswith("<object")
+
+
+def test_request_id_header(client: TestClient) -> None:
+    response = client.get("/health", headers={"X-Request-ID": "from-caller"})
+    assert response.headers["x-request-id"] == "from-caller"
+
+    generated = client.get("/health").headers["x-request-id"]
+    assert len(generated) == 32
+    assert client.get("/health").headers["x-request-id"] != generated
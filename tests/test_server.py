@@ -0,0 +1,71 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine
+
+from users_api import settings
+from users_api.db.connection import get_all_db_conns, set_db_conn
+from users_api.server import apply_connection_budget, available_cpus, pool_sizes
+
+
+def test_pool_sizes_split_the_budget_in_the_configured_ratio() -> None:
+    assert pool_sizes(200, 4, 1, pool_size=32, max_overflow=64) == (16, 34)
+    # Async mode, a sync and an async engine per worker
+    pool_size, max_overflow = pool_sizes(200, 4, 2, pool_size=32, max_overflow=64)
+    assert (pool_size + max_overflow) * 4 * 2 <= 200
+
+
+def test_pool_sizes_keep_one_pooled_connection() -> None:
+    assert pool_sizes(6, 3, 1, pool_size=1, max_overflow=64) == (1, 1)
+
+
+def test_pool_sizes_reject_a_budget_below_one_per_engine() -> None:
+    with pytest.raises(ValueError):
+        pool_sizes(3, 4, 1, pool_size=32, max_overflow=64)
+
+
+def test_apply_connection_budget(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "DB_CONNECTION_BUDGET", 100)
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 32)
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 64)
+    monkeypatch.setattr(settings, "IS_ASYNC_DATABASE", False)
+    monkeypatch.setenv("DB_POOL_SIZE", "32")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "64")
+
+    apply_connection_budget(workers=5)
+
+    assert (settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW) == (6, 14)
+    assert (os.environ["DB_POOL_SIZE"], os.environ["DB_MAX_OVERFLOW"]) == ("6", "14")
+
+
+def test_available_cpus_honours_the_cgroup_quota(tmp_path) -> None:
+    cpus = len(os.sched_getaffinity(0))
+    cpu_max = tmp_path / "cpu.max"
+
+    cpu_max.write_text("max 100000\n")
+    assert available_cpus(str(cpu_max)) == cpus
+    cpu_max.write_text("50000 100000\n")
+    assert available_cpus(str(cpu_max)) == 1
+    cpu_max.write_text("100000000 100000\n")
+    assert available_cpus(str(cpu_max)) == cpus
+    assert available_cpus(str(tmp_path / "missing")) == cpus
+
+
+def test_forked_child_drops_the_inherited_pool() -> None:
+    engine = create_engine(settings.TEST_DATABASE_URL)
+    engine.connect().close()
+    assert engine.pool.checkedin() == 1
+
+    previous = get_all_db_conns()
+    set_db_conn(engine)
+    try:
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover, the child
+            os._exit(0 if engine.pool.checkedin() == 0 else 1)
+        _, status = os.waitpid(pid, 0)
+    finally:
+        set_db_conn(previous[0] if previous else None, replicas=previous[1:])
+    assert os.waitstatus_to_exitcode(status) == 0
+    # The parent's connection is untouched
+    assert engine.pool.checkedin() == 1
+    engine.dispose()
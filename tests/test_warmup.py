@@ -0,0 +1,105 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import Session
+
+from users_api import settings
+from users_api.db.compiled_cache_metrics import CompiledCacheMetrics
+from users_api.managers.posts import posts_manager
+from users_api.managers.users import users_manager
+from users_api.models.orm.posts import PostsORM
+from users_api.models.orm.users import UsersORM
+from users_api.warmup import (
+    WarmUpState,
+    open_connections,
+    warm_up,
+    warm_up_engine,
+)
+
+
+@pytest.fixture
+def fresh_engine():
+    """An engine with an empty pool and compiled cache"""
+    engine = create_engine(settings.TEST_DATABASE_URL, pool_size=5)
+    yield engine
+    engine.dispose()
+
+
+def test_open_connections_fills_the_pool(fresh_engine) -> None:
+    open_connections(fresh_engine, 3)
+    assert fresh_engine.pool.checkedin() == 3
+    assert fresh_engine.pool.checkedout() == 0
+
+
+def test_warmed_up_queries_are_compiled_cache_hits(fresh_engine) -> None:
+    metrics = CompiledCacheMetrics("warm-up").attach(fresh_engine)
+    warm_up_engine(fresh_engine, connections=1, writes=True)
+    assert metrics.misses > 0
+    misses = metrics.misses
+
+    with Session(bind=fresh_engine) as db_session:
+        users_manager.get(db_session, id=uuid.uuid4())
+        users_manager.get_page(db_session, limit=10)
+        posts_manager.get_posts_page(db_session, limit=10)
+        posts_manager.get_post_version(db_session, post_id=uuid.uuid4())
+
+    assert metrics.misses == misses
+    assert metrics.hits >= 4
+
+
+def test_warm_up_writes_nothing(fresh_engine) -> None:
+    def counts():
+        with Session(bind=fresh_engine) as db_session:
+            return [
+                db_session.scalar(select(func.count()).select_from(model))
+                for model in (UsersORM, PostsORM)
+            ]
+
+    before = counts()
+    warm_up_engine(fresh_engine, connections=1, writes=True)
+    assert counts() == before
+
+
+@pytest.fixture
+def warm_up_on(fresh_engine, monkeypatch: pytest.MonkeyPatch):
+    """Points warm_up() at fresh_engine alone instead of DATABASE_URL's engines"""
+    monkeypatch.setattr(settings, "IS_ASYNC_DATABASE", False)
+    monkeypatch.setattr("users_api.warmup.get_all_db_conns", lambda: [fresh_engine])
+    monkeypatch.setattr("users_api.warmup.get_all_async_db_conns", lambda: [])
+    return fresh_engine
+
+
+def test_warm_up_only_reads_by_default(client: TestClient, warm_up_on) -> None:
+    statements = []
+    event.listen(
+        warm_up_on,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    state = WarmUpState()
+    asyncio.run(warm_up(client.app, state))
+
+    assert not state.failures
+    assert statements
+    assert not [
+        statement
+        for statement in statements
+        if statement.lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE"))
+    ]
+
+
+def test_health_is_ready_once_warmed_up(
+    client: TestClient, warm_up_on, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    state = WarmUpState()
+    monkeypatch.setattr("users_api.api.routes.warm_up_state", state)
+    assert client.get("/health").status_code == 503
+    assert client.get("/").status_code == 200
+
+    asyncio.run(warm_up(client.app, state))
+    assert state.duration is not None
+    assert not state.failures
+    assert client.get("/health").status_code == 200
@@ -0,0 +1,165 @@
+from typing import AsyncIterator, Callable, Union
+from uuid import UUID
+from fastapi import Depends
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
+from users_api import settings
+from users_api.api.deps.db import (
+    get_async_db,
+    get_async_read_db,
+    get_async_streaming_db,
+)
+from users_api.api.deps.fields import Fields, get_post_fields
+from users_api.api.deps.pagination import PageParams, get_page_params
+from users_api.api.etags import conditional, has_validators
+from users_api.api.etags import post_orm_version, post_row_version, post_version
+from users_api.api.responses import RowsResponse
+
+from users_api.api.router import UsersRouter
+from users_api.api.streaming import ndjson_chunk, ndjson_response
+from users_api.models.orm.posts import PostsORM
+from users_api.models.posts import Post
+from users_api.schemas.helpers import post_response, posts_page, posts_payload
+from users_api.schemas.helpers import partial_posts_page
+from users_api.schemas.pagination import encode_cursor
+from users_api.schemas.posts import CreatePostRequest, PostsResponse, UpdatePostRequest
+from users_api.managers.base import Page
+from users_api.managers.posts import async_posts_manager
+
+async_posts_router = UsersRouter()
+
+
+@async_posts_router.get("/", response_model=PostsResponse)
+async def get_posts(
+    request: Request,
+    response: Response,
+    page_params: PageParams = Depends(get_page_params),
+    fields: Fields = Depends(get_post_fields),
+    db: AsyncSession = Depends(get_async_read_db),
+) -> Union[PostsResponse, Response]:
+
+    if fields:
+        rows = await async_posts_manager.get_posts_page_fields(
+            db, fields, after=page_params.after, limit=page_params.limit
+        )
+        unchanged = conditional(
+            request,
+            response,
+            map(post_row_version, rows.items),
+            more=bool(rows.next_key),
+            fields=fields,
+        )
+        if unchanged:
+            return unchanged
+
+        users = (
+            await async_posts_manager.get_users_of_posts(
+                db, [row.id for row in rows.items]
+            )
+            if "user" in fields
+            else {}
+        )
+        return RowsResponse(
+            partial_posts_page(
+                rows.items,
+                fields,
+                users,
+                encode_cursor(rows.next_key) if rows.next_key else None,
+            ),
+            headers=response.headers,
+        )
+
+    if has_validators(request):
+        versions = await async_posts_manager.get_posts_page_versions(
+            db, after=page_params.after, limit=page_params.limit
+        )
+        unchanged = conditional(
+            request,
+            response,
+            map(post_row_version, versions.items),
+            more=bool(versions.next_key),
+        )
+        if unchanged:
+            return unchanged
+
+    page: Page[PostsORM] = await async_posts_manager.get_posts_page(
+        db, after=page_params.after, limit=page_params.limit
+    )
+
+    unchanged = conditional(
+        request, response, map(post_orm_version, page.items), more=bool(page.next_key)
+    )
+    if unchanged:
+        return unchanged
+
+    return RowsResponse(
+        posts_page(page.items, encode_cursor(page.next_key) if page.next_key else None),
+        headers=response.headers,
+    )
+
+
+@async_posts_router.post("/")
+async def create_post(
+    post_in: CreatePostRequest, db: AsyncSession = Depends(get_async_db)
+) -> Post:
+
+    created_post: PostsORM = await async_posts_manager.create_post(db, post_in)
+
+    return post_response(post=created_post)
+
+
+@async_posts_router.get("/export")
+async def export_posts(
+    request: Request,
+    open_session: Callable[[], AsyncSession] = Depends(get_async_streaming_db),
+) -> StreamingResponse:
+    async def chunks() -> AsyncIterator[bytes]:
+        async with open_session() as db_session:
+            async for batch in async_posts_manager.stream_posts(
+                db_session, batch_size=settings.EXPORT_BATCH_SIZE
+            ):
+                yield ndjson_chunk(posts_payload(batch))
+
+    return ndjson_response(request, chunks())
+
+
+@async_posts_router.get("/{post_id}", response_model=Post)
+async def get_post(
+    post_id: UUID,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_read_db),
+) -> Union[Post, Response]:
+    post = async_posts_manager.cached_post(post_id)
+
+    if post is None and has_validators(request):
+        version = await async_posts_manager.get_post_version(db, post_id=post_id)
+        unchanged = version and conditional(
+            request, response, [post_row_version(version)]
+        )
+        if unchanged:
+            return unchanged
+
+    post = post or await async_posts_manager.load_post(db, post_id=post_id)
+
+    return conditional(request, response, [post_version(post)]) or post
+
+
+@async_posts_router.put("/{post_id}")
+async def update_post(
+    post_id: UUID,
+    post_in: UpdatePostRequest,
+    db_session: AsyncSession = Depends(get_async_db),
+) -> Post:
+
+    return await async_posts_manager.update_post(
+        db_session=db_session, post_id=post_id, obj_in=post_in
+    )
+
+
+@async_posts_router.delete("/{post_id}", status_code=204)
+async def delete_post(
+    post_id: UUID, db_session: AsyncSession = Depends(get_async_db)
+) -> None:
+    await async_posts_manager.delete_post(db_session, post_id)
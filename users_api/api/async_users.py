@@ -0,0 +1,197 @@
+from typing import AsyncIterator, Callable, Union
+from uuid import UUID
+from fastapi import Depends
+from fastapi import HTTPException
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
+
+from users_api import settings
+from users_api.api.deps.db import (
+    get_async_db,
+    get_async_read_db,
+    get_async_streaming_db,
+)
+from users_api.api.deps.fields import Fields, get_user_fields
+from users_api.api.deps.pagination import PageParams, get_page_params
+from users_api.api.etags import conditional, has_validators, user_version
+from users_api.api.responses import RowsResponse
+from users_api.api.router import UsersRouter
+from users_api.api.streaming import ndjson_chunk, ndjson_response
+from users_api.models.users import User
+from users_api.schemas.helpers import bulk_users_response, users_page, users_payload
+from users_api.schemas.helpers import partial_users_page
+from users_api.schemas.pagination import encode_cursor
+from users_api.schemas.users import BulkCreateUsersRequest, BulkUsersResponse
+from users_api.schemas.users import CreateUsersRequest, DeleteUserResponse
+from users_api.schemas.users import UsersResponse
+
+from users_api.managers.users import async_users_manager
+from users_api.models.orm.users import UsersORM
+
+async_users_router = UsersRouter()
+
+
+@async_users_router.get("/", response_model=UsersResponse)
+async def get_users(
+    request: Request,
+    response: Response,
+    page_params: PageParams = Depends(get_page_params),
+    fields: Fields = Depends(get_user_fields),
+    db_session: AsyncSession = Depends(get_async_read_db),
+) -> Union[UsersResponse, Response]:
+    try:
+        if fields:
+            rows = await async_users_manager.get_page_fields(
+                db_session,
+                fields,
+                after=page_params.after,
+                limit=page_params.limit,
+            )
+            unchanged = conditional(
+                request,
+                response,
+                map(user_version, rows.items),
+                more=bool(rows.next_key),
+                fields=fields,
+            )
+            if unchanged:
+                return unchanged
+
+            return RowsResponse(
+                partial_users_page(
+                    rows.items,
+                    fields,
+                    encode_cursor(rows.next_key) if rows.next_key else None,
+                ),
+                headers=response.headers,
+            )
+
+        if has_validators(request):
+            versions = await async_users_manager.get_page_versions(
+                db_session=db_session, after=page_params.after, limit=page_params.limit
+            )
+            unchanged = conditional(
+                request,
+                response,
+                map(user_version, versions.items),
+                more=bool(versions.next_key),
+            )
+            if unchanged:
+                return unchanged
+
+        page = await async_users_manager.get_page(
+            db_session=db_session, after=page_params.after, limit=page_params.limit
+        )
+
+        unchanged = conditional(
+            request, response, map(user_version, page.items), more=bool(page.next_key)
+        )
+        if unchanged:
+            return unchanged
+
+        return RowsResponse(
+            users_page(
+                page.items, encode_cursor(page.next_key) if page.next_key else None
+            ),
+            headers=response.headers,
+        )
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@async_users_router.get("/export")
+async def export_users(
+    request: Request,
+    open_session: Callable[[], AsyncSession] = Depends(get_async_streaming_db),
+) -> StreamingResponse:
+    async def chunks() -> AsyncIterator[bytes]:
+        async with open_session() as db_session:
+            async for batch in async_users_manager.stream(
+                db_session, batch_size=settings.EXPORT_BATCH_SIZE
+            ):
+                yield ndjson_chunk(users_payload(batch))
+
+    return ndjson_response(request, chunks())
+
+
+@async_users_router.get("/{user_id}", response_model=UsersResponse)
+async def get_user(
+    user_id: UUID,
+    request: Request,
+    response: Response,
+    db_session: AsyncSession = Depends(get_async_read_db),
+) -> Union[UsersResponse, Response]:
+    try:
+        user = async_users_manager.cached_user(user_id)
+
+        if user is None and has_validators(request):
+            version = await async_users_manager.get_version(db_session, id=user_id)
+            unchanged = version and conditional(
+                request, response, [user_version(version)]
+            )
+            if unchanged:
+                return unchanged
+
+        user = user or await async_users_manager.load_user(db_session, id=user_id)
+
+        if not user:
+            return UsersResponse(message=f"User {user_id} not found.")
+
+        unchanged = conditional(request, response, [user_version(user)])
+        if unchanged:
+            return unchanged
+
+        return UsersResponse(users=[user])
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@async_users_router.post("/")
+async def post_user(
+    request: CreateUsersRequest, db_session: AsyncSession = Depends(get_async_db)
+) -> UsersResponse:
+    try:
+
+        user: UsersORM = await async_users_manager.create_or_update(
+            db_session=db_session, obj_in=request
+        )
+        return UsersResponse(users=[User.model_validate(user)])
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@async_users_router.post("/bulk")
+async def post_users_bulk(
+    request: BulkCreateUsersRequest, db_session: AsyncSession = Depends(get_async_db)
+) -> BulkUsersResponse:
+    try:
+        results = await async_users_manager.bulk_create_or_update(
+            db_session=db_session,
+            items=request.users,
+            batch_size=settings.BULK_BATCH_SIZE,
+        )
+        return bulk_users_response(results)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@async_users_router.delete("/{user_id}")
+async def delete_user(
+    user_id: UUID, db_session: AsyncSession = Depends(get_async_db)
+) -> DeleteUserResponse:
+    try:
+        await async_users_manager.delete_user(db_session=db_session, id=user_id)
+
+        return DeleteUserResponse(status=f"Successfully deleted user: {user_id}")
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
@@ -1,38 +1,137 @@
 # Dependency
-from typing import Generator, Optional
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, AsyncIterator, Callable, Generator, Optional
 
 from fastapi import Depends
 from sqlalchemy.engine import Engine as Database
+from sqlalchemy.ext.asyncio import AsyncEngine as AsyncDatabase
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from starlette.requests import Request
 
-from users_api.db.connection import get_db_conn_DO_NOT_USE
+from users_api import settings
+from users_api.db.connection import (
+    get_async_db_conn_DO_NOT_USE,
+    get_async_replica_db_conn_DO_NOT_USE,
+    get_db_conn_DO_NOT_USE,
+    get_replica_db_conn_DO_NOT_USE,
+)
+from users_api.db.session import REPLICA_INFO, LazySession
 
+# Set on responses to writes (see api.middleware.ReadYourWritesMiddleware) so
+# follow-up reads from the same client can be pinned to the primary until
+# replicas have caught up.
+LAST_WRITE_COOKIE = "users_api_last_write"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
 
-def get_db(
-    request: Request, db_conn: Optional[Database] = Depends(get_db_conn_DO_NOT_USE)
-) -> Generator[Session, None, None]:
-    db_session = Session(
-        autocommit=False, autoflush=False, bind=db_conn, expire_on_commit=False
-    )
-    request.state.db_session = db_session
 
+def wrote_recently(request: Request) -> bool:
     try:
-        yield db_session
+        last_write = float(request.cookies.get(LAST_WRITE_COOKIE, 0))
+    except ValueError:
+        return False
+    return time.time() - last_write < settings.READ_YOUR_WRITES_WINDOW_SECONDS
+
+
+def get_read_db_conn(request: Request) -> Optional[Database]:
+    if wrote_recently(request):
+        return get_db_conn_DO_NOT_USE()
+    return get_replica_db_conn_DO_NOT_USE()
+
+
+def get_async_read_db_conn(request: Request) -> Optional[AsyncDatabase]:
+    if wrote_recently(request):
+        return get_async_db_conn_DO_NOT_USE()
+    return get_async_replica_db_conn_DO_NOT_USE()
+
+
+def _session_scope(
+    request: Request, db_conn: Optional[Database], replica: bool = False
+) -> Generator[LazySession, None, None]:
+    def open_session() -> Session:
+        db_session = Session(
+            autocommit=False,
+            autoflush=False,
+            bind=db_conn,
+            expire_on_commit=False,
+            info={REPLICA_INFO: replica},
+        )
+        request.state.db_session = db_session
+        return db_session
+
+    # Only builds the Session once the handler uses it, see LazySession
+    lazy_session = LazySession(open_session)
+
+    try:
+        yield lazy_session
     finally:
-        db_session.close()
-
-
-#### Attempting AsyncSessions .... to much work right now lol
-
-# async def get_db(
-#     request: Request, db_conn: Optional[AsyncEngine] = Depends(get_db_conn_DO_NOT_USE)
-# ) -> AsyncGenerator[AsyncSession, None]:
-#     async with AsyncSession(
-#         bind=db_conn, autocommit=False, autoflush=False, expire_on_commit=False
-#     ) as db_session:
-#         request.state.db_session = db_session
-#         try:
-#             yield db_session
-#         finally:
-#             await db_session.close()
+        lazy_session.release()
+
+
+@asynccontextmanager
+async def _async_session_scope(
+    request: Request, db_conn: Optional[AsyncDatabase], replica: bool = False
+) -> AsyncIterator[AsyncSession]:
+    async with AsyncSession(
+        bind=db_conn,
+        autoflush=False,
+        expire_on_commit=False,
+        info={REPLICA_INFO: replica},
+    ) as db_session:
+        request.state.db_session = db_session
+        yield db_session
+
+
+def get_db(
+    request: Request,
+    db_conn: Optional[Database] = Depends(get_db_conn_DO_NOT_USE),
+) -> Generator[LazySession, None, None]:
+    """Session on the primary. Use for any route that writes."""
+    yield from _session_scope(request, db_conn)
+
+
+def get_read_db(
+    request: Request, db_conn: Optional[Database] = Depends(get_read_db_conn)
+) -> Generator[LazySession, None, None]:
+    """
+    Session on a replica, or on the primary if this client wrote within
+    READ_YOUR_WRITES_WINDOW_SECONDS. Only use for read-only routes.
+    """
+    replica = db_conn is not get_db_conn_DO_NOT_USE()
+    yield from _session_scope(request, db_conn, replica)
+
+
+def get_streaming_db(
+    db_conn: Optional[Database] = Depends(get_read_db_conn),
+) -> Callable[[], Session]:
+    """
+    Session factory for StreamingResponse bodies. Dependencies are torn down
+    before the body is sent, so the body has to open (and close) its own
+    Session on the read engine.
+    """
+    return lambda: Session(bind=db_conn, autoflush=False, expire_on_commit=False)
+
+
+def get_async_streaming_db(
+    db_conn: Optional[AsyncDatabase] = Depends(get_async_read_db_conn),
+) -> Callable[[], AsyncSession]:
+    """AsyncSession counterpart of get_streaming_db"""
+    return lambda: AsyncSession(bind=db_conn, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db(
+    request: Request,
+    db_conn: Optional[AsyncDatabase] = Depends(get_async_db_conn_DO_NOT_USE),
+) -> AsyncGenerator[AsyncSession, None]:
+    async with _async_session_scope(request, db_conn) as db_session:
+        yield db_session
+
+
+async def get_async_read_db(
+    request: Request,
+    db_conn: Optional[AsyncDatabase] = Depends(get_async_read_db_conn),
+) -> AsyncGenerator[AsyncSession, None]:
+    replica = db_conn is not get_async_db_conn_DO_NOT_USE()
+    async with _async_session_scope(request, db_conn, replica) as db_session:
+        yield db_session
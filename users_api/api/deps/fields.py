@@ -0,0 +1,47 @@
+from typing import Callable, Optional, Tuple, Type
+
+from fastapi import HTTPException, Query, status
+from pydantic import BaseModel
+
+from users_api.models.posts import Post
+from users_api.models.users import User
+
+# Requested payload fields, None for all of them
+Fields = Optional[Tuple[str, ...]]
+
+
+def parse_fields(model: Type[BaseModel], fields: Optional[str]) -> Fields:
+    """
+    Comma separated `fields` in the payload's field order, without
+    duplicates. Raises ValueError for names `model` doesn't have.
+    """
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested.difference(model.model_fields)
+    if unknown:
+        raise ValueError(
+            f"Unknown fields: {', '.join(sorted(unknown))}. "
+            f"Allowed: {', '.join(model.model_fields)}"
+        )
+    return tuple(name for name in model.model_fields if name in requested) or None
+
+
+def fields_param(model: Type[BaseModel]) -> Callable[[Optional[str]], Fields]:
+    def get_fields(
+        fields: Optional[str] = Query(
+            None, description=f"Comma separated {model.__name__} fields to return"
+        ),
+    ) -> Fields:
+        try:
+            return parse_fields(model, fields)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+            ) from e
+
+    return get_fields
+
+
+get_user_fields = fields_param(User)
+get_post_fields = fields_param(Post)
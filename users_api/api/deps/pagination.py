@@ -0,0 +1,26 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import HTTPException, Query, status
+
+from users_api import settings
+from users_api.schemas.pagination import KeysetKey, decode_cursor
+
+
+@dataclass
+class PageParams:
+    after: Optional[KeysetKey]
+    limit: int
+
+
+def get_page_params(
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+) -> PageParams:
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+        ) from e
+    return PageParams(after=after, limit=limit)
@@ -0,0 +1,106 @@
+import datetime
+import hashlib
+from typing import Iterable, Optional, Protocol, Sequence, Tuple
+from uuid import UUID
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from users_api.models.orm.posts import PostsORM
+from users_api.models.posts import Post
+
+# What a payload's ETag is derived from, (id, last_updated, ...)
+Version = Tuple[object, ...]
+
+
+class UserVersioned(Protocol):
+    @property
+    def id(self) -> Optional[UUID]: ...
+
+    @property
+    def last_updated(self) -> Optional[datetime.datetime]: ...
+
+
+class PostVersioned(UserVersioned, Protocol):
+    @property
+    def user_last_updated(self) -> Optional[datetime.datetime]: ...
+
+
+def etag(
+    versions: Iterable[Version], *, more: bool = False, fields: Sequence[str] = ()
+) -> str:
+    """
+    Strong ETag of one or more payloads. `more` tells whether a page has a
+    next page, which changes its next_cursor but none of its items.
+    `fields` of a sparse fieldset make it another representation.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(",".join(fields).encode() + b"\n")
+    for version in versions:
+        digest.update("|".join(str(part) for part in version).encode() + b"\n")
+    digest.update(b"more" if more else b"last")
+    return f'"{digest.hexdigest()}"'
+
+
+def user_version(user: UserVersioned) -> Version:
+    """Of a User, a UsersORM or a versions() row"""
+    return (user.id, user.last_updated)
+
+
+def post_version(post: Post) -> Version:
+    """
+    A Post embeds the most recently updated of its users (see
+    schemas.helpers.embedded_user), whose last_updated is the latest of them
+    """
+    return (post.id, post.last_updated, post.user.last_updated)
+
+
+def post_orm_version(post: PostsORM) -> Version:
+    """post_version() of the payload post_response() would build"""
+    users_last_updated = max(
+        (user.last_updated for user in post.users if user.last_updated is not None),
+        default=None,
+    )
+    return (post.id, post.last_updated, users_last_updated)
+
+
+def post_row_version(row: PostVersioned) -> Version:
+    """Of a post_versions() row, equal to post_version() of its payload"""
+    return (row.id, row.last_updated, row.user_last_updated)
+
+
+def has_validators(request: Request) -> bool:
+    """Whether it's worth checking versions before loading the payloads"""
+    return "if-none-match" in request.headers
+
+
+def is_fresh(request: Request, tag: str) -> bool:
+    """If-None-Match uses the weak comparison, W/ prefixes are ignored"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {candidate.strip().removeprefix("W/") for candidate in header.split(",")}
+    return "*" in tags or tag in tags
+
+
+def not_modified(tag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": tag})
+
+
+def conditional(
+    request: Request,
+    response: Response,
+    versions: Iterable[Version],
+    *,
+    more: bool = False,
+    fields: Sequence[str] = (),
+) -> Optional[Response]:
+    """
+    A 304 when the client already has the payloads of `versions`, otherwise
+    their ETag is set on `response` and None returned.
+    """
+    tag = etag(versions, more=more, fields=fields)
+    if is_fresh(request, tag):
+        return not_modified(tag)
+    response.headers["ETag"] = tag
+    return None
@@ -0,0 +1,87 @@
+import secrets
+from typing import Dict, List, Optional
+
+from fastapi import Header, HTTPException, status
+
+from users_api import settings
+from users_api.api.router import UsersRouter
+from users_api.cache.base import CacheSnapshot
+from users_api.cache.singleflight import single_flight_snapshot
+from users_api.cache.store import get_cache
+from users_api.db.compiled_cache_metrics import CompiledCacheSnapshot
+from users_api.db.compiled_cache_metrics import get_compiled_cache_metrics
+from users_api.db.executor import get_db_executor
+from users_api.db.pool_metrics import PoolSnapshot, get_pool_metrics
+from users_api.db.slow_queries import SlowQuery, get_slow_query_log
+
+
+def require_internal_token(authorization: Optional[str] = Header(None)) -> None:
+    """
+    /internal/* exposes pool, cache and slow query internals (statements and
+    routes included), so it answers 404 unless INTERNAL_API_TOKEN is set and
+    only serves requests bearing it.
+    """
+    if not settings.INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    expected = f"Bearer {settings.INTERNAL_API_TOKEN}"
+    if not authorization or not secrets.compare_digest(authorization, expected):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+class CacheStatsResponse(CacheSnapshot, total=False):
+    single_flight: Dict[str, Dict[str, float]]
+
+
+internal_router = UsersRouter()
+
+
+@internal_router.get("/db-executor")
+def db_executor_stats() -> Dict[str, float]:
+    """
+    Thread pool used for blocking DB calls from async handlers. A growing
+    queue_depth/queue_wait means we're thread-starved, a growing pool_wait
+    means the connection pool is the bottleneck.
+    """
+    db_executor = get_db_executor()
+    return {"max_workers": db_executor.max_workers, **db_executor.stats.snapshot()}
+
+
+@internal_router.get("/pool")
+def pool_stats() -> List[PoolSnapshot]:
+    """
+    Checked out/overflow counts, checkout wait histogram and pool timeouts
+    for every engine (primary, replicas, async engines) in this worker.
+    """
+    return [metrics.snapshot() for metrics in get_pool_metrics()]
+
+
+@internal_router.get("/compiled-cache")
+def compiled_cache_stats() -> List[CompiledCacheSnapshot]:
+    """
+    Compiled statement cache hits/misses per engine. Anything counted under
+    no_cache_key is being recompiled on every execution.
+    """
+    return [metrics.snapshot() for metrics in get_compiled_cache_metrics()]
+
+
+@internal_router.get("/cache")
+def cache_stats() -> CacheStatsResponse:
+    """
+    Hits/misses/evictions of the manager cache in this worker. A low
+    hit_ratio with many evictions means CACHE_MAX_ENTRIES is too small.
+    single_flight counts the miss loads run and those shared with one
+    already in flight, per threads (sync mode) and tasks (async mode).
+    """
+    return {**get_cache().snapshot(), "single_flight": single_flight_snapshot()}
+
+
+@internal_router.get("/slow-queries")
+def slow_queries() -> List[SlowQuery]:
+    """
+    The latest statements over SLOW_QUERY_THRESHOLD_MS in this worker, newest
+    first, with their route, redacted parameters and, when sampled, plan.
+    """
+    return get_slow_query_log().entries()
@@ -0,0 +1,135 @@
+from typing import Dict, Tuple
+
+from typing_extensions import Literal
+
+from users_api.cache.base import CacheSnapshot
+from users_api.cache.singleflight import single_flight_snapshot
+from users_api.cache.store import get_cache
+from users_api.db.pool_metrics import get_pool_metrics
+from users_api.logger import dropped_log_records
+from users_api.metrics import PrometheusText, request_metrics
+
+
+def add_request_metrics(text: PrometheusText) -> None:
+    text.metric(
+        "users_api_http_request_duration_seconds",
+        "histogram",
+        "Request latency by route template",
+    )
+    for (method, route), histogram in sorted(request_metrics.durations().items()):
+        text.histogram(
+            "users_api_http_request_duration_seconds",
+            histogram.snapshot(),
+            method=method,
+            route=route,
+        )
+
+    text.metric(
+        "users_api_http_responses_total", "counter", "Responses by route and status"
+    )
+    for (method, route, status), count in sorted(request_metrics.responses().items()):
+        text.sample(
+            "users_api_http_responses_total",
+            count,
+            method=method,
+            route=route,
+            status=status,
+        )
+
+    text.metric("users_api_http_requests_in_flight", "gauge", "Requests being served")
+    text.sample("users_api_http_requests_in_flight", request_metrics.in_flight)
+
+
+def add_pool_metrics(text: PrometheusText) -> None:
+    pools = [metrics.snapshot() for metrics in get_pool_metrics()]
+    gauges: Dict[Literal["size", "checked_out", "overflow"], str] = {
+        "size": "Configured pool size",
+        "checked_out": "Connections checked out",
+        "overflow": "Connections opened over the pool size",
+    }
+    for field, description in gauges.items():
+        text.metric(f"users_api_db_pool_{field}", "gauge", description)
+        for pool in pools:
+            value = pool[field]
+            if value is not None:
+                text.sample(f"users_api_db_pool_{field}", value, pool=pool["name"])
+
+    counters: Dict[
+        Literal["checkouts", "connects", "invalidations", "timeouts"], str
+    ] = {
+        "checkouts": "Connections handed out",
+        "connects": "Connections opened",
+        "invalidations": "Connections invalidated",
+        "timeouts": "Checkouts that timed out waiting for a connection",
+    }
+    for counter, description in counters.items():
+        text.metric(f"users_api_db_pool_{counter}_total", "counter", description)
+        for pool in pools:
+            text.sample(
+                f"users_api_db_pool_{counter}_total", pool[counter], pool=pool["name"]
+            )
+
+    text.metric(
+        "users_api_db_pool_checkout_wait_milliseconds",
+        "histogram",
+        "Time spent waiting for a pooled connection",
+    )
+    for pool in pools:
+        text.histogram(
+            "users_api_db_pool_checkout_wait_milliseconds",
+            pool["checkout_wait_ms"],
+            pool=pool["name"],
+        )
+
+
+def add_cache_metrics(text: PrometheusText) -> None:
+    snapshot = get_cache().snapshot()
+    # A tiered cache also reports each of its tiers
+    tiers: Dict[str, CacheSnapshot] = {"all": snapshot}
+    if "l1" in snapshot and "l2" in snapshot:
+        tiers.update(l1=snapshot["l1"], l2=snapshot["l2"])
+
+    fields: Tuple[
+        Literal["hits", "misses", "evictions", "invalidations", "errors"], ...
+    ] = ("hits", "misses", "evictions", "invalidations", "errors")
+    for field in fields:
+        text.metric(f"users_api_cache_{field}_total", "counter", f"Cache {field}")
+        for tier, stats in tiers.items():
+            text.sample(f"users_api_cache_{field}_total", stats[field], tier=tier)
+
+    text.metric("users_api_cache_hit_ratio", "gauge", "Cache hits over lookups")
+    for tier, stats in tiers.items():
+        text.sample("users_api_cache_hit_ratio", stats["hit_ratio"], tier=tier)
+
+    flights = single_flight_snapshot()
+    text.metric(
+        "users_api_single_flight_loads_total", "counter", "Cache miss loads run"
+    )
+    for mode, counts in flights.items():
+        text.sample("users_api_single_flight_loads_total", counts["leads"], mode=mode)
+    text.metric(
+        "users_api_single_flight_shared_total",
+        "counter",
+        "Cache miss loads shared with one in flight, DB calls avoided",
+    )
+    for mode, counts in flights.items():
+        text.sample("users_api_single_flight_shared_total", counts["shared"], mode=mode)
+
+
+def add_logging_metrics(text: PrometheusText) -> None:
+    text.metric(
+        "users_api_log_records_dropped_total",
+        "counter",
+        "Log records dropped because the logging queue was full",
+    )
+    text.sample("users_api_log_records_dropped_total", dropped_log_records())
+
+
+def metrics_text() -> str:
+    """Every metric of this worker in the Prometheus text format"""
+    text = PrometheusText()
+    add_request_metrics(text)
+    add_pool_metrics(text)
+    add_cache_metrics(text)
+    add_logging_metrics(text)
+    return text.render()
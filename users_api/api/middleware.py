@@ -0,0 +1,163 @@
+import logging
+import time
+import uuid
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from users_api import settings
+from users_api.api.deps.db import LAST_WRITE_COOKIE, SAFE_METHODS
+from users_api.db.query_metrics import track_queries
+from users_api.logger import request_id
+from users_api.metrics import RequestMetrics, request_metrics, route_template
+
+logger = logging.getLogger(__name__)
+
+
+class QueryTimingMiddleware:
+    """
+    Counts the statements and DB time of every request, reports them in a
+    Server-Timing header and logs statements repeated
+    QUERY_REPEAT_THRESHOLD times or more as likely N+1s.
+
+    The header goes out with the response's start, so statements a
+    streaming response runs while sending its body are only logged.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries(scope) as queries:
+
+            async def send_with_timing(message: Message) -> None:
+                if message["type"] == "http.response.start" and settings.SERVER_TIMING:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", queries.server_timing())
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                for statement, count in queries.repeated(
+                    settings.QUERY_REPEAT_THRESHOLD
+                ):
+                    logger.warning(
+                        "Likely N+1 on %s %s, statement run %d times: %s",
+                        scope["method"],
+                        scope["path"],
+                        count,
+                        statement,
+                    )
+
+
+def last_write_cookie() -> str:
+    response = Response()
+    response.set_cookie(
+        LAST_WRITE_COOKIE,
+        str(time.time()),
+        max_age=max(int(settings.READ_YOUR_WRITES_WINDOW_SECONDS), 1),
+        httponly=True,
+    )
+    return response.headers["set-cookie"]
+
+
+class ReadYourWritesMiddleware:
+    """
+    Sets the last write cookie on the response to every unsafe (non GET,
+    HEAD or OPTIONS) request, which pins the client's reads to the primary
+    for READ_YOUR_WRITES_WINDOW_SECONDS, see api.deps.db.get_read_db.
+
+    Done here rather than on the get_db dependency's Response, as FastAPI
+    drops those headers when a route returns a Response of its own.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("set-cookie", last_write_cookie())
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records every HTTP request's latency and status under its route template
+    (ex. /users/{user_id}), so the number of series stays bounded by the
+    number of routes. Requests no route matched share the "unmatched" one.
+    """
+
+    def __init__(self, app: ASGIApp, metrics: RequestMetrics = request_metrics) -> None:
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.metrics.in_flight -= 1
+            self.metrics.observe(
+                scope["method"],
+                route_template(scope),
+                status,
+                time.perf_counter() - started,
+            )
+
+
+class RequestIdMiddleware:
+    """
+    Gives every HTTP request an id, the caller's X-Request-ID when it sent
+    one, that its log records carry and its response echoes back.
+    """
+
+    header = "X-Request-ID"
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = Headers(scope=scope).get(self.header)
+        # Bounded, it ends up in every log line of the request
+        current = incoming[:64] if incoming else uuid.uuid4().hex
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(self.header, current)
+            await send(message)
+
+        token = request_id.set(current)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id.reset(token)
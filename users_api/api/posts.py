@@ -1,55 +1,159 @@
-from typing import List
+from typing import Callable, Iterator, Union
 from uuid import UUID
 from fastapi import Depends
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.orm import Session
-from users_api.api.deps.db import get_db
+from starlette.requests import Request
+from users_api import settings
+from users_api.api.deps.db import get_db, get_read_db, get_streaming_db
+from users_api.api.deps.fields import Fields, get_post_fields
+from users_api.api.deps.pagination import PageParams, get_page_params
+from users_api.api.etags import conditional, has_validators
+from users_api.api.etags import post_orm_version, post_row_version, post_version
+from users_api.api.responses import RowsResponse
 
 from users_api.api.router import UsersRouter
+from users_api.api.streaming import ndjson_chunk, ndjson_response
+from users_api.db.session import LazySession
 from users_api.models.orm.posts import PostsORM
 from users_api.models.posts import Post
-from users_api.schemas.helpers import post_response
+from users_api.schemas.helpers import post_response, posts_page, posts_payload
+from users_api.schemas.helpers import partial_posts_page
+from users_api.schemas.pagination import encode_cursor
 from users_api.schemas.posts import CreatePostRequest, PostsResponse, UpdatePostRequest
+from users_api.managers.base import Page
 from users_api.managers.posts import posts_manager
 
 
 posts_router = UsersRouter()
 
 
-@posts_router.get("/")
-def get_posts(db: Session = Depends(get_db)) -> PostsResponse:
-
-    posts: List[PostsORM] = posts_manager.get_all_posts(db)
+@posts_router.get("/", response_model=PostsResponse)
+def get_posts(
+    request: Request,
+    response: Response,
+    page_params: PageParams = Depends(get_page_params),
+    fields: Fields = Depends(get_post_fields),
+    db: LazySession = Depends(get_read_db),
+) -> Union[PostsResponse, Response]:
+
+    if fields:
+        rows = posts_manager.get_posts_page_fields(
+            db.get_session(), fields, after=page_params.after, limit=page_params.limit
+        )
+        unchanged = conditional(
+            request,
+            response,
+            map(post_row_version, rows.items),
+            more=bool(rows.next_key),
+            fields=fields,
+        )
+        if unchanged:
+            return unchanged
+
+        users = (
+            posts_manager.get_users_of_posts(
+                db.get_session(), [row.id for row in rows.items]
+            )
+            if "user" in fields
+            else {}
+        )
+        return RowsResponse(
+            partial_posts_page(
+                rows.items,
+                fields,
+                users,
+                encode_cursor(rows.next_key) if rows.next_key else None,
+            ),
+            headers=response.headers,
+        )
+
+    if has_validators(request):
+        versions = posts_manager.get_posts_page_versions(
+            db.get_session(), after=page_params.after, limit=page_params.limit
+        )
+        unchanged = conditional(
+            request,
+            response,
+            map(post_row_version, versions.items),
+            more=bool(versions.next_key),
+        )
+        if unchanged:
+            return unchanged
+
+    page: Page[PostsORM] = posts_manager.get_posts_page(
+        db.get_session(), after=page_params.after, limit=page_params.limit
+    )
 
-    response_posts: List[Post] = [post_response(post=post) for post in posts]
+    unchanged = conditional(
+        request, response, map(post_orm_version, page.items), more=bool(page.next_key)
+    )
+    if unchanged:
+        return unchanged
 
-    return PostsResponse(posts=response_posts)
+    return RowsResponse(
+        posts_page(page.items, encode_cursor(page.next_key) if page.next_key else None),
+        headers=response.headers,
+    )
 
 
 @posts_router.post("/")
-def create_post(post_in: CreatePostRequest, db: Session = Depends(get_db)):
+def create_post(post_in: CreatePostRequest, db: LazySession = Depends(get_db)):
 
-    created_post: PostsORM = posts_manager.create_post(db, post_in)
+    created_post: PostsORM = posts_manager.create_post(db.get_session(), post_in)
 
     return post_response(post=created_post)
 
 
-@posts_router.get("/{post_id}")
-def get_post(post_id: UUID, db: Session = Depends(get_db)) -> Post:
-    post: PostsORM = posts_manager.get_post_by_id(db_session=db, post_id=post_id)
-    return post_response(post=post)
+@posts_router.get("/export")
+def export_posts(
+    request: Request,
+    open_session: Callable[[], Session] = Depends(get_streaming_db),
+) -> StreamingResponse:
+    """Every post with its user as NDJSON, read through a server-side cursor"""
+
+    def chunks() -> Iterator[bytes]:
+        with open_session() as db_session:
+            for batch in posts_manager.stream_posts(
+                db_session, batch_size=settings.EXPORT_BATCH_SIZE
+            ):
+                yield ndjson_chunk(posts_payload(batch))
+
+    return ndjson_response(request, chunks())
+
+
+@posts_router.get("/{post_id}", response_model=Post)
+def get_post(
+    post_id: UUID,
+    request: Request,
+    response: Response,
+    db: LazySession = Depends(get_read_db),
+) -> Union[Post, Response]:
+    post = posts_manager.cached_post(post_id)
+
+    if post is None and has_validators(request):
+        version = posts_manager.get_post_version(db.get_session(), post_id=post_id)
+        unchanged = version and conditional(
+            request, response, [post_row_version(version)]
+        )
+        if unchanged:
+            return unchanged
+
+    post = post or posts_manager.load_post(db.get_session(), post_id=post_id)
+
+    return conditional(request, response, [post_version(post)]) or post
 
 
 @posts_router.put("/{post_id}")
 def update_post(
-    post_id: UUID, post_in: UpdatePostRequest, db_session: Session = Depends(get_db)
+    post_id: UUID, post_in: UpdatePostRequest, db_session: LazySession = Depends(get_db)
 ) -> Post:
 
-    updated_post: PostsORM = posts_manager.update_post(
-        db_session=db_session, post_id=post_id, obj_in=post_in
+    return posts_manager.update_post(
+        db_session=db_session.get_session(), post_id=post_id, obj_in=post_in
     )
-    return post_response(post=updated_post)
 
 
 @posts_router.delete("/{post_id}", status_code=204)
-def delete_post(post_id: str, db_session: Session = Depends(get_db)):
-    return posts_manager.delete_post(db_session, post_id)
+def delete_post(post_id: UUID, db_session: LazySession = Depends(get_db)) -> None:
+    posts_manager.delete_post(db_session.get_session(), post_id)
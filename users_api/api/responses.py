@@ -0,0 +1,15 @@
+import orjson
+from fastapi.responses import ORJSONResponse
+
+
+class RowsResponse(ORJSONResponse):
+    """
+    JSON of plain dicts built from database rows (schemas.helpers.users_page,
+    posts_page). Returning it skips FastAPI's response_model validation and
+    pydantic serialization, the route's response_model is only documentation.
+
+    UTC datetimes are rendered with a Z suffix, as pydantic does.
+    """
+
+    def render(self, content: object) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
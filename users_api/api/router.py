@@ -1,6 +1,58 @@
+import asyncio
+import functools
+from typing import Any, Callable
+
 from fastapi import APIRouter
 
+from users_api.db.session import LazySession
+
+
+def release_db_sessions(kwargs: dict) -> None:
+    for value in kwargs.values():
+        if isinstance(value, LazySession):
+            value.release()
+
+
+def releasing_db_sessions(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Wraps an endpoint so any LazySession it was given is released the moment
+    it returns. FastAPI only tears dependencies down after serializing the
+    response, which would otherwise keep the connection checked out for
+    the whole of serialization.
+    """
+    if getattr(endpoint, "__releases_db_sessions__", False):
+        return endpoint
+
+    if asyncio.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                release_db_sessions(kwargs)
+
+        wrapper = async_wrapper
+    else:
+
+        @functools.wraps(endpoint)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                release_db_sessions(kwargs)
+
+    wrapper.__releases_db_sessions__ = True
+    return wrapper
+
+
 class UsersRouter(APIRouter):
     """users router"""
+
     def __init__(self) -> None:
         super().__init__()
+
+    def add_api_route(
+        self, path: str, endpoint: Callable[..., Any], **kwargs: Any
+    ) -> None:
+        super().add_api_route(path, releasing_db_sessions(endpoint), **kwargs)
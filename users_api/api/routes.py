@@ -1,17 +1,52 @@
+from typing import Union
+
+from fastapi import Depends
+from starlette.responses import JSONResponse, Response
+
+from users_api import settings
+from users_api.api.metrics import metrics_text
 from users_api.api.router import UsersRouter
+from users_api.metrics import PrometheusText
+from users_api.warmup import warm_up_state
 
 from users_api.api.users import users_router
 from users_api.api.posts import posts_router
+from users_api.api.async_users import async_users_router
+from users_api.api.async_posts import async_posts_router
+from users_api.api.internal import internal_router, require_internal_token
 
 
 root_router = UsersRouter()
 
 
-@root_router.get("/health")
 @root_router.get("/")
-def health_check() -> int:
+def liveness_check() -> int:
+    return 200
+
+
+@root_router.get("/health", response_model=int)
+def health_check() -> Union[int, Response]:
+    """Readiness, 503 until this worker has warmed up (see users_api.warmup)"""
+    if not warm_up_state.ready:
+        return JSONResponse(503, status_code=503)
     return 200
 
 
-root_router.include_router(users_router, prefix="/users")
-root_router.include_router(posts_router, prefix="/posts")
+@root_router.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    """Request latencies, DB pools and cache of this worker, for Prometheus"""
+    return Response(metrics_text(), media_type=PrometheusText.CONTENT_TYPE)
+
+
+if settings.IS_ASYNC_DATABASE:
+    root_router.include_router(async_users_router, prefix="/users")
+    root_router.include_router(async_posts_router, prefix="/posts")
+else:
+    root_router.include_router(users_router, prefix="/users")
+    root_router.include_router(posts_router, prefix="/posts")
+
+root_router.include_router(
+    internal_router,
+    prefix="/internal",
+    dependencies=[Depends(require_internal_token)],
+)
@@ -0,0 +1,73 @@
+import zlib
+from typing import AsyncIterator, Iterable, Iterator, Union
+
+from pydantic import BaseModel
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def ndjson_chunk(models: Iterable[BaseModel]) -> bytes:
+    """One JSON document per line"""
+    return b"".join(model.model_dump_json().encode() + b"\n" for model in models)
+
+
+def accepts_gzip(request: Request) -> bool:
+    """
+    Whether Accept-Encoding allows gzip, explicitly or through `*`, with a
+    non-zero q. An explicit gzip entry overrides `*`, so `gzip;q=0, *`
+    refuses it.
+    """
+    qualities = {}
+    for entry in request.headers.get("accept-encoding", "").split(","):
+        coding, *params = [part.strip() for part in entry.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
+def _gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # 31 -> gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+async def _agzip(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def ndjson_response(
+    request: Request, chunks: Union[Iterator[bytes], AsyncIterator[bytes]]
+) -> StreamingResponse:
+    """
+    Streams NDJSON chunks as they're produced, gzipped on the fly when the
+    client accepts it. Nothing is buffered beyond the chunk being written.
+    """
+    if not accepts_gzip(request):
+        return StreamingResponse(chunks, media_type=NDJSON_MEDIA_TYPE)
+
+    if isinstance(chunks, Iterator):
+        body: Union[Iterator[bytes], AsyncIterator[bytes]] = _gzip(chunks)
+    else:
+        body = _agzip(chunks)
+    return StreamingResponse(
+        body,
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+    )
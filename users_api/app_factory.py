@@ -5,10 +5,40 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from typing_extensions import TypedDict
 
 from users_api import settings
 from users_api.api import routes
-from users_api.db.connection import set_db_conn, close_db_conn
+from users_api.api.middleware import (
+    QueryTimingMiddleware,
+    ReadYourWritesMiddleware,
+    RequestIdMiddleware,
+    RequestMetricsMiddleware,
+)
+from users_api.cache.store import build_cache, close_cache, set_cache
+from users_api.db.connection import (
+    close_async_db_conn,
+    close_db_conn,
+    set_async_db_conn,
+    set_db_conn,
+    to_async_url,
+)
+from users_api.db.compiled_cache_metrics import (
+    clear_compiled_cache_metrics,
+    instrument_compiled_cache,
+)
+from users_api.db.executor import DBExecutor, close_db_executor, set_db_executor
+from users_api.db.pool_metrics import (
+    InstrumentedAsyncAdaptedQueuePool,
+    InstrumentedQueuePool,
+    clear_pool_metrics,
+    instrument_engine,
+)
+from users_api.db.query_metrics import instrument_queries
+from users_api.db.slow_queries import instrument_slow_queries
+from users_api.logger import configure_logging, stop_logging
+from users_api.warmup import start_warm_up, stop_warm_up
 
 __RECOMMENDED_PYTHON_VERSION__: str = "~3.10.3"
 
@@ -17,23 +47,95 @@ APM_SERVICE_NAME: str = "users_api"
 logger = logging.getLogger(__name__)
 
 
+class EngineOptions(TypedDict):
+    pool_size: int
+    max_overflow: int
+    pool_timeout: float
+    pool_recycle: int
+    pool_pre_ping: bool
+    insertmanyvalues_page_size: int
+
+
+def engine_options() -> EngineOptions:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "insertmanyvalues_page_size": settings.DB_INSERTMANYVALUES_PAGE_SIZE,
+    }
+
+
 def get_app() -> FastAPI:
     """Instantiate a users_api FastAPI instance. This instance will
     be parametrized by the values in users_api.settings.
     """
+    configure_logging()
     app = FastAPI()  # type: ignore
 
     def open_database_connection_pools() -> None:
-        engine = create_engine(
-            settings.DATABASE_URL, pool_size=32, max_overflow=64, pool_pre_ping=True  # type: ignore
+        urls = [settings.DATABASE_URL, *settings.DATABASE_REPLICA_URLS]
+        names = ["primary", *[f"replica_{i}" for i in range(len(urls) - 1)]]
+
+        engine, *replicas = [
+            create_engine(
+                url, poolclass=InstrumentedQueuePool, **engine_options()  # type: ignore
+            )
+            for url in urls
+        ]
+        for name, db_conn in zip(names, [engine, *replicas]):
+            instrument_engine(db_conn, name)
+            instrument_compiled_cache(db_conn, name)
+            instrument_queries(db_conn)
+            instrument_slow_queries(db_conn, name)
+        set_db_conn(engine, replicas=replicas)
+        # One thread per pooled connection for blocking calls made from
+        # async handlers
+        set_db_executor(
+            DBExecutor(max_workers=settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW)
         )
-        set_db_conn(engine)
 
-    def close_database_connection_pools() -> None:
+        if settings.IS_ASYNC_DATABASE:
+            async_engine, *async_replicas = [
+                create_async_engine(
+                    to_async_url(url),  # type: ignore
+                    poolclass=InstrumentedAsyncAdaptedQueuePool,
+                    **engine_options(),
+                )
+                for url in urls
+            ]
+            for name, async_db_conn in zip(names, [async_engine, *async_replicas]):
+                instrument_engine(async_db_conn, f"async_{name}")
+                instrument_compiled_cache(async_db_conn, f"async_{name}")
+                instrument_queries(async_db_conn)
+                instrument_slow_queries(async_db_conn, f"async_{name}")
+            set_async_db_conn(async_engine, replicas=async_replicas)
+
+    async def close_database_connection_pools() -> None:
+        close_db_executor()
         close_db_conn()
-    
+        await close_async_db_conn()
+        clear_pool_metrics()
+        clear_compiled_cache_metrics()
+
+    def open_cache() -> None:
+        set_cache(build_cache())
+
+    async def warm_up() -> None:
+        await start_warm_up(app)
+
+    async def stop_warming_up() -> None:
+        await stop_warm_up(app)
+
+    app.on_event("startup")(configure_logging)
     app.on_event("startup")(open_database_connection_pools)
+    app.on_event("startup")(open_cache)
+    app.on_event("startup")(warm_up)
+    app.on_event("shutdown")(stop_warming_up)
     app.on_event("shutdown")(close_database_connection_pools)
+    app.on_event("shutdown")(close_cache)
+    app.on_event("shutdown")(stop_logging)
 
     logger.info("Initializing users_api service")
 
@@ -45,8 +147,15 @@ def get_app() -> FastAPI:
 
     app.include_router(router=routes.root_router)
 
+    app.add_middleware(ReadYourWritesMiddleware)
+    app.add_middleware(QueryTimingMiddleware)
+    app.add_middleware(RequestMetricsMiddleware)
+    app.add_middleware(RequestIdMiddleware)
     app.add_middleware(
-        CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"],
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
     )
 
     return app
@@ -0,0 +1,123 @@
+import threading
+from abc import ABC, abstractmethod
+from typing import Iterable, Optional
+
+from pydantic import BaseModel
+from typing_extensions import TypedDict
+
+
+class CacheSnapshot(TypedDict, total=False):
+    hits: int
+    misses: int
+    hit_ratio: float
+    sets: int
+    evictions: int
+    expirations: int
+    invalidations: int
+    errors: int
+    # InProcessCache
+    size: int
+    max_entries: int
+    # TieredCache, its in-process and shared tiers
+    l1: "CacheSnapshot"
+    l2: "CacheSnapshot"
+
+
+class CacheStats:
+    """Counters for a Cache. Updated under a lock, read via snapshot()"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def on_hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+
+    def on_miss(self, expired: bool = False) -> None:
+        with self._lock:
+            self.misses += 1
+            if expired:
+                self.expirations += 1
+
+    def on_set(self) -> None:
+        with self._lock:
+            self.sets += 1
+
+    def on_evict(self) -> None:
+        with self._lock:
+            self.evictions += 1
+
+    def on_invalidate(self, count: int) -> None:
+        with self._lock:
+            self.invalidations += count
+
+    def on_error(self) -> None:
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self) -> CacheSnapshot:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "sets": self.sets,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "errors": self.errors,
+            }
+
+
+class Cache(ABC):
+    """
+    Key/value cache the managers read through, see users_api.cache.keys.
+    Values are pydantic models (User, Post), never ORM objects, so they're
+    safe to share between sessions and threads.
+
+    `depends_on` lists the keys an entry was built from: invalidating any of
+    them drops the entry as well, ex. a cached Post embeds its User.
+
+    Shared backends store the payloads serialized, see keys.model_for.
+    """
+
+    def __init__(self) -> None:
+        self.stats = CacheStats()
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[BaseModel]:
+        """The cached value, None on a miss or once it expired"""
+
+    @abstractmethod
+    def set(
+        self,
+        key: str,
+        value: BaseModel,
+        *,
+        ttl: Optional[float] = None,
+        depends_on: Iterable[str] = (),
+    ) -> None:
+        """Caches `value` for `ttl` seconds, the backend's default if None"""
+
+    @abstractmethod
+    def invalidate(self, *keys: str) -> None:
+        """Drops `keys` and every entry that depends on them"""
+
+    @abstractmethod
+    def clear(self) -> None:
+        pass
+
+    def close(self) -> None:
+        """Releases the backend's connections, called on app shutdown"""
+        self.clear()
+
+    def snapshot(self) -> CacheSnapshot:
+        return self.stats.snapshot()
@@ -0,0 +1,22 @@
+from typing import Dict, Type
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from users_api.models.posts import Post
+from users_api.models.users import User
+
+# Key prefix -> payload model, used to deserialize entries of shared backends
+MODELS: Dict[str, Type[BaseModel]] = {"user": User, "post": Post}
+
+
+def user_key(user_id: UUID) -> str:
+    return f"user:{user_id}"
+
+
+def post_key(post_id: UUID) -> str:
+    return f"post:{post_id}"
+
+
+def model_for(key: str) -> Type[BaseModel]:
+    return MODELS[key.split(":", 1)[0]]
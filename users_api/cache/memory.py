@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+from pydantic import BaseModel
+
+from users_api.cache.base import Cache, CacheSnapshot
+
+
+@dataclass
+class _Entry:
+    value: BaseModel
+    expires_at: float
+    depends_on: Tuple[str, ...]
+
+
+class InProcessCache(Cache):
+    """
+    Bounded LRU with a per-entry TTL, local to this worker process.
+
+    Expired entries are dropped when they're next read or pushed out by the
+    LRU, there's no background sweeper.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # Key -> keys of the entries that depend on it
+        self._dependents: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[BaseModel]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.on_miss()
+                return None
+            if entry.expires_at <= self._clock():
+                self._remove(key)
+                self.stats.on_miss(expired=True)
+                return None
+            self._entries.move_to_end(key)
+            self.stats.on_hit()
+            return entry.value
+
+    def set(
+        self,
+        key: str,
+        value: BaseModel,
+        *,
+        ttl: Optional[float] = None,
+        depends_on: Iterable[str] = (),
+    ) -> None:
+        if self.max_entries <= 0:
+            return
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            entry = _Entry(value, expires_at, tuple(depends_on))
+            self._entries[key] = entry
+            for dependency in entry.depends_on:
+                self._dependents.setdefault(dependency, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.stats.on_evict()
+        self.stats.on_set()
+
+    def invalidate(self, *keys: str) -> None:
+        removed = 0
+        with self._lock:
+            for key in keys:
+                for dependent in self._dependents.pop(key, set()):
+                    removed += self._remove(dependent)
+                removed += self._remove(key)
+        self.stats.on_invalidate(removed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._dependents.clear()
+
+    def snapshot(self) -> CacheSnapshot:
+        return {
+            "size": len(self),
+            "max_entries": self.max_entries,
+            **super().snapshot(),
+        }
+
+    def _remove(self, key: str) -> int:
+        """Must hold the lock. Returns the number of entries removed."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return 0
+        for dependency in entry.depends_on:
+            dependents = self._dependents.get(dependency)
+            if dependents is not None:
+                dependents.discard(key)
+                if not dependents:
+                    del self._dependents[dependency]
+        return 1
@@ -0,0 +1,112 @@
+import logging
+from typing import Iterable, List, Optional
+
+import redis
+from pydantic import BaseModel
+
+from users_api.cache.base import Cache
+from users_api.cache.keys import model_for
+
+logger = logging.getLogger(__name__)
+
+
+class RedisCache(Cache):
+    """
+    Cache on a Redis-protocol server shared by every worker and pod.
+
+    Values are stored as the payload's JSON, so a hit is one round trip and a
+    pydantic parse, no ORM. Dependencies are kept as a set of dependent keys
+    per dependency key, which `delete` expands.
+
+    The server being unreachable degrades to cache misses, counted as errors.
+    """
+
+    def __init__(
+        self, client: "redis.Redis", ttl: float, namespace: str = "users_api"
+    ) -> None:
+        super().__init__()
+        self.client = client
+        self.ttl = ttl
+        self.namespace = namespace
+
+    def get(self, key: str) -> Optional[BaseModel]:
+        try:
+            data = self.client.get(self._name(key))
+        except redis.RedisError:
+            logger.warning("Shared cache get failed", exc_info=True)
+            self.stats.on_error()
+            return None
+        if data is None:
+            self.stats.on_miss()
+            return None
+        self.stats.on_hit()
+        return model_for(key).model_validate_json(data)
+
+    def set(
+        self,
+        key: str,
+        value: BaseModel,
+        *,
+        ttl: Optional[float] = None,
+        depends_on: Iterable[str] = (),
+    ) -> None:
+        expires_ms = int((self.ttl if ttl is None else ttl) * 1000)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.set(self._name(key), value.model_dump_json(), px=expires_ms)
+        for dependency in depends_on:
+            pipe.sadd(self._dependents_name(dependency), key)
+            pipe.pexpire(self._dependents_name(dependency), expires_ms)
+        try:
+            pipe.execute()
+        except redis.RedisError:
+            logger.warning("Shared cache set failed", exc_info=True)
+            self.stats.on_error()
+            return
+        self.stats.on_set()
+
+    def invalidate(self, *keys: str) -> None:
+        self.delete(*keys)
+
+    def delete(self, *keys: str) -> List[str]:
+        """
+        Drops `keys` and their dependents, returns all the keys that have to
+        be dropped from other tiers. Those are just `keys` when the server
+        can't be reached.
+        """
+        if not keys:
+            return []
+        try:
+            dependents = self.client.pipeline(transaction=False)
+            for key in keys:
+                dependents.smembers(self._dependents_name(key))
+            removed = set(keys)
+            for members in dependents.execute():
+                removed.update(member.decode() for member in members)
+
+            pipe = self.client.pipeline(transaction=False)
+            pipe.delete(*(self._name(key) for key in removed))
+            pipe.delete(*(self._dependents_name(key) for key in keys))
+            count, _ = pipe.execute()
+        except redis.RedisError:
+            logger.error(
+                "Shared cache invalidation failed, entries stay stale until their TTL",
+                exc_info=True,
+            )
+            self.stats.on_error()
+            return list(keys)
+        self.stats.on_invalidate(count)
+        return sorted(removed)
+
+    def clear(self) -> None:
+        names = list(self.client.scan_iter(match=f"{self.namespace}:*"))
+        if names:
+            self.client.delete(*names)
+
+    def close(self) -> None:
+        self.client.close()
+
+    def _name(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _dependents_name(self, key: str) -> str:
+        return f"{self.namespace}:dependents:{key}"
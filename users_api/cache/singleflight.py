@@ -0,0 +1,152 @@
+"""
+Single-flight loads.
+
+When many requests miss the cache for the same key at once, only the first
+(the leader) runs the DB fetch, the others wait for it and share its result
+or its exception. SingleFlight coalesces threads (sync routes, the DB
+executor), AsyncSingleFlight the tasks of one event loop.
+
+Keys are the cache keys (users_api.cache.keys). Writes forget the flights
+of the keys they invalidate (see store.invalidate), so a request that
+starts after a write never joins a load that started before it.
+"""
+
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, Optional, TypeVar, cast
+
+T = TypeVar("T")
+
+
+class SingleFlightStats:
+    """Counters for a SingleFlight. Updated under a lock, read via snapshot()"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # Loads that ran
+        self.leads = 0
+        # Callers that shared a load in flight instead, each one a DB call saved
+        self.shared = 0
+
+    def on_lead(self) -> None:
+        with self._lock:
+            self.leads += 1
+
+    def on_shared(self) -> None:
+        with self._lock:
+            self.shared += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {"leads": self.leads, "shared": self.shared}
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: object = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self.stats = SingleFlightStats()
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        """fn()'s result, from the call already in flight for `key` if any"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if call is None:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            self.stats.on_shared()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            # The calls of a key all load the same thing, so fn()'s type
+            return cast(T, call.result)
+
+        self.stats.on_lead()
+        try:
+            result = fn()
+            call.result = result
+            return result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    def forget(self, *keys: str) -> None:
+        """Later callers of `keys` start a new call, waiting ones still share"""
+        with self._lock:
+            for key in keys:
+                self._calls.pop(key, None)
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for the tasks of one event loop. A waiting task being
+    cancelled leaves the load running for the others, the leader being
+    cancelled hands the load over to one of them.
+    """
+
+    def __init__(self) -> None:
+        self.stats = SingleFlightStats()
+        self._calls: Dict[str, "asyncio.Future[object]"] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        while (future := self._calls.get(key)) is not None:
+            self.stats.on_shared()
+            try:
+                return cast(T, await asyncio.shield(future))
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # This task was cancelled, not the leader
+                # The leader was, take over the load
+
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        self.stats.on_lead()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieved, so a load nobody waited for isn't logged as unhandled
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def forget(self, *keys: str) -> None:
+        for key in keys:
+            self._calls.pop(key, None)
+
+
+flights = SingleFlight()
+async_flights = AsyncSingleFlight()
+
+
+def forget_flights(*keys: str) -> None:
+    flights.forget(*keys)
+    async_flights.forget(*keys)
+
+
+def single_flight_snapshot() -> Dict[str, Dict[str, float]]:
+    return {
+        "threads": flights.stats.snapshot(),
+        "tasks": async_flights.stats.snapshot(),
+    }
@@ -0,0 +1,98 @@
+import threading
+from typing import Iterable, Optional
+
+from pydantic import BaseModel
+
+from users_api import settings
+from users_api.cache.base import Cache
+from users_api.cache.memory import InProcessCache
+from users_api.cache.singleflight import forget_flights
+
+# pylint: disable=W0603, C0103
+_cache: Optional[Cache] = None
+# Bumped by every invalidate(), see fill()
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def build_cache() -> Cache:
+    """
+    In-process only, or tiered over the shared server at CACHE_REDIS_URL.
+    redis is only imported in the latter case.
+    """
+    local = InProcessCache(
+        max_entries=settings.CACHE_MAX_ENTRIES, ttl=settings.CACHE_TTL_SECONDS
+    )
+    if not settings.CACHE_REDIS_URL:
+        return local
+
+    # pylint: disable=C0415
+    import redis
+
+    from users_api.cache.shared import RedisCache
+    from users_api.cache.tiered import TieredCache
+
+    shared = RedisCache(
+        redis.Redis.from_url(settings.CACHE_REDIS_URL),
+        ttl=settings.CACHE_SHARED_TTL_SECONDS,
+    )
+    cache = TieredCache(local, shared, channel=settings.CACHE_INVALIDATION_CHANNEL)
+    cache.listen()
+    return cache
+
+
+def set_cache(cache: Cache) -> None:
+    global _cache
+    _cache = cache
+
+
+def close_cache() -> None:
+    global _cache
+    if _cache:
+        _cache.close()
+        _cache = None
+
+
+def get_cache() -> Cache:
+    """
+    Returns the cache created at startup, or one built from settings when
+    running outside of the app lifecycle (scripts, tests).
+    """
+    if _cache is None:
+        set_cache(build_cache())
+    return _cache  # type: ignore
+
+
+def generation() -> int:
+    """Taken before a load from the database, and handed to fill() after"""
+    return _generation
+
+
+def fill(
+    key: str, value: BaseModel, since: int, *, depends_on: Iterable[str] = ()
+) -> None:
+    """
+    Caches what a load that started at generation `since` read, unless
+    anything was invalidated meanwhile: the load may have read the rows from
+    before that write. Any write counts, which only ever costs a fill.
+
+    The value is set before the generation is checked, so an invalidate()
+    racing the set either drops it or is seen and dropped here.
+    """
+    cache = get_cache()
+    cache.set(key, value, depends_on=depends_on)
+    if _generation != since:
+        cache.invalidate(key)
+
+
+def invalidate(*keys: str) -> None:
+    """
+    What writes call once committed: drops `keys` from the cache, and first
+    forgets their loads in flight, which may have read the old rows, and
+    fails the fill() of any load still running
+    """
+    global _generation
+    with _generation_lock:
+        _generation += 1
+    forget_flights(*keys)
+    get_cache().invalidate(*keys)
@@ -0,0 +1,132 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Iterable, Mapping, Optional
+
+import redis
+from pydantic import BaseModel
+from redis.client import PubSub
+
+from users_api.cache.base import Cache, CacheSnapshot
+from users_api.cache.memory import InProcessCache
+from users_api.cache.shared import RedisCache
+
+logger = logging.getLogger(__name__)
+
+
+class TieredCache(Cache):
+    """
+    An in-process L1 in front of a shared L2.
+
+    Reads try L1, then L2, filling L1 on an L2 hit. Writes go to both.
+    Invalidations drop the keys (and their dependents) from L2 and this
+    worker's L1, then get published on `channel` so every other worker drops
+    them from its L1 too.
+
+    A worker can still re-fill L1 with a value it read from L2 just before
+    an invalidation landed, so L1's TTL bounds how stale a read can be.
+    While the subscription is down L1 is emptied, since messages are lost.
+    """
+
+    def __init__(
+        self,
+        local: InProcessCache,
+        shared: RedisCache,
+        channel: str,
+        poll_interval: float = 1.0,
+    ) -> None:
+        super().__init__()
+        self.poll_interval = poll_interval
+        self.local = local
+        self.shared = shared
+        self.channel = channel
+        # Tells this worker's own messages apart from other workers'
+        self.origin = uuid.uuid4().hex
+        self._listener: Optional[threading.Thread] = None
+
+    def get(self, key: str) -> Optional[BaseModel]:
+        value = self.local.get(key)
+        if value is None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.local.set(key, value)
+        if value is None:
+            self.stats.on_miss()
+        else:
+            self.stats.on_hit()
+        return value
+
+    def set(
+        self,
+        key: str,
+        value: BaseModel,
+        *,
+        ttl: Optional[float] = None,
+        depends_on: Iterable[str] = (),
+    ) -> None:
+        depends_on = tuple(depends_on)
+        self.local.set(key, value, ttl=ttl, depends_on=depends_on)
+        self.shared.set(key, value, depends_on=depends_on)
+        self.stats.on_set()
+
+    def invalidate(self, *keys: str) -> None:
+        removed = self.shared.delete(*keys)
+        self.local.invalidate(*removed)
+        self.stats.on_invalidate(len(removed))
+        message = json.dumps({"origin": self.origin, "keys": removed})
+        try:
+            self.shared.client.publish(self.channel, message)
+        except redis.RedisError:
+            logger.error("Cache invalidation publish failed", exc_info=True)
+            self.stats.on_error()
+
+    def clear(self) -> None:
+        """Empties this worker's L1 and the shared L2"""
+        self.local.clear()
+        self.shared.clear()
+
+    def listen(self) -> None:
+        """Subscribes to other workers' invalidations on a daemon thread"""
+        pubsub = self.shared.client.pubsub(  # type: ignore[no-untyped-call]
+            ignore_subscribe_messages=True
+        )
+        pubsub.subscribe(**{self.channel: self._on_message})
+        self._listener = pubsub.run_in_thread(
+            sleep_time=self.poll_interval,
+            daemon=True,
+            exception_handler=self._on_listener_error,
+        )
+
+    def close(self) -> None:
+        if self._listener is not None:
+            # The listener closes the subscription once it stops
+            self._listener.stop()  # type: ignore[attr-defined]
+            self._listener.join(timeout=5)
+            self._listener = None
+        self.local.clear()
+        self.shared.close()
+
+    def snapshot(self) -> CacheSnapshot:
+        return {
+            **super().snapshot(),
+            "l1": self.local.snapshot(),
+            "l2": self.shared.snapshot(),
+        }
+
+    def _on_message(self, message: Mapping[str, bytes]) -> None:
+        payload = json.loads(message["data"])
+        if payload["origin"] != self.origin:
+            self.local.invalidate(*payload["keys"])
+
+    def _on_listener_error(
+        self, error: BaseException, pubsub: PubSub, thread: threading.Thread
+    ) -> None:
+        # pylint: disable=W0613
+        logger.warning("Cache invalidation subscription failed: %s", error)
+        self.stats.on_error()
+        self.local.clear()
+        # Back off before the listener polls again, which reconnects and
+        # re-subscribes
+        time.sleep(self.poll_interval)
@@ -0,0 +1,96 @@
+"""
+Hit/miss counts for an engine's compiled statement cache.
+
+Every executed statement's ExecutionContext records whether its SQL string
+came out of the engine's compiled cache. A statement touching a column whose
+type isn't cache-safe (a TypeDecorator without cache_ok = True) shows up as
+`no_cache_key` and is recompiled on every execution.
+"""
+
+import threading
+from typing import Dict, List, Optional, Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.interfaces import CacheStats
+from sqlalchemy.ext.asyncio import AsyncEngine
+from typing_extensions import TypedDict
+
+
+class CompiledCacheSnapshot(TypedDict):
+    name: str
+    hits: int
+    misses: int
+    # None until a statement has been looked up
+    hit_ratio: Optional[float]
+    caching_disabled: int
+    no_cache_key: int
+
+
+class CompiledCacheMetrics:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.counts: Dict[CacheStats, int] = {stat: 0 for stat in CacheStats}
+        self._lock = threading.Lock()
+
+    def attach(self, engine: Union[Engine, AsyncEngine]) -> "CompiledCacheMetrics":
+        if isinstance(engine, AsyncEngine):
+            engine = engine.sync_engine
+        event.listen(engine, "after_cursor_execute", self._on_execute)
+        return self
+
+    # pylint: disable=too-many-arguments
+    def _on_execute(
+        self,
+        conn: object,
+        cursor: object,
+        statement: str,
+        parameters: object,
+        context: object,
+        executemany: bool,
+    ) -> None:
+        cache_hit = getattr(context, "cache_hit", None)
+        if cache_hit is None:
+            return
+        with self._lock:
+            self.counts[cache_hit] += 1
+
+    @property
+    def hits(self) -> int:
+        return self.counts[CacheStats.CACHE_HIT]
+
+    @property
+    def misses(self) -> int:
+        return self.counts[CacheStats.CACHE_MISS]
+
+    def snapshot(self) -> CompiledCacheSnapshot:
+        with self._lock:
+            counts = dict(self.counts)
+        lookups = counts[CacheStats.CACHE_HIT] + counts[CacheStats.CACHE_MISS]
+        return {
+            "name": self.name,
+            "hits": counts[CacheStats.CACHE_HIT],
+            "misses": counts[CacheStats.CACHE_MISS],
+            "hit_ratio": counts[CacheStats.CACHE_HIT] / lookups if lookups else None,
+            "caching_disabled": counts[CacheStats.CACHING_DISABLED],
+            "no_cache_key": counts[CacheStats.NO_CACHE_KEY],
+        }
+
+
+_compiled_cache_metrics: Dict[str, CompiledCacheMetrics] = {}
+
+
+def instrument_compiled_cache(
+    engine: Union[Engine, AsyncEngine], name: str
+) -> CompiledCacheMetrics:
+    metrics = CompiledCacheMetrics(name).attach(engine)
+    _compiled_cache_metrics[name] = metrics
+    return metrics
+
+
+def clear_compiled_cache_metrics() -> None:
+    _compiled_cache_metrics.clear()
+
+
+def get_compiled_cache_metrics() -> List[CompiledCacheMetrics]:
+    return list(_compiled_cache_metrics.values())
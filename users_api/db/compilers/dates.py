@@ -9,6 +9,17 @@ class utcnow(expression.FunctionElement):
     type = DateTime()
 
 
+# last_updated doubles as the row version behind ETags, so utcnow() is the
+# time of the statement rather than of the transaction (CURRENT_TIMESTAMP),
+# and has sub-second resolution on SQLite. Migration 67732502f344 moved the
+# Postgres server defaults of existing tables over to it.
 @compiles(utcnow, "postgresql")
 def pg_utcnow(*_, **__):
-    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+    return "TIMEZONE('utc', clock_timestamp())"
+
+
+@compiles(utcnow, "sqlite")
+def sqlite_utcnow(*_, **__):
+    # SQLite's 'now' is already UTC. %f is SS.SSS, padded to the microseconds
+    # SQLAlchemy's DATETIME binds, so stored and bound values compare as text.
+    return "STRFTIME('%Y-%m-%d %H:%M:%f000', 'now')"
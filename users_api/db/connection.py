@@ -8,28 +8,153 @@ In order to account for this, we implement Session management
 at a request level instead of at the thread level.
 
 See: https://github.com/tiangolo/fastapi/issues/726
+
+Reads can be spread over replica engines: the primary takes every write and
+replicas are handed out round-robin to read-only routes (see get_read_db).
+
+A process forked after the engines were created must never use the pooled
+connections it inherited, their sockets are shared with the parent. The
+engines are disposed of in the child right after fork, without closing the
+parent's connections, so the child opens its own.
 """
 
+import itertools
+import os
+from typing import Iterator, List, Optional, Sequence, TypeVar
+
 from sqlalchemy.engine import Engine as Database
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine as AsyncDatabase
+
+# Sync driver -> asyncio driver used when DATABASE_MODE=async
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+EngineType = TypeVar("EngineType", Database, AsyncDatabase)
 
 # pylint: disable=W0603, C0103
-_db_conn: Database
+_db_conn: Optional[Database] = None
+_replica_db_conns: List[Database] = []
+_replica_cycle: Iterator[Database] = iter(())
+_async_db_conn: Optional[AsyncDatabase] = None
+_async_replica_db_conns: List[AsyncDatabase] = []
+_async_replica_cycle: Iterator[AsyncDatabase] = iter(())
 
 
-def set_db_conn(db_conn: Database) -> None:
-    global _db_conn
+def to_async_url(url: str) -> str:
+    """
+    Swaps the driver of a sync database url for its asyncio equivalent,
+    ex. postgresql://... -> postgresql+asyncpg://...
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver configured for {backend} urls")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(
+        hide_password=False
+    )
+
+
+def _next_replica(
+    primary: Optional[EngineType],
+    replicas: Sequence[EngineType],
+    replica_cycle: Iterator[EngineType],
+) -> Optional[EngineType]:
+    if not replicas:
+        return primary
+    return next(replica_cycle)
+
+
+def set_db_conn(
+    db_conn: Optional[Database], replicas: Optional[List[Database]] = None
+) -> None:
+    global _db_conn, _replica_db_conns, _replica_cycle
     _db_conn = db_conn
+    _replica_db_conns = replicas or []
+    _replica_cycle = itertools.cycle(_replica_db_conns)
 
 
 def close_db_conn() -> None:
     global _db_conn
+    for replica in _replica_db_conns:
+        replica.dispose()
     if _db_conn:
         _db_conn.dispose()
 
 
-def get_db_conn_DO_NOT_USE() -> Database:
+def get_db_conn_DO_NOT_USE() -> Optional[Database]:
     """
     Do not use this directly in API endpoints.
     Use get_db from db.py instead
     """
     return _db_conn
+
+
+def get_all_db_conns() -> List[Database]:
+    """The primary, then the replicas. For startup and shutdown, not endpoints"""
+    return [_db_conn, *_replica_db_conns] if _db_conn else []
+
+
+def get_replica_db_conn_DO_NOT_USE() -> Database:
+    """
+    Do not use this directly in API endpoints.
+    Use get_read_db from db.py instead
+
+    Falls back to the primary when no replicas are configured.
+    """
+    return _next_replica(_db_conn, _replica_db_conns, _replica_cycle)  # type: ignore
+
+
+def set_async_db_conn(
+    db_conn: AsyncDatabase, replicas: Optional[List[AsyncDatabase]] = None
+) -> None:
+    global _async_db_conn, _async_replica_db_conns, _async_replica_cycle
+    _async_db_conn = db_conn
+    _async_replica_db_conns = replicas or []
+    _async_replica_cycle = itertools.cycle(_async_replica_db_conns)
+
+
+async def close_async_db_conn() -> None:
+    global _async_db_conn, _async_replica_db_conns
+    for replica in _async_replica_db_conns:
+        await replica.dispose()
+    _async_replica_db_conns = []
+    if _async_db_conn:
+        await _async_db_conn.dispose()
+        _async_db_conn = None
+
+
+def get_async_db_conn_DO_NOT_USE() -> Optional[AsyncDatabase]:
+    """
+    Do not use this directly in API endpoints.
+    Use get_async_db from db.py instead
+    """
+    return _async_db_conn
+
+
+def get_all_async_db_conns() -> List[AsyncDatabase]:
+    """The async primary, then its replicas, see get_all_db_conns()"""
+    return [_async_db_conn, *_async_replica_db_conns] if _async_db_conn else []
+
+
+def get_async_replica_db_conn_DO_NOT_USE() -> Optional[AsyncDatabase]:
+    """
+    Do not use this directly in API endpoints.
+    Use get_async_read_db from db.py instead
+
+    Falls back to the primary when no replicas are configured.
+    """
+    return _next_replica(_async_db_conn, _async_replica_db_conns, _async_replica_cycle)
+
+
+def _dispose_after_fork() -> None:
+    # close=False: the connections are the parent's, only drop our references
+    for db_conn in get_all_db_conns():
+        db_conn.dispose(close=False)
+    for async_db_conn in get_all_async_db_conns():
+        async_db_conn.sync_engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_dispose_after_fork)
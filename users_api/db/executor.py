@@ -0,0 +1,201 @@
+"""
+Runs blocking manager calls off the event loop.
+
+The handlers in users_api.api.users are `async def`, so any synchronous
+SQLAlchemy work they do directly blocks every other request on the worker.
+Instead they hand manager calls to a dedicated thread pool sized to the engine
+pool (pool_size + max_overflow): more threads than connections would only
+queue on the pool, fewer would leave connections idle.
+
+Two waits are tracked separately:
+    - queue wait: time between submitting a call and a thread picking it up.
+      Growing queue depth/wait means we're thread-starved.
+    - pool wait: time a thread spends checking out a connection for the
+      call's Session. Growing pool wait means we're pool-starved.
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Concatenate, Dict, Optional, ParamSpec, TypeVar
+
+from sqlalchemy.orm import Session
+
+from users_api import settings
+from users_api.db.session import LazySession
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+
+class DBExecutorStats:
+    """Counters for a DBExecutor. Updated under a lock, read via snapshot()"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.pool_waits = 0
+        self.pool_wait_total = 0.0
+        self.pool_wait_max = 0.0
+
+    def on_submit(self) -> None:
+        with self._lock:
+            self.submitted += 1
+
+    def on_start(self, queue_wait: float) -> None:
+        with self._lock:
+            self.started += 1
+            self.queue_wait_total += queue_wait
+            self.queue_wait_max = max(self.queue_wait_max, queue_wait)
+
+    def on_pool_wait(self, pool_wait: float) -> None:
+        with self._lock:
+            self.pool_waits += 1
+            self.pool_wait_total += pool_wait
+            self.pool_wait_max = max(self.pool_wait_max, pool_wait)
+
+    def on_complete(self) -> None:
+        with self._lock:
+            self.completed += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            started = self.started or 1
+            pool_waits = self.pool_waits or 1
+            return {
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "queue_depth": self.submitted - self.started,
+                "active": self.started - self.completed,
+                "queue_wait_avg_ms": self.queue_wait_total / started * 1000,
+                "queue_wait_max_ms": self.queue_wait_max * 1000,
+                "pool_wait_avg_ms": self.pool_wait_total / pool_waits * 1000,
+                "pool_wait_max_ms": self.pool_wait_max * 1000,
+            }
+
+
+class DBExecutor:
+    def __init__(self, max_workers: int) -> None:
+        self.max_workers = max_workers
+        self.stats = DBExecutorStats()
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="users_api_db"
+        )
+
+    async def run(self, fn: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+        """
+        Runs `fn(*args, **kwargs)` on the executor's threads and awaits the
+        result. Context variables are carried over to the worker thread.
+        """
+        submitted_at = time.perf_counter()
+        ctx = contextvars.copy_context()
+        call = functools.partial(
+            ctx.run,
+            self._call,
+            submitted_at,
+            functools.partial(fn, *args, **kwargs),
+            kwargs.get("db_session"),
+        )
+        self.stats.on_submit()
+        return await asyncio.get_running_loop().run_in_executor(self._pool, call)
+
+    async def run_in_session(
+        self,
+        fn: Callable[Concatenate[Session, P], T],
+        db_session: LazySession,
+        *args: P.args,
+        **kwargs: P.kwargs,
+    ) -> T:
+        """
+        run() of `fn(session, *args, **kwargs)`, with the Session of a
+        request's LazySession. It's only built on the executor's thread.
+        """
+
+        def call_in_session() -> T:
+            # Held until fn returns, even if the awaiting endpoint is
+            # cancelled and releases db_session meanwhile
+            with db_session.using() as session:
+                self._check_out(session)
+                return fn(session, *args, **kwargs)
+
+        return await self.run(call_in_session)
+
+    def _call(self, submitted_at: float, fn: Callable[[], T], db_session: object) -> T:
+        self.stats.on_start(time.perf_counter() - submitted_at)
+        try:
+            if isinstance(db_session, Session):
+                self._check_out(db_session)
+            return fn()
+        finally:
+            self.stats.on_complete()
+
+    def _check_out(self, db_session: Session) -> None:
+        # Check the connection out up front so the time spent blocked on the
+        # pool is measured apart from the query itself
+        started_at = time.perf_counter()
+        db_session.connection()
+        self.stats.on_pool_wait(time.perf_counter() - started_at)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+
+
+# pylint: disable=W0603, C0103
+_db_executor: Optional[DBExecutor] = None
+
+
+def set_db_executor(db_executor: DBExecutor) -> None:
+    global _db_executor
+    _db_executor = db_executor
+
+
+def close_db_executor() -> None:
+    global _db_executor
+    if _db_executor:
+        _db_executor.shutdown()
+        _db_executor = None
+
+
+def get_db_executor() -> DBExecutor:
+    """
+    Returns the executor created at startup, or one sized from settings when
+    running outside of the app lifecycle (scripts, benchmarks).
+    """
+    if _db_executor is None:
+        set_db_executor(
+            DBExecutor(max_workers=settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW)
+        )
+    return _db_executor  # type: ignore
+
+
+def _replace_after_fork() -> None:
+    # The executor's threads weren't forked with it, a fresh one gets its own
+    global _db_executor
+    if _db_executor is not None:
+        _db_executor = DBExecutor(max_workers=_db_executor.max_workers)
+
+
+os.register_at_fork(after_in_child=_replace_after_fork)
+
+
+async def run_in_db_executor(
+    fn: Callable[P, T], *args: P.args, **kwargs: P.kwargs
+) -> T:
+    return await get_db_executor().run(fn, *args, **kwargs)
+
+
+async def run_in_db_session(
+    fn: Callable[Concatenate[Session, P], T],
+    db_session: LazySession,
+    *args: P.args,
+    **kwargs: P.kwargs,
+) -> T:
+    return await get_db_executor().run_in_session(fn, db_session, *args, **kwargs)
@@ -0,0 +1,149 @@
+"""
+Connection pool instrumentation.
+
+Checkout/checkin/connect/invalidate counts come from SQLAlchemy pool events
+registered on the engine, so they survive engine.dispose() recreating the
+pool. Pool events only fire once a connection has been handed out, so the
+time spent waiting for one (and pool timeouts) is measured by the
+Instrumented*Pool classes, which must be passed as the engine's poolclass.
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Union
+
+from sqlalchemy import event
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, PoolProxiedConnection
+from sqlalchemy.pool import QueuePool
+from typing_extensions import TypedDict
+
+from users_api.metrics import Histogram, HistogramSnapshot
+
+CHECKOUT_WAIT_BUCKETS_MS = (0.5, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class PoolSnapshot(TypedDict):
+    name: str
+    # None for pools without a fixed size (NullPool, StaticPool)
+    size: Optional[int]
+    checked_out: int
+    overflow: int
+    checkouts: int
+    connects: int
+    invalidations: int
+    timeouts: int
+    checkout_wait_ms: HistogramSnapshot
+
+
+class PoolMetrics:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.pool: Optional[Pool] = None
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.checkout_wait_ms = Histogram(CHECKOUT_WAIT_BUCKETS_MS)
+        self._lock = threading.Lock()
+
+    def attach(self, engine: Union[Engine, AsyncEngine]) -> "PoolMetrics":
+        if isinstance(engine, AsyncEngine):
+            engine = engine.sync_engine
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "invalidate", self._on_invalidate)
+        self.pool = engine.pool
+        if isinstance(engine.pool, InstrumentedPoolMixin):
+            engine.pool.metrics = self
+        return self
+
+    def _incr(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _on_checkout(self, *_: object) -> None:
+        self._incr("checkouts")
+
+    def _on_checkin(self, *_: object) -> None:
+        self._incr("checkins")
+
+    def _on_connect(self, *_: object) -> None:
+        self._incr("connects")
+
+    def _on_invalidate(self, *_: object) -> None:
+        self._incr("invalidations")
+
+    def on_timeout(self) -> None:
+        self._incr("timeouts")
+
+    def snapshot(self) -> PoolSnapshot:
+        size = getattr(self.pool, "size", lambda: None)()
+        overflow = getattr(self.pool, "overflow", lambda: 0)()
+        return {
+            "name": self.name,
+            "size": size,
+            "checked_out": self.checkouts - self.checkins,
+            # QueuePool counts overflow from -pool_size up
+            "overflow": max(overflow, 0),
+            "checkouts": self.checkouts,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "timeouts": self.timeouts,
+            "checkout_wait_ms": self.checkout_wait_ms.snapshot(),
+        }
+
+
+class InstrumentedPoolMixin(QueuePool):
+    metrics: Optional[PoolMetrics] = None
+
+    def connect(self) -> PoolProxiedConnection:
+        if self.metrics is None:
+            return super().connect()
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except sa_exc.TimeoutError:
+            self.metrics.on_timeout()
+            raise
+        finally:
+            self.metrics.checkout_wait_ms.observe(
+                (time.perf_counter() - started) * 1000
+            )
+
+    def recreate(self) -> QueuePool:
+        pool = super().recreate()
+        if isinstance(pool, InstrumentedPoolMixin):
+            pool.metrics = self.metrics
+        if self.metrics:
+            self.metrics.pool = pool
+        return pool
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+_pool_metrics: Dict[str, PoolMetrics] = {}
+
+
+def instrument_engine(engine: Union[Engine, AsyncEngine], name: str) -> PoolMetrics:
+    metrics = PoolMetrics(name).attach(engine)
+    _pool_metrics[name] = metrics
+    return metrics
+
+
+def clear_pool_metrics() -> None:
+    _pool_metrics.clear()
+
+
+def get_pool_metrics() -> List[PoolMetrics]:
+    return list(_pool_metrics.values())
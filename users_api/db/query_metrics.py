@@ -0,0 +1,121 @@
+"""
+Statement count and DB time of each request.
+
+Engines get before/after_cursor_execute hooks that add every statement's
+duration to the RequestQueries of the request running it, found through a
+context variable. Sync handlers run in threads and the DB executor copies
+the context into its threads, and SQLAlchemy's asyncio greenlets inherit
+it too, so statements land on the right request whichever way they're run.
+
+A statement string repeated within one request (same SQL, other
+parameters) is the shape of an N+1: a lazy load or a lookup in a loop.
+"""
+
+import contextlib
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple, Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import Scope
+
+from users_api.metrics import route_template
+
+_STARTED = "users_api_query_started"
+
+
+class RequestQueries:
+    """
+    Statements run for one request. Updated under a lock, a request's
+    statements can run on several threads.
+    """
+
+    def __init__(self, scope: Optional[Scope] = None) -> None:
+        # The request's ASGI scope, which gets its route once routed
+        self.scope = scope
+        self._lock = threading.Lock()
+        self.count = 0
+        self.duration = 0.0
+        self.statements: "Counter[str]" = Counter()
+
+    def record(self, statement: str, duration: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.duration += duration
+            self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statements run at least `threshold` times, most repeated first"""
+        with self._lock:
+            return [
+                (statement, count)
+                for statement, count in self.statements.most_common()
+                if count >= threshold
+            ]
+
+    @property
+    def route(self) -> Optional[str]:
+        return None if self.scope is None else route_template(self.scope)
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, durations in milliseconds"""
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries"'
+
+
+_current: ContextVar[Optional[RequestQueries]] = ContextVar(
+    "request_queries", default=None
+)
+
+
+@contextlib.contextmanager
+def track_queries(scope: Optional[Scope] = None) -> Iterator[RequestQueries]:
+    """Collects the statements instrumented engines run in this context"""
+    queries = RequestQueries(scope)
+    token = _current.set(queries)
+    try:
+        yield queries
+    finally:
+        _current.reset(token)
+
+
+def current_queries() -> Optional[RequestQueries]:
+    """The RequestQueries of the request running, if any"""
+    return _current.get()
+
+
+# pylint: disable=too-many-arguments
+def _before_execute(
+    conn: object,
+    cursor: object,
+    statement: str,
+    parameters: object,
+    context: object,
+    executemany: bool,
+) -> None:
+    setattr(context, _STARTED, time.perf_counter())
+
+
+def _after_execute(
+    conn: object,
+    cursor: object,
+    statement: str,
+    parameters: object,
+    context: object,
+    executemany: bool,
+) -> None:
+    queries = _current.get()
+    if queries is not None:
+        queries.record(statement, time.perf_counter() - getattr(context, _STARTED))
+
+
+def instrument_queries(engine: Union[Engine, AsyncEngine]) -> None:
+    if isinstance(engine, AsyncEngine):
+        engine = engine.sync_engine
+    if event.contains(engine, "after_cursor_execute", _after_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
@@ -0,0 +1,82 @@
+"""
+EXPLAIN helpers for Postgres query plans.
+
+Plans are read as FORMAT JSON and walked node by node. The query plan
+regression tests use them to find scans that read large parts of a table.
+"""
+
+from typing import Iterator, List, Mapping, Optional, Sequence, Union
+
+from sqlalchemy.engine import Connection
+from typing_extensions import TypedDict
+
+# A node of an EXPLAIN (FORMAT JSON) plan, only the keys read here. The
+# Actual keys are only there when the plan was analyzed.
+Plan = TypedDict(
+    "Plan",
+    {
+        "Node Type": str,
+        "Relation Name": str,
+        "Plans": List["Plan"],
+        "Actual Rows": float,
+        "Actual Loops": float,
+        "Rows Removed by Filter": float,
+        "Rows Removed by Index Recheck": float,
+    },
+    total=False,
+)
+Parameters = Optional[Union[Mapping[str, object], Sequence[object]]]
+
+SEQ_SCAN = "Seq Scan"
+SCAN_NODE_TYPES = (SEQ_SCAN, "Index Scan", "Index Only Scan", "Bitmap Heap Scan")
+# Statements EXPLAIN accepts, as opposed to SAVEPOINT, SET, etc.
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+def is_explainable(statement: str) -> bool:
+    return statement.lstrip().upper().startswith(EXPLAINABLE)
+
+
+def explain(
+    connection: Connection,
+    statement: str,
+    parameters: Parameters = None,
+    *,
+    analyze: bool = False,
+) -> Plan:
+    """
+    Plan of an already compiled `statement`, as handed to the DBAPI cursor.
+    ANALYZE executes the statement, so only use it on reads or inside a
+    transaction that gets rolled back.
+    """
+    options = "ANALYZE, FORMAT JSON" if analyze else "FORMAT JSON"
+    result = connection.exec_driver_sql(
+        f"EXPLAIN ({options}) {statement}", parameters or {}
+    )
+    plan: Plan = result.scalar_one()[0]["Plan"]
+    return plan
+
+
+def plan_nodes(plan: Plan) -> Iterator[Plan]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def scan_nodes(plan: Plan) -> Iterator[Plan]:
+    return (node for node in plan_nodes(plan) if node["Node Type"] in SCAN_NODE_TYPES)
+
+
+def rows_read(node: Plan) -> Optional[float]:
+    """
+    Rows an analyzed scan node went through over all its loops, counting the
+    ones its filters threw away. None for plans that weren't analyzed.
+    """
+    if "Actual Rows" not in node:
+        return None
+    per_loop = (
+        node["Actual Rows"]
+        + node.get("Rows Removed by Filter", 0)
+        + node.get("Rows Removed by Index Recheck", 0)
+    )
+    return per_loop * node["Actual Loops"]
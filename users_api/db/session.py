@@ -0,0 +1,81 @@
+import contextlib
+import threading
+from typing import Callable, Iterator, Optional, Union
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+# Session.info key of the sessions get_read_db binds to a replica
+REPLICA_INFO = "replica"
+
+
+def on_replica(db_session: Union[Session, AsyncSession]) -> bool:
+    """
+    Whether db_session reads a replica, which may lag the primary. What it
+    reads isn't cached: it may be a row a write already invalidated.
+    """
+    return bool(db_session.info.get(REPLICA_INFO))
+
+
+class LazySession:
+    """
+    Stands in for a request's Session without creating it.
+
+    The Session, and with it the connection checkout, only comes into being
+    the first time the handler uses it, so requests that fail validation or
+    return before touching the database never cost a pooled connection.
+    It isn't a Session: handlers pass managers get_session(), or hand it to
+    run_in_db_session() which builds it on the executor's thread. Attribute
+    access is forwarded to the real Session for anything else.
+
+    UsersRouter calls release() as soon as the endpoint returns, handing the
+    connection back before the response is serialized rather than when
+    FastAPI tears the dependency down. A call still running on the Session
+    in the DB executor, whose endpoint was cancelled, defers that until it
+    finishes.
+    """
+
+    def __init__(self, factory: Callable[[], Session]) -> None:
+        self._factory = factory
+        self._session: Optional[Session] = None
+        self._lock = threading.Lock()
+        # Executor calls running on the Session, see using()
+        self._in_use = 0
+        self._released = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._session is not None
+
+    def get_session(self) -> Session:
+        if self._session is None:
+            self._session = self._factory()
+        return self._session
+
+    @contextlib.contextmanager
+    def using(self) -> Iterator[Session]:
+        """The Session, which release() leaves open until this exits"""
+        with self._lock:
+            self._in_use += 1
+            session = self.get_session()
+        try:
+            yield session
+        finally:
+            with self._lock:
+                self._in_use -= 1
+                if not self._in_use and self._released:
+                    self._close()
+
+    def __getattr__(self, name: str) -> object:
+        return getattr(self.get_session(), name)
+
+    def release(self) -> None:
+        with self._lock:
+            self._released = True
+            if not self._in_use:
+                self._close()
+
+    def _close(self) -> None:
+        if self._session is not None:
+            self._session.close()
+            self._session = None
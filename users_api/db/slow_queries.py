@@ -0,0 +1,239 @@
+"""
+Slow query log.
+
+Statements slower than SLOW_QUERY_THRESHOLD_MS are logged and kept in a
+bounded ring buffer (see /internal/slow-queries) with their route, elapsed
+time and parameters. Parameters are redacted down to the values that can't
+carry PII: numbers, booleans, dates and UUIDs. Every string is redacted,
+as are the string literals plans print in their conditions.
+
+A SLOW_QUERY_EXPLAIN_SAMPLE_RATE fraction of the slow statements on Postgres
+also get their plan. The EXPLAIN runs on the statement's own connection, so
+it sees the request's uncommitted rows, and inside a savepoint that is
+always rolled back, so neither a failing EXPLAIN nor an ANALYZE touches the
+request's transaction. ANALYZE runs the statement a second time, so it's
+only ever used on SELECTs, and only with SLOW_QUERY_EXPLAIN_ANALYZE.
+"""
+
+import datetime
+import decimal
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable, Deque, Dict, List, Mapping, Optional, Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from typing_extensions import TypedDict
+
+from users_api import settings
+from users_api.db.query_metrics import current_queries
+from users_api.db.query_plans import Parameters, Plan, explain, is_explainable
+
+logger = logging.getLogger(__name__)
+
+REDACTED = "<redacted>"
+_STARTED = "users_api_slow_query_started"
+# Set on a connection while it runs an EXPLAIN, which mustn't be logged
+_EXPLAINING = "users_api_explaining"
+# Parameter values that can't carry PII, kept as their str()
+_SAFE_TYPES = (decimal.Decimal, datetime.date, datetime.time, uuid.UUID)
+# A SQL string literal, as plans print the parameters in their conditions
+_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+# A parameter value kept as is, its str() or REDACTED
+Redacted = Union[None, bool, int, float, str]
+
+
+class SlowQuery(TypedDict):
+    at: float
+    engine: str
+    route: Optional[str]
+    elapsed_ms: float
+    statement: str
+    # See redact()
+    parameters: object
+    plan: Optional[Dict[str, object]]
+
+
+def redact_value(value: object) -> Redacted:
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, _SAFE_TYPES):
+        return str(value)
+    if isinstance(value, str):
+        try:
+            return str(uuid.UUID(value))
+        except ValueError:
+            return REDACTED
+    return REDACTED
+
+
+def redact(parameters: object, executemany: bool = False) -> object:
+    """
+    JSON friendly copy of a statement's DBAPI parameters without their PII.
+    An executemany's list of rows is summed up as its first row and count.
+    """
+    if executemany:
+        rows = list(parameters) if isinstance(parameters, (list, tuple)) else []
+        return {"rows": len(rows), "first": redact(rows[0]) if rows else None}
+    if isinstance(parameters, Mapping):
+        return {name: redact_value(value) for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact_value(value) for value in parameters]
+    return redact_value(parameters)
+
+
+def _redact_literals(value: object) -> object:
+    if isinstance(value, dict):
+        return {key: _redact_literals(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_redact_literals(item) for item in value]
+    if isinstance(value, str):
+        return _LITERAL.sub(f"'{REDACTED}'", value)
+    return value
+
+
+def redact_plan(plan: Plan) -> Dict[str, object]:
+    """A plan without the string literals of its conditions"""
+    return {key: _redact_literals(value) for key, value in plan.items()}
+
+
+class SlowQueryLog:
+    def __init__(
+        self,
+        threshold_ms: float,
+        max_entries: int,
+        explain_sample_rate: float = 0.0,
+        analyze: bool = False,
+        sample: Callable[[], float] = random.random,
+    ) -> None:
+        self.threshold_ms = threshold_ms
+        self.explain_sample_rate = explain_sample_rate
+        self.analyze = analyze
+        self._sample = sample
+        self._lock = threading.Lock()
+        self._entries: Deque[SlowQuery] = deque(maxlen=max_entries)
+
+    def attach(self, engine: Union[Engine, AsyncEngine], name: str) -> "SlowQueryLog":
+        if isinstance(engine, AsyncEngine):
+            engine = engine.sync_engine
+
+        # pylint: disable=too-many-arguments
+        def before_execute(
+            conn: Connection,
+            cursor: object,
+            statement: str,
+            parameters: Parameters,
+            context: object,
+            executemany: bool,
+        ) -> None:
+            setattr(context, _STARTED, time.perf_counter())
+
+        def after_execute(
+            conn: Connection,
+            cursor: object,
+            statement: str,
+            parameters: Parameters,
+            context: object,
+            executemany: bool,
+        ) -> None:
+            elapsed_ms = (time.perf_counter() - getattr(context, _STARTED)) * 1000
+            if elapsed_ms >= self.threshold_ms and not conn.info.get(_EXPLAINING):
+                self.record(conn, name, statement, parameters, executemany, elapsed_ms)
+
+        event.listen(engine, "before_cursor_execute", before_execute)
+        event.listen(engine, "after_cursor_execute", after_execute)
+        return self
+
+    # pylint: disable=too-many-arguments
+    def record(
+        self,
+        conn: Connection,
+        engine_name: str,
+        statement: str,
+        parameters: Parameters,
+        executemany: bool,
+        elapsed_ms: float,
+    ) -> None:
+        queries = current_queries()
+        entry: SlowQuery = {
+            "at": time.time(),
+            "engine": engine_name,
+            "route": queries.route if queries else None,
+            "elapsed_ms": elapsed_ms,
+            "statement": statement,
+            "parameters": redact(parameters, executemany),
+            "plan": None,
+        }
+        logger.warning(
+            "Slow query on %s took %.1f ms: %s parameters=%s",
+            entry["route"],
+            elapsed_ms,
+            statement,
+            entry["parameters"],
+        )
+        if self._should_explain(conn, statement, executemany):
+            entry["plan"] = self._explain(conn, statement, parameters)
+        with self._lock:
+            self._entries.append(entry)
+
+    def entries(self) -> List[SlowQuery]:
+        """Newest first"""
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _should_explain(
+        self, conn: Connection, statement: str, executemany: bool
+    ) -> bool:
+        return (
+            conn.dialect.name == "postgresql"
+            and not executemany
+            and is_explainable(statement)
+            and self._sample() < self.explain_sample_rate
+        )
+
+    def _explain(
+        self, conn: Connection, statement: str, parameters: Parameters
+    ) -> Optional[Dict[str, object]]:
+        analyze = self.analyze and statement.lstrip().upper().startswith("SELECT")
+        conn.info[_EXPLAINING] = True
+        savepoint = conn.begin_nested()
+        try:
+            return redact_plan(explain(conn, statement, parameters, analyze=analyze))
+        except Exception:  # pylint: disable=broad-except
+            logger.warning("EXPLAIN of a slow query failed", exc_info=True)
+            return None
+        finally:
+            savepoint.rollback()
+            conn.info.pop(_EXPLAINING, None)
+
+
+_slow_query_log: Optional[SlowQueryLog] = None
+
+
+def get_slow_query_log() -> SlowQueryLog:
+    global _slow_query_log  # pylint: disable=global-statement
+    if _slow_query_log is None:
+        _slow_query_log = SlowQueryLog(
+            threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+            max_entries=settings.SLOW_QUERY_LOG_SIZE,
+            explain_sample_rate=settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+            analyze=settings.SLOW_QUERY_EXPLAIN_ANALYZE,
+        )
+    return _slow_query_log
+
+
+def instrument_slow_queries(
+    engine: Union[Engine, AsyncEngine], name: str
+) -> SlowQueryLog:
+    return get_slow_query_log().attach(engine, name)
@@ -20,6 +20,9 @@ class EnumAsString(sqlalchemy.types.TypeDecorator):
     """
 
     impl = sqlalchemy.types.VARCHAR  # underlying database type
+    # The cache key is built from the __init__ arguments (enum_type, length,
+    # use_value), which fully determine how values are bound and read back
+    cache_ok = True
 
     def __repr__(self):
         return (
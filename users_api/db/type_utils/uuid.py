@@ -1,7 +1,7 @@
 # type: ignore
 import uuid
 
-from sqlalchemy import TypeDecorator
+from sqlalchemy import CHAR, TypeDecorator
 from sqlalchemy.dialects.postgresql import UUID
 
 
@@ -14,12 +14,16 @@ class GUID(TypeDecorator):
     """
 
     impl = UUID(as_uuid=True)
+    # Stateless, so safe to include in SQLAlchemy's compiled statement cache key
+    cache_ok = True
 
     def __repr__(self):
         return "postgresql.UUID()"
 
     def load_dialect_impl(self, dialect):
-        return dialect.type_descriptor(UUID(as_uuid=True))
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(UUID(as_uuid=True))
+        return dialect.type_descriptor(CHAR(32))
 
     def process_bind_param(self, value, dialect):
         if value is None or dialect.name == "postgresql":
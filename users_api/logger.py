@@ -1,20 +1,157 @@
+"""
+Logging for the service.
+
+Request threads only put records on a bounded queue (RequestQueueHandler),
+a QueueListener thread formats them as JSON lines and writes them out, so
+neither formatting nor I/O happens on the request path. When the queue is
+full records are dropped and counted rather than blocking the request.
+
+Each record carries the request_id of the request that logged it (see
+RequestIdMiddleware). DEBUG records are sampled, LOG_DEBUG_SAMPLE_RATE of
+them are kept.
+
+Messages are only %-formatted with their args on the listener thread, so
+don't log objects that get mutated right after the call.
+"""
+
+import datetime
 import logging
+import queue
+import random
+import sys
+import threading
+from contextvars import ContextVar
+from dataclasses import dataclass
+from logging.handlers import QueueHandler, QueueListener
+from typing import IO, Callable, Dict, Optional
+
+import orjson
+
+from users_api import settings
+
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has, anything else was passed in `extra`
+_RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord("", 0, "", 0, "", None, None).__dict__
+) | {"message", "asctime", "request_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, `extra` fields included"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, object] = {
+            "time": datetime.datetime.fromtimestamp(
+                record.created, tz=datetime.timezone.utc
+            ).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        for name, value in record.__dict__.items():
+            if name not in _RECORD_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return orjson.dumps(entry, default=str).decode()
+
+
+class DebugSampler(logging.Filter):
+    """Keeps a `rate` fraction of the records below INFO, all the others"""
+
+    def __init__(self, rate: float, sample: Callable[[], float] = random.random):
+        super().__init__()
+        self.rate = rate
+        self._sample = sample
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.INFO or self._sample() < self.rate
+
+
+class RequestQueueHandler(QueueHandler):
+    """
+    Hands records to a QueueListener without formatting them. Stamps them
+    with the request_id first, the listener thread can't see the request's
+    context.
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]") -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue is in-process, records don't need to be made picklable
+        record.request_id = request_id.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+
+@dataclass
+class LoggingSystem:
+    handler: RequestQueueHandler
+    listener: QueueListener
+
+
+_logging_system: Optional[LoggingSystem] = None
+
+
+def configure_logging(stream: Optional[IO[str]] = None) -> LoggingSystem:
+    """
+    Routes the root logger through a RequestQueueHandler to JSON lines on
+    `stream` (stderr). Replaces what an earlier call configured.
+    """
+    global _logging_system  # pylint: disable=global-statement
+    stop_logging()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter())
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(settings.LOG_QUEUE_SIZE)
+    handler = RequestQueueHandler(log_queue)
+    handler.addFilter(DebugSampler(settings.LOG_DEBUG_SAMPLE_RATE))
+    listener = QueueListener(log_queue, output, respect_handler_level=True)
+
+    root = logging.getLogger()
+    root.setLevel(settings.LOG_LEVEL)
+    root.addHandler(handler)
+    listener.start()
+    _logging_system = LoggingSystem(handler, listener)
+    return _logging_system
+
+
+def dropped_log_records() -> int:
+    """Records dropped since configure_logging() because the queue was full"""
+    return 0 if _logging_system is None else _logging_system.handler.dropped
+
+
+def stop_logging() -> None:
+    """Writes out the queued records and detaches the handler"""
+    global _logging_system  # pylint: disable=global-statement
+    if _logging_system is None:
+        return
+    logging.getLogger().removeHandler(_logging_system.handler)
+    _logging_system.listener.stop()
+    _logging_system = None
+
 
 class UsersLogger:
+    """
+    Named logger. Handlers are set up once for the whole process by
+    configure_logging(), this no longer adds one per instance.
+    """
+
     def __init__(self, name: str):
         self.logger = logging.getLogger(name)
-        self.logger.setLevel(logging.INFO)
-        
-        # Create a console handler and set the level to INFO
-        ch = logging.StreamHandler()
-        ch.setLevel(logging.INFO)
-        
-        # Create a formatter and add it to the handler
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        ch.setFormatter(formatter)
-        
-        # Add the handler to the logger
-        self.logger.addHandler(ch)
-    
-    def get_logger(self):
+
+    def get_logger(self) -> logging.Logger:
         return self.logger
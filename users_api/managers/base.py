@@ -1,11 +1,138 @@
-from typing import TypeVar, Type, Generic, List, Optional
+import datetime
+from dataclasses import dataclass
+from typing import (
+    AsyncIterator,
+    Iterable,
+    Generic,
+    Iterator,
+    List,
+    Optional,
+    Protocol,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 from uuid import UUID
 
+from sqlalchemy import Row, Select, literal, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from users_api.db.session import on_replica
 from users_api.models.base import Base, BaseQuery  # type: ignore
+from users_api.schemas.pagination import KeysetKey
 
 ModelType = TypeVar("ModelType", bound=Base)
+T = TypeVar("T")
+# The columns a Select returns
+Columns = TypeVar("Columns", bound=Tuple[object, ...])
+
+
+class Keyed(Protocol):
+    """A model or row that a page can end on, see keyset_paginate"""
+
+    @property
+    def created_at(self) -> datetime.datetime: ...
+
+    @property
+    def id(self) -> UUID: ...
+
+
+KeyedT = TypeVar("KeyedT", bound=Keyed)
+
+# (id, created_at, last_updated) of versions()
+VersionColumns = Tuple[UUID, datetime.datetime, Optional[datetime.datetime]]
+VersionRow = Row[VersionColumns]
+# Columns picked by field name, see with_columns
+FieldsColumns = Tuple[object, ...]
+FieldsRow = Row[FieldsColumns]
+
+
+@dataclass
+class Page(Generic[T]):
+    items: Sequence[T]
+    # Key of the last item, None when there are no more rows
+    next_key: Optional[KeysetKey]
+
+
+def keyset_paginate(
+    stmt: Select[Columns],
+    model: Type[ModelType],
+    after: Optional[KeysetKey],
+    limit: int,
+) -> Select[Columns]:
+    """
+    Orders `stmt` by (created_at, id) and starts it after the `after` key.
+    Unlike OFFSET this seeks straight to the page through the
+    (created_at, id) index, however deep the page is. One extra row is
+    fetched to tell whether there's a next page.
+
+    The key is bound through the columns' types, so it's compared in the
+    format they're stored in (text on SQLite) rather than a driver default.
+    """
+    if after is not None:
+        created_at, id_ = after
+        stmt = stmt.where(
+            tuple_(model.created_at, model.id)
+            > tuple_(
+                literal(created_at, model.created_at.type),
+                literal(id_, model.id.type),
+            )
+        )
+    return stmt.order_by(model.created_at, model.id).limit(limit + 1)
+
+
+def versions(model: Type[ModelType]) -> Select[VersionColumns]:
+    """
+    (id, created_at, last_updated) of `model`: enough to build an ETag or a
+    page's cursor without loading the rows.
+    """
+    return select(model.id, model.created_at, model.last_updated)
+
+
+def with_columns(
+    stmt: Select[Columns], model: Type[ModelType], fields: Iterable[str]
+) -> Select[FieldsColumns]:
+    """Adds the columns of `fields` that `stmt` doesn't select yet"""
+    selected = set(stmt.selected_columns.keys())
+    return stmt.add_columns(
+        *(getattr(model, field) for field in fields if field not in selected)
+    )
+
+
+def streamed(
+    stmt: Select[Columns], model: Type[ModelType], batch_size: int
+) -> Select[Columns]:
+    """
+    Orders `stmt` by (created_at, id) and reads it through a server-side
+    cursor `batch_size` rows at a time, so only one batch is held in memory.
+    Collections can't be joinedload-ed under yield_per, use selectinload.
+    """
+    return stmt.order_by(model.created_at, model.id).execution_options(
+        yield_per=batch_size
+    )
+
+
+def chunked(items: Sequence[T], size: int) -> Iterable[Sequence[T]]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def to_page(rows: Sequence[KeyedT], limit: int) -> Page[KeyedT]:
+    if len(rows) <= limit:
+        return Page(items=rows, next_key=None)
+    items = rows[:limit]
+    return Page(items=items, next_key=(items[-1].created_at, items[-1].id))
+
+
+def flight_key(key: str, db_session: Union[Session, AsyncSession]) -> str:
+    """
+    The single-flight key of loading cache `key` on db_session. Clients
+    that just wrote read the primary, they mustn't share a replica's load.
+    """
+    return f"{key}:replica" if on_replica(db_session) else key
 
 
 class BaseManager(Generic[ModelType]):
@@ -21,9 +148,127 @@ class BaseManager(Generic[ModelType]):
     ) -> List[ModelType]:
         return db_session.query(self.model).offset(skip).limit(limit).all()  # type: ignore
 
+    def get_page(
+        self,
+        db_session: Session,
+        *,
+        after: Optional[KeysetKey] = None,
+        limit: int = 100,
+    ) -> Page[ModelType]:
+        stmt = keyset_paginate(select(self.model), self.model, after, limit)
+        return to_page(db_session.scalars(stmt).all(), limit)
+
+    def get_version(self, db_session: Session, id: UUID) -> Optional[VersionRow]:
+        return db_session.execute(
+            versions(self.model).where(self.model.id == id)
+        ).first()
+
+    def get_page_versions(
+        self,
+        db_session: Session,
+        *,
+        after: Optional[KeysetKey] = None,
+        limit: int = 100,
+    ) -> Page[VersionRow]:
+        """get_page() as versions() rows"""
+        stmt = keyset_paginate(versions(self.model), self.model, after, limit)
+        return to_page(db_session.execute(stmt).all(), limit)
+
+    def stream(
+        self, db_session: Session, *, batch_size: int = 1000
+    ) -> Iterator[Sequence[ModelType]]:
+        """Every row, in (created_at, id) order, one batch at a time"""
+        stmt = streamed(select(self.model), self.model, batch_size)
+        yield from db_session.scalars(stmt).partitions()
+
+    def get_page_fields(
+        self,
+        db_session: Session,
+        fields: Sequence[str],
+        *,
+        after: Optional[KeysetKey] = None,
+        limit: int = 100,
+    ) -> Page[FieldsRow]:
+        """
+        get_page_versions() rows with the `fields` columns added. Only those
+        columns are read, and rows never enter the identity map.
+        """
+        stmt = with_columns(versions(self.model), self.model, fields)
+        stmt = keyset_paginate(stmt, self.model, after, limit)
+        return to_page(db_session.execute(stmt).all(), limit)
+
     def only(self, db_session: Session, fields: List[str]) -> BaseQuery:
         """
         Only select the passed in list of fields
         """
         # Incompatible return value type (got "Query[Any]", expected "BaseQuery")
         return db_session.query(*[getattr(self.model, f) for f in fields])
+
+
+class AsyncBaseManager(Generic[ModelType]):
+    """
+    AsyncSession counterpart of BaseManager. AsyncSession has no legacy
+    `.query()` interface, so everything here is written with `select()`.
+    """
+
+    def __init__(self, model: Type[ModelType]) -> None:
+        self.model = model
+
+    # pylint: disable=redefined-builtin,invalid-name
+    async def get(self, db_session: AsyncSession, id: UUID) -> Optional[ModelType]:
+        result = await db_session.execute(select(self.model).where(self.model.id == id))
+        return result.scalars().first()
+
+    async def get_multi(
+        self, db_session: AsyncSession, *, skip: int = 0, limit: int = 100
+    ) -> Sequence[ModelType]:
+        result = await db_session.execute(select(self.model).offset(skip).limit(limit))
+        return result.scalars().all()
+
+    async def get_page(
+        self,
+        db_session: AsyncSession,
+        *,
+        after: Optional[KeysetKey] = None,
+        limit: int = 100,
+    ) -> Page[ModelType]:
+        stmt = keyset_paginate(select(self.model), self.model, after, limit)
+        return to_page((await db_session.scalars(stmt)).all(), limit)
+
+    async def get_version(
+        self, db_session: AsyncSession, id: UUID
+    ) -> Optional[VersionRow]:
+        result = await db_session.execute(
+            versions(self.model).where(self.model.id == id)
+        )
+        return result.first()
+
+    async def get_page_versions(
+        self,
+        db_session: AsyncSession,
+        *,
+        after: Optional[KeysetKey] = None,
+        limit: int = 100,
+    ) -> Page[VersionRow]:
+        stmt = keyset_paginate(versions(self.model), self.model, after, limit)
+        return to_page((await db_session.execute(stmt)).all(), limit)
+
+    async def get_page_fields(
+        self,
+        db_session: AsyncSession,
+        fields: Sequence[str],
+        *,
+        after: Optional[KeysetKey] = None,
+        limit: int = 100,
+    ) -> Page[FieldsRow]:
+        stmt = with_columns(versions(self.model), self.model, fields)
+        stmt = keyset_paginate(stmt, self.model, after, limit)
+        return to_page((await db_session.execute(stmt)).all(), limit)
+
+    async def stream(
+        self, db_session: AsyncSession, *, batch_size: int = 1000
+    ) -> AsyncIterator[Sequence[ModelType]]:
+        stmt = streamed(select(self.model), self.model, batch_size)
+        result = await db_session.stream_scalars(stmt)
+        async for partition in result.partitions():
+            yield partition
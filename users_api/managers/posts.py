@@ -1,20 +1,251 @@
+import datetime
+from typing import AsyncIterator, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+from typing import Union
 from uuid import UUID
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import Delete, Row, Select, delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased, joinedload, selectinload
+from sqlalchemy.sql.dml import ReturningDelete, ReturningUpdate
 
-from users_api.managers.base import BaseManager
+from users_api.cache.keys import post_key, user_key
+from users_api.cache.singleflight import async_flights, flights
+from users_api.cache.store import fill, generation, get_cache, invalidate
+from users_api.db.session import on_replica
+from users_api.managers.base import (
+    AsyncBaseManager,
+    BaseManager,
+    FieldsColumns,
+    FieldsRow,
+    Page,
+    flight_key,
+    VersionColumns,
+    keyset_paginate,
+    streamed,
+    to_page,
+    versions,
+    with_columns,
+)
 
 from users_api.models.orm.posts import PostsORM
 from users_api.models.orm.users import UsersORM
+from users_api.models.orm.users_and_posts import users_and_posts
+from users_api.models.posts import Post
+from users_api.schemas.helpers import (
+    POST_FIELDS,
+    USER_FIELDS,
+    post_payload,
+    post_response,
+)
 from users_api.schemas.posts import (
     CreatePostRequest,
     DeletePostResponse,
     UpdatePostRequest,
 )
+from users_api.schemas.pagination import KeysetKey
 from fastapi import HTTPException, status
 
 
+def posts_with_users() -> Select[Tuple[PostsORM]]:
+    """
+    Posts that have a user, with the users eager loaded. EXISTS rather than
+    joining users keeps one row per post, so a LIMIT counts posts.
+
+    Users are selectin loaded, one `post_id IN (...)` query per page or
+    batch. A joined load would outer join every user link to the limited
+    posts, and it can't be combined with yield_per at all.
+    """
+    return (
+        select(PostsORM)
+        .where(PostsORM.users.any())
+        .options(selectinload(PostsORM.users))
+    )
+
+
+def streamed_posts_with_users(batch_size: int) -> Select[Tuple[PostsORM]]:
+    """posts_with_users() for server-side cursors"""
+    return streamed(posts_with_users(), PostsORM, batch_size)
+
+
+# versions() columns plus the latest last_updated of the post's users
+PostVersionColumns = Tuple[
+    UUID, datetime.datetime, Optional[datetime.datetime], Optional[datetime.datetime]
+]
+PostVersionRow = Row[PostVersionColumns]
+
+
+def post_versions() -> Select[PostVersionColumns]:
+    """
+    versions() of the posts that have a user, plus the latest last_updated of
+    their users since a post's payload embeds its user. The correlated
+    subquery keeps one row per post.
+    """
+    users_last_updated = (
+        select(func.max(UsersORM.last_updated))
+        .join(users_and_posts, users_and_posts.c.user_id == UsersORM.id)
+        .where(users_and_posts.c.post_id == PostsORM.id)
+        .scalar_subquery()
+    )
+    return (
+        versions(PostsORM)
+        .add_columns(users_last_updated.label("user_last_updated"))
+        .where(PostsORM.users.any())
+    )
+
+
+def users_of_posts(post_ids: Sequence[UUID]) -> Select[FieldsColumns]:
+    """
+    (post_id, *User fields) rows of the users of `post_ids`, the user a post's
+    payload embeds (see schemas.helpers.embedded_user) first
+    """
+    return (
+        select(
+            users_and_posts.c.post_id,
+            *(getattr(UsersORM, field) for field in USER_FIELDS),
+        )
+        .select_from(UsersORM)
+        .join(users_and_posts, users_and_posts.c.user_id == UsersORM.id)
+        .where(users_and_posts.c.post_id.in_(post_ids))
+        .order_by(UsersORM.last_updated.desc().nulls_last(), UsersORM.id.desc())
+    )
+
+
+def first_user(post_id: UUID) -> Select[FieldsColumns]:
+    """The row of users_of_posts() a post's payload embeds"""
+    return users_of_posts([post_id]).limit(1)
+
+
+def first_user_by_post(rows: Iterable[FieldsRow]) -> Dict[UUID, FieldsRow]:
+    users: Dict[UUID, FieldsRow] = {}
+    for row in rows:
+        users.setdefault(row.post_id, row)
+    return users
+
+
+# Dialects whose UPDATE ... FROM can return the joined tables' columns,
+# SQLite's RETURNING only sees the updated table
+RETURNING_JOINS = {"postgresql"}
+
+
+def updated_post(
+    dialect_name: str, post_id: UUID, obj_in: UpdatePostRequest
+) -> ReturningUpdate[FieldsColumns]:
+    """
+    UPDATE of a post that has a user, when obj_in.user_id exists, returning
+    the post's columns. On RETURNING_JOINS dialects the user its payload
+    embeds (the first of users_of_posts) is joined in with UPDATE ... FROM
+    and returned as user_* columns.
+
+    Built on the posts Table rather than PostsORM: an ORM-enabled UPDATE
+    can't return the columns of another entity.
+    """
+    posts = PostsORM.__table__
+    valid_user = aliased(UsersORM)
+    stmt = (
+        update(posts)
+        .where(posts.c.id == post_id)
+        .where(select(valid_user.id).where(valid_user.id == obj_in.user_id).exists())
+        .values(title=obj_in.title, content=obj_in.content)
+        .returning(*(posts.c[field] for field in POST_FIELDS))
+    )
+    if dialect_name not in RETURNING_JOINS:
+        return stmt.where(PostsORM.users.any())
+
+    user = first_user(post_id).subquery()
+    return stmt.where(user.c.post_id == posts.c.id).returning(
+        *(user.c[field].label(f"user_{field}") for field in USER_FIELDS)
+    )
+
+
+def post_with_user_exists(post_id: UUID) -> Select[Tuple[bool]]:
+    return select(
+        select(PostsORM.id).where(PostsORM.id == post_id, PostsORM.users.any()).exists()
+    )
+
+
+def post_not_found() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+
+
+def invalid_user_id() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid user_id"
+    )
+
+
+def post_update_error(post_exists: bool) -> HTTPException:
+    """Why updated_post() matched no row"""
+    if not post_exists:
+        return post_not_found()
+    return invalid_user_id()
+
+
+def unlinked_post(post_id: UUID) -> Delete:
+    """Deletes the post's user links, which reference it"""
+    return delete(users_and_posts).where(users_and_posts.c.post_id == post_id)
+
+
+def deleted_post(post_id: UUID) -> ReturningDelete[Tuple[UUID]]:
+    return (
+        delete(PostsORM)
+        .where(PostsORM.id == post_id)
+        .returning(PostsORM.id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def new_post(obj_in: CreatePostRequest, user: Optional[UsersORM]) -> PostsORM:
+    """The post to add for obj_in, 400 if its user doesn't exist"""
+    if user is None:
+        raise invalid_user_id()
+    post = PostsORM(
+        title=obj_in.title,
+        description=obj_in.description,
+        content=obj_in.content,
+    )
+    # Assigning on the pending post (rather than appending to user.posts)
+    # avoids loading the user's whole posts collection
+    post.users = [user]
+    return post
+
+
+def cache_post(
+    db_session: Union[Session, AsyncSession], post: Post, since: int
+) -> None:
+    """fill() with a post read at generation `since`, unless off a replica"""
+    if on_replica(db_session):
+        return
+    # A post embeds its user, so user writes drop it too
+    depends_on = [user_key(post.user.id)] if post.user.id is not None else []
+    fill(post_key(post.id), post, since, depends_on=depends_on)
+
+
 class PostsManager(BaseManager[PostsORM]):
 
+    def cached_post(self, post_id: UUID) -> Optional[Post]:
+        """Cache lookup only, never touches the database"""
+        post = get_cache().get(post_key(post_id))
+        return post if isinstance(post, Post) else None
+
+    def load_post(self, db_session: Session, post_id: UUID) -> Post:
+        """
+        Reads the post from the database and caches it, unless it was read
+        off a replica, 404 if missing. Concurrent loads of one post share a
+        single query.
+        """
+        return flights.do(
+            flight_key(post_key(post_id), db_session),
+            lambda: self.read_post(db_session, post_id),
+        )
+
+    def read_post(self, db_session: Session, post_id: UUID) -> Post:
+        since = generation()
+        post = post_response(self.get_post_by_id(db_session, post_id))
+        cache_post(db_session, post, since)
+        return post
+
+    def get_post(self, db_session: Session, post_id: UUID) -> Post:
+        return self.cached_post(post_id) or self.load_post(db_session, post_id)
+
     def get_all_posts(self, db_session: Session):
         return (
             db_session.query(self.model)
@@ -25,27 +256,67 @@ class PostsManager(BaseManager[PostsORM]):
             .all()
         )
 
-    def create_post(self, db_session: Session, obj_in: CreatePostRequest) -> PostsORM:
-        # Check if the user_id exists
-        user = db_session.query(UsersORM).filter_by(id=obj_in.user_id).first()
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid user_id"
-            )
+    def get_posts_page(
+        self,
+        db_session: Session,
+        *,
+        after: Optional[KeysetKey] = None,
+        limit: int = 100,
+    ) -> Page[PostsORM]:
+        stmt = keyset_paginate(posts_with_users(), self.model, after, limit)
+        return to_page(db_session.scalars(stmt).all(), limit)
 
-        # Create a new post
-        db_post = self.model(
-            title=obj_in.title,
-            content=obj_in.content,
-            # user_id=obj_in.user_id,
-        )
+    def get_post_version(
+        self, db_session: Session, post_id: UUID
+    ) -> Optional[PostVersionRow]:
+        return db_session.execute(
+            post_versions().where(self.model.id == post_id)
+        ).first()
+
+    def get_posts_page_versions(
+        self,
+        db_session: Session,
+        *,
+        after: Optional[KeysetKey] = None,
+        limit: int = 100,
+    ) -> Page[PostVersionRow]:
+        """get_posts_page() as post_versions() rows"""
+        stmt = keyset_paginate(post_versions(), self.model, after, limit)
+        return to_page(db_session.execute(stmt).all(), limit)
+
+    def get_posts_page_fields(
+        self,
+        db_session: Session,
+        fields: Sequence[str],
+        *,
+        after: Optional[KeysetKey] = None,
+        limit: int = 100,
+    ) -> Page[FieldsRow]:
+        """
+        get_posts_page_versions() rows with the `fields` columns added, see
+        BaseManager.get_page_fields. `user` is read by get_users_of_posts.
+        """
+        columns = [field for field in fields if field != "user"]
+        stmt = with_columns(post_versions(), self.model, columns)
+        stmt = keyset_paginate(stmt, self.model, after, limit)
+        return to_page(db_session.execute(stmt).all(), limit)
 
-        # update mapping
-        user.posts.append(db_post)
+    def get_users_of_posts(
+        self, db_session: Session, post_ids: Sequence[UUID]
+    ) -> Dict[UUID, FieldsRow]:
+        """Post id -> its user's User fields, one IN query for all the posts"""
+        return first_user_by_post(db_session.execute(users_of_posts(post_ids)))
 
+    def stream_posts(
+        self, db_session: Session, *, batch_size: int = 1000
+    ) -> Iterator[Sequence[PostsORM]]:
+        stmt = streamed_posts_with_users(batch_size)
+        yield from db_session.scalars(stmt).partitions()
+
+    def create_post(self, db_session: Session, obj_in: CreatePostRequest) -> PostsORM:
+        db_post = new_post(obj_in, db_session.get(UsersORM, obj_in.user_id))
         db_session.add(db_post)
         db_session.commit()
-        db_session.refresh(db_post)
         return db_post
 
     def get_post_by_id(self, db_session: Session, post_id: UUID) -> PostsORM:
@@ -66,51 +337,181 @@ class PostsManager(BaseManager[PostsORM]):
 
     def update_post(
         self, db_session: Session, post_id: UUID, obj_in: UpdatePostRequest
-    ) -> PostsORM:
-        # Fetch the post by ID
-        db_post = (
-            db_session.query(self.model)
-            .filter_by(id=post_id)
-            .join(self.model.users)  # Join the users through the relationship
-            .options(
-                joinedload(self.model.users)
-            )  # Eager load the related users, solves N+1 problem
-            .first()
-        )
-        if not db_post:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Post not found"
+    ) -> Post:
+        """
+        One UPDATE ... RETURNING (plus a SELECT of the user on SQLite), 404
+        if the post doesn't exist, 400 if the user doesn't
+        """
+        dialect_name = db_session.get_bind().dialect.name
+        row = db_session.execute(updated_post(dialect_name, post_id, obj_in)).first()
+        if row is None:
+            raise post_update_error(
+                db_session.execute(post_with_user_exists(post_id)).scalar_one()
             )
 
-        # Validate user_id
-        user = db_session.query(UsersORM).filter_by(id=obj_in.user_id).first()
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid user_id"
-            )
+        user, prefix = row, "user_"
+        if dialect_name not in RETURNING_JOINS:
+            user, prefix = db_session.execute(first_user(post_id)).one(), ""
+        db_session.commit()
+
+        invalidate(post_key(post_id))
+        return post_payload(row, user, prefix)
 
-        # Update the post details
-        db_post.title = obj_in.title
-        db_post.content = obj_in.content
-        db_post.user_id = obj_in.user_id
+    def delete_post(self, db_session: Session, post_id: UUID) -> DeletePostResponse:
+        db_session.execute(unlinked_post(post_id))
+        deleted = db_session.execute(deleted_post(post_id)).first()
+        if deleted is None:
+            raise post_not_found()
 
         db_session.commit()
-        db_session.refresh(db_post)
-        return db_post
+        invalidate(post_key(deleted.id))
+        return DeletePostResponse(
+            status="Post deleted successfully", code=status.HTTP_204_NO_CONTENT
+        )
+
+
+class AsyncPostsManager(AsyncBaseManager[PostsORM]):
+    """
+    AsyncSession counterpart of PostsManager. Relationships are never lazy
+    loaded under asyncio, so every read that hands back `users` eager loads it.
+    """
 
-    def delete_post(self, db_session: Session, post_id: str) -> DeletePostResponse:
-        db_post: PostsORM = db_session.query(self.model).filter_by(id=post_id).first()
+    def cached_post(self, post_id: UUID) -> Optional[Post]:
+        post = get_cache().get(post_key(post_id))
+        return post if isinstance(post, Post) else None
 
+    async def load_post(self, db_session: AsyncSession, post_id: UUID) -> Post:
+        return await async_flights.do(
+            flight_key(post_key(post_id), db_session),
+            lambda: self.read_post(db_session, post_id),
+        )
+
+    async def read_post(self, db_session: AsyncSession, post_id: UUID) -> Post:
+        since = generation()
+        post = post_response(await self.get_post_by_id(db_session, post_id))
+        cache_post(db_session, post, since)
+        return post
+
+    async def get_post(self, db_session: AsyncSession, post_id: UUID) -> Post:
+        return self.cached_post(post_id) or await self.load_post(db_session, post_id)
+
+    async def get_all_posts(self, db_session: AsyncSession) -> Sequence[PostsORM]:
+        result = await db_session.execute(
+            select(self.model)
+            .join(self.model.users)
+            .options(joinedload(self.model.users))
+        )
+        return result.unique().scalars().all()
+
+    async def get_posts_page(
+        self,
+        db_session: AsyncSession,
+        *,
+        after: Optional[KeysetKey] = None,
+        limit: int = 100,
+    ) -> Page[PostsORM]:
+        stmt = keyset_paginate(posts_with_users(), self.model, after, limit)
+        return to_page((await db_session.scalars(stmt)).all(), limit)
+
+    async def get_post_version(
+        self, db_session: AsyncSession, post_id: UUID
+    ) -> Optional[PostVersionRow]:
+        result = await db_session.execute(
+            post_versions().where(self.model.id == post_id)
+        )
+        return result.first()
+
+    async def get_posts_page_versions(
+        self,
+        db_session: AsyncSession,
+        *,
+        after: Optional[KeysetKey] = None,
+        limit: int = 100,
+    ) -> Page[PostVersionRow]:
+        stmt = keyset_paginate(post_versions(), self.model, after, limit)
+        return to_page((await db_session.execute(stmt)).all(), limit)
+
+    async def get_posts_page_fields(
+        self,
+        db_session: AsyncSession,
+        fields: Sequence[str],
+        *,
+        after: Optional[KeysetKey] = None,
+        limit: int = 100,
+    ) -> Page[FieldsRow]:
+        columns = [field for field in fields if field != "user"]
+        stmt = with_columns(post_versions(), self.model, columns)
+        stmt = keyset_paginate(stmt, self.model, after, limit)
+        return to_page((await db_session.execute(stmt)).all(), limit)
+
+    async def get_users_of_posts(
+        self, db_session: AsyncSession, post_ids: Sequence[UUID]
+    ) -> Dict[UUID, FieldsRow]:
+        result = await db_session.execute(users_of_posts(post_ids))
+        return first_user_by_post(result)
+
+    async def stream_posts(
+        self, db_session: AsyncSession, *, batch_size: int = 1000
+    ) -> AsyncIterator[Sequence[PostsORM]]:
+        result = await db_session.stream_scalars(streamed_posts_with_users(batch_size))
+        async for partition in result.partitions():
+            yield partition
+
+    async def create_post(
+        self, db_session: AsyncSession, obj_in: CreatePostRequest
+    ) -> PostsORM:
+        db_post = new_post(obj_in, await db_session.get(UsersORM, obj_in.user_id))
+        db_session.add(db_post)
+        await db_session.commit()
+        return db_post
+
+    async def get_post_by_id(self, db_session: AsyncSession, post_id: UUID) -> PostsORM:
+        result = await db_session.execute(
+            select(self.model)
+            .filter_by(id=post_id)
+            .join(self.model.users)
+            .options(joinedload(self.model.users))
+        )
+        db_post = result.unique().scalars().first()
         if not db_post:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Post not found"
             )
+        return db_post
 
-        db_session.delete(db_post)
-        db_session.commit()
+    async def update_post(
+        self, db_session: AsyncSession, post_id: UUID, obj_in: UpdatePostRequest
+    ) -> Post:
+        dialect_name = db_session.get_bind().dialect.name
+        result = await db_session.execute(updated_post(dialect_name, post_id, obj_in))
+        row = result.first()
+        if row is None:
+            exists = await db_session.execute(post_with_user_exists(post_id))
+            raise post_update_error(exists.scalar_one())
+
+        user, prefix = row, "user_"
+        if dialect_name not in RETURNING_JOINS:
+            users = await db_session.execute(first_user(post_id))
+            user, prefix = users.one(), ""
+        await db_session.commit()
+
+        invalidate(post_key(post_id))
+        return post_payload(row, user, prefix)
+
+    async def delete_post(
+        self, db_session: AsyncSession, post_id: UUID
+    ) -> DeletePostResponse:
+        await db_session.execute(unlinked_post(post_id))
+        deleted = (await db_session.execute(deleted_post(post_id))).first()
+        if deleted is None:
+            raise post_not_found()
+
+        await db_session.commit()
+        invalidate(post_key(deleted.id))
         return DeletePostResponse(
             status="Post deleted successfully", code=status.HTTP_204_NO_CONTENT
         )
 
 
 posts_manager = PostsManager(PostsORM)
+async_posts_manager = AsyncPostsManager(PostsORM)
@@ -1,44 +1,389 @@
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Literal, Optional, Sequence, Tuple, Type, Union
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy import Delete, Row, Select, delete, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import ReturningDelete, ReturningInsert
+from typing_extensions import TypedDict
 
-from users_api.managers.base import BaseManager
+from users_api.cache.keys import user_key
+from users_api.cache.singleflight import async_flights, flights
+from users_api.cache.store import fill, generation, get_cache, invalidate
+from users_api.db.compilers.dates import utcnow  # type: ignore
+from users_api.db.session import on_replica
+from users_api.managers.base import AsyncBaseManager, BaseManager, chunked, flight_key
 from users_api.models.orm.users import UsersORM
+from users_api.models.orm.users_and_posts import users_and_posts
+from users_api.models.users import User
+
+from users_api.schemas.users import BulkUserResult, CreateUsersRequest
+
+
+class UserRow(TypedDict):
+    id: UUID
+    email: Optional[str]
+    sms: Optional[str]
+
+
+# (id, email, sms) of existing_users(). Typed as the String columns are,
+# email and sms may still be None.
+ExistingUser = Tuple[UUID, str, str]
+
+UpsertInsert = Union[postgresql.Insert, sqlite.Insert]
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE ... RETURNING
+UPSERT_INSERTS: Dict[str, Callable[[Type[UsersORM]], UpsertInsert]] = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+UpsertTarget = Optional[Literal["email", "sms"]]
+
+
+def upsert_targets(obj_in: CreateUsersRequest) -> List[UpsertTarget]:
+    """
+    The columns create_or_update matches a user on, in the order it tries
+    them: email, then sms. A user with neither can't conflict and is inserted.
+    """
+    targets: List[UpsertTarget] = []
+    if obj_in.email is not None:
+        targets.append("email")
+    if obj_in.sms is not None:
+        targets.append("sms")
+    return targets or [None]
+
+
+def upsert_user(
+    dialect_name: str, obj_in: CreateUsersRequest, conflict_on: UpsertTarget
+) -> ReturningInsert[Tuple[UsersORM]]:
+    """
+    create_or_update as a single statement, updating the user that holds
+    `conflict_on`, or inserting when it's None. Taking over an email/sms that
+    another user holds raises IntegrityError.
+    """
+    if dialect_name not in UPSERT_INSERTS:
+        raise ValueError(f"No upsert configured for {dialect_name}")
+
+    stmt = UPSERT_INSERTS[dialect_name](UsersORM).values(
+        email=obj_in.email, sms=obj_in.sms
+    )
+
+    if conflict_on is not None:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[conflict_on],
+            set_={
+                "email": stmt.excluded.email,
+                "sms": stmt.excluded.sms,
+                # onupdate defaults don't apply to ON CONFLICT DO UPDATE
+                "last_updated": utcnow(),
+            },
+        )
+
+    # populate_existing so a user already in the Session picks up the update
+    return stmt.returning(UsersORM).execution_options(populate_existing=True)
+
+
+def user_conflict() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="email or sms already belongs to another user",
+    )
+
+
+@dataclass
+class BulkUpsertPlan:
+    # Column dicts for ORM bulk INSERT / bulk UPDATE by primary key
+    inserts: List[UserRow] = field(default_factory=list)
+    updates: List[UserRow] = field(default_factory=list)
+    results: List[BulkUserResult] = field(default_factory=list)
+
+
+def existing_users(items: Sequence[CreateUsersRequest]) -> Select[ExistingUser]:
+    """Every user any of `items` could match, in one query"""
+    emails = {item.email for item in items if item.email is not None}
+    smses = {item.sms for item in items if item.sms is not None}
+    return select(UsersORM.id, UsersORM.email, UsersORM.sms).where(
+        or_(UsersORM.email.in_(emails), UsersORM.sms.in_(smses))
+    )
+
+
+def plan_bulk_upsert(
+    items: Sequence[CreateUsersRequest], existing: Sequence[Row[ExistingUser]]
+) -> BulkUpsertPlan:
+    """
+    Resolves each item the way create_or_update does, match on email and
+    then on sms, against the `existing` rows and the items before it. Later
+    items win when several resolve to the same user. Items with neither an
+    email nor an sms can't be matched and are reported as invalid, items that
+    would take another user's email or sms are reported as conflicts.
+    """
+    by_email: Dict[str, UserRow] = {}
+    by_sms: Dict[str, UserRow] = {}
+
+    def index(row: UserRow) -> None:
+        if row["email"] is not None:
+            by_email.setdefault(row["email"], row)
+        if row["sms"] is not None:
+            by_sms.setdefault(row["sms"], row)
+
+    def unindex(row: UserRow) -> None:
+        if row["email"] is not None and by_email.get(row["email"]) is row:
+            del by_email[row["email"]]
+        if row["sms"] is not None and by_sms.get(row["sms"]) is row:
+            del by_sms[row["sms"]]
+
+    for existing_row in existing:
+        mapping = existing_row._mapping
+        index({"id": mapping["id"], "email": mapping["email"], "sms": mapping["sms"]})
+
+    plan = BulkUpsertPlan()
+    created: Dict[uuid.UUID, UserRow] = {}
+    updated: Dict[uuid.UUID, UserRow] = {}
+
+    for position, item in enumerate(items):
+        if item.email is None and item.sms is None:
+            plan.results.append(
+                BulkUserResult(
+                    index=position,
+                    status="invalid",
+                    message="One of email or sms is required",
+                )
+            )
+            continue
+
+        row: Optional[UserRow] = None
+        if item.email is not None:
+            row = by_email.get(item.email)
+        if row is None and item.sms is not None:
+            row = by_sms.get(item.sms)
+
+        holders = (by_email.get(item.email), by_sms.get(item.sms))  # type: ignore
+        if any(holder is not None and holder is not row for holder in holders):
+            plan.results.append(
+                BulkUserResult(
+                    index=position,
+                    status="conflict",
+                    message="email or sms already belongs to another user",
+                )
+            )
+            continue
+
+        status: Literal["created", "updated"]
+        if row is None:
+            row = {"id": uuid.uuid4(), "email": None, "sms": None}
+            created[row["id"]] = row
+            status = "created"
+        else:
+            if row["id"] not in created:
+                updated[row["id"]] = row
+            status = "updated"
 
-from users_api.schemas.users import CreateUsersRequest
+        unindex(row)
+        row["email"], row["sms"] = item.email, item.sms
+        index(row)
+
+        plan.results.append(BulkUserResult(index=position, id=row["id"], status=status))
+
+    plan.inserts = list(created.values())
+    plan.updates = list(updated.values())
+    return plan
+
+
+def updated_user_keys(results: Sequence[BulkUserResult]) -> List[str]:
+    return [user_key(result.id) for result in results if result.status == "updated"]  # type: ignore
+
+
+def user_not_found() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+
+def unlinked_user(id: UUID) -> Delete:
+    """Deletes the user's post links, which reference it"""
+    # pylint: disable=redefined-builtin
+    return delete(users_and_posts).where(users_and_posts.c.user_id == id)
+
+
+def deleted_user(id: UUID) -> ReturningDelete[Tuple[UUID]]:
+    # pylint: disable=redefined-builtin
+    return (
+        delete(UsersORM)
+        .where(UsersORM.id == id)
+        .returning(UsersORM.id)
+        .execution_options(synchronize_session=False)
+    )
 
 
 class UsersManager(BaseManager[UsersORM]):
 
+    # pylint: disable=redefined-builtin
+    def cached_user(self, id: UUID) -> Optional[User]:
+        """Cache lookup only, never touches the database"""
+        user = get_cache().get(user_key(id))
+        return user if isinstance(user, User) else None
+
+    def load_user(self, db_session: Session, id: UUID) -> Optional[User]:
+        """
+        Reads the user from the database and caches it, unless it was read
+        off a replica. Concurrent loads of one user share a single query, see
+        users_api.cache.singleflight.
+        """
+        return flights.do(
+            flight_key(user_key(id), db_session),
+            lambda: self.read_user(db_session, id),
+        )
+
+    def read_user(self, db_session: Session, id: UUID) -> Optional[User]:
+        since = generation()
+        db_obj = self.get(db_session, id=id)
+        if db_obj is None:
+            return None
+        user = User.model_validate(db_obj)
+        if not on_replica(db_session):
+            fill(user_key(id), user, since)
+        return user
+
+    def get_user(self, db_session: Session, id: UUID) -> Optional[User]:
+        return self.cached_user(id) or self.load_user(db_session, id)
+
+    def delete_user(self, db_session: Session, id: UUID) -> None:
+        db_session.execute(unlinked_user(id))
+        if db_session.execute(deleted_user(id)).first() is None:
+            raise user_not_found()
+
+        db_session.commit()
+        invalidate(user_key(id))
+
     def create_or_update(
         self, db_session: Session, obj_in: CreateUsersRequest
     ) -> UsersORM:
+        """
+        Upserts on email and, when that only collides with the user holding
+        the sms, again on sms, so a new email with a known sms updates that
+        user. Each attempt is a single statement.
+        """
+        dialect_name = db_session.get_bind().dialect.name
+        targets = upsert_targets(obj_in)
+        for attempt, conflict_on in enumerate(targets, start=1):
+            try:
+                db_obj = db_session.scalars(
+                    upsert_user(dialect_name, obj_in, conflict_on)
+                ).one()
+                db_session.commit()
+                break
+            except IntegrityError as e:
+                db_session.rollback()
+                if attempt == len(targets):
+                    raise user_conflict() from e
 
-        db_obj = (
-            db_session.query(self.model)
-            .filter_by(email=obj_in.email)
-            .first()  # type: ignore
+        invalidate(user_key(db_obj.id))
+        return db_obj
+
+    def bulk_create_or_update(
+        self,
+        db_session: Session,
+        items: Sequence[CreateUsersRequest],
+        *,
+        batch_size: int = 1000,
+    ) -> List[BulkUserResult]:
+        """
+        create_or_update for many users in one transaction: one lookup query,
+        then multi-row INSERTs and executemany UPDATEs of `batch_size` rows.
+        """
+        plan = plan_bulk_upsert(items, db_session.execute(existing_users(items)).all())
+
+        # render_nulls keeps rows with and without an email/sms in the same
+        # multi-row INSERT instead of grouping them by which keys are set
+        stmt = insert(self.model).execution_options(render_nulls=True)
+        for batch in chunked(plan.inserts, batch_size):
+            db_session.execute(stmt, batch)
+        for batch in chunked(plan.updates, batch_size):
+            db_session.execute(update(self.model), batch)
+
+        db_session.commit()
+        invalidate(*updated_user_keys(plan.results))
+        return plan.results
+
+
+class AsyncUsersManager(AsyncBaseManager[UsersORM]):
+
+    # pylint: disable=redefined-builtin
+    def cached_user(self, id: UUID) -> Optional[User]:
+        user = get_cache().get(user_key(id))
+        return user if isinstance(user, User) else None
+
+    async def load_user(self, db_session: AsyncSession, id: UUID) -> Optional[User]:
+        return await async_flights.do(
+            flight_key(user_key(id), db_session),
+            lambda: self.read_user(db_session, id),
         )
 
-        if not db_obj:
-            db_obj = (
-                db_session.query(self.model)
-                .filter_by(sms=obj_in.sms)
-                .first()  # type: ignore
-            )
+    async def read_user(self, db_session: AsyncSession, id: UUID) -> Optional[User]:
+        since = generation()
+        db_obj = await self.get(db_session, id=id)
+        if db_obj is None:
+            return None
+        user = User.model_validate(db_obj)
+        if not on_replica(db_session):
+            fill(user_key(id), user, since)
+        return user
 
-        if db_obj:
-            db_obj.email = obj_in.email  # type: ignore
-            db_obj.sms = obj_in.sms  # type: ignore
+    async def get_user(self, db_session: AsyncSession, id: UUID) -> Optional[User]:
+        return self.cached_user(id) or await self.load_user(db_session, id)
 
-        else:
-            db_obj = self.model(
-                email=obj_in.email,
-                sms=obj_in.sms,
-            )
+    async def delete_user(self, db_session: AsyncSession, id: UUID) -> None:
+        await db_session.execute(unlinked_user(id))
+        if (await db_session.execute(deleted_user(id))).first() is None:
+            raise user_not_found()
 
-        db_session.add(db_obj)
-        db_session.commit()
+        await db_session.commit()
+        invalidate(user_key(id))
 
+    async def create_or_update(
+        self, db_session: AsyncSession, obj_in: CreateUsersRequest
+    ) -> UsersORM:
+        dialect_name = db_session.get_bind().dialect.name
+        targets = upsert_targets(obj_in)
+        for attempt, conflict_on in enumerate(targets, start=1):
+            try:
+                stmt = upsert_user(dialect_name, obj_in, conflict_on)
+                db_obj = (await db_session.scalars(stmt)).one()
+                await db_session.commit()
+                break
+            except IntegrityError as e:
+                await db_session.rollback()
+                if attempt == len(targets):
+                    raise user_conflict() from e
+
+        invalidate(user_key(db_obj.id))
         return db_obj
 
+    async def bulk_create_or_update(
+        self,
+        db_session: AsyncSession,
+        items: Sequence[CreateUsersRequest],
+        *,
+        batch_size: int = 1000,
+    ) -> List[BulkUserResult]:
+        existing = (await db_session.execute(existing_users(items))).all()
+        plan = plan_bulk_upsert(items, existing)
+
+        stmt = insert(self.model).execution_options(render_nulls=True)
+        for batch in chunked(plan.inserts, batch_size):
+            await db_session.execute(stmt, batch)
+        for batch in chunked(plan.updates, batch_size):
+            await db_session.execute(update(self.model), batch)
+
+        await db_session.commit()
+        invalidate(*updated_user_keys(plan.results))
+        return plan.results
+
 
 users_manager = UsersManager(UsersORM)
+async_users_manager = AsyncUsersManager(UsersORM)
@@ -0,0 +1,142 @@
+import bisect
+import threading
+from collections import Counter
+from typing import Dict, List, Mapping, Sequence, Tuple, Union
+
+from starlette.types import Scope
+from typing_extensions import TypedDict
+
+# Seconds, Prometheus' default buckets
+REQUEST_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def route_template(scope: Scope) -> str:
+    """
+    Path template of the route an ASGI scope was routed to, ex.
+    /users/{user_id}, "unmatched" before routing or when nothing matched
+    """
+    return getattr(scope.get("route"), "path", "unmatched")
+
+
+class BucketSnapshot(TypedDict):
+    le: Union[float, str]
+    count: int
+
+
+class HistogramSnapshot(TypedDict):
+    count: int
+    sum: float
+    buckets: List[BucketSnapshot]
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. Buckets are upper bounds, values above the last
+    bucket land in an implicit +Inf bucket.
+    """
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> HistogramSnapshot:
+        """Cumulative bucket counts, Prometheus style"""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = 0
+        buckets: List[BucketSnapshot] = []
+        upper_bounds: List[Union[float, str]] = [*self.buckets, "+Inf"]
+        for upper_bound, count in zip(upper_bounds, counts):
+            cumulative += count
+            buckets.append({"le": upper_bound, "count": cumulative})
+        return {"count": cumulative, "sum": total, "buckets": buckets}
+
+
+class RequestMetrics:
+    """
+    Latency histograms and response counts per (method, route template), and
+    the number of requests in flight.
+
+    Recorded by RequestMetricsMiddleware, which runs on the worker's event
+    loop thread, so the counters are plain ints. The only lock taken is the
+    histogram's own, uncontended one, plus this one the first time a route
+    is seen.
+    """
+
+    def __init__(self, buckets: Sequence[float] = REQUEST_DURATION_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.in_flight = 0
+        self._durations: Dict[Tuple[str, str], Histogram] = {}
+        self._responses: "Counter[Tuple[str, str, int]]" = Counter()
+        self._lock = threading.Lock()
+
+    def observe(self, method: str, route: str, status: int, seconds: float) -> None:
+        histogram = self._durations.get((method, route))
+        if histogram is None:
+            with self._lock:
+                histogram = self._durations.setdefault(
+                    (method, route), Histogram(self.buckets)
+                )
+        histogram.observe(seconds)
+        self._responses[(method, route, status)] += 1
+
+    def durations(self) -> Dict[Tuple[str, str], Histogram]:
+        with self._lock:
+            return dict(self._durations)
+
+    def responses(self) -> Dict[Tuple[str, str, int], int]:
+        return dict(self._responses)
+
+
+request_metrics = RequestMetrics()
+
+
+def _label_value(value: object) -> str:
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _labels(labels: Mapping[str, object]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_label_value(value)}"' for name, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+class PrometheusText:
+    """Builds a Prometheus text exposition (format 0.0.4)"""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self) -> None:
+        self._lines: List[str] = []
+
+    def metric(self, name: str, kind: str, description: str) -> None:
+        """Starts a metric family, its samples must follow"""
+        self._lines.append(f"# HELP {name} {description}")
+        self._lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name: str, value: float, **labels: object) -> None:
+        self._lines.append(f"{name}{_labels(labels)} {value}")
+
+    def histogram(
+        self, name: str, snapshot: HistogramSnapshot, **labels: object
+    ) -> None:
+        """Samples of a Histogram.snapshot()"""
+        for bucket in snapshot["buckets"]:
+            self.sample(f"{name}_bucket", bucket["count"], **labels, le=bucket["le"])
+        self.sample(f"{name}_sum", snapshot["sum"], **labels)
+        self.sample(f"{name}_count", snapshot["count"], **labels)
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
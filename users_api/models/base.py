@@ -135,9 +135,14 @@ class UsersSQLAlchemyMixin(
 class Base(db.DeclarativeBase, UsersSQLAlchemyMixin):
     # pylint: disable=E1101,E0213,R0201
     __abstract__ = True
+    # Server defaults (created_at, last_updated) come back through the
+    # INSERT's / UPDATE's RETURNING instead of a refresh after the flush
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(GUID, primary_key=True, default=uuid.uuid4)
-    created_at = Column(TZDateTime, server_default=utcnow(), nullable=True)
+    # Keyset pagination orders by (created_at, id), a NULL would drop the row
+    # out of every page
+    created_at = Column(TZDateTime, server_default=utcnow(), nullable=False)
     last_updated = Column(
         TZDateTime, server_default=utcnow(), onupdate=utcnow(), nullable=True
     )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String
+from sqlalchemy import Column, Index, String
 from sqlalchemy.orm import relationship
 
 from users_api.models.base import Base  # type: ignore
@@ -7,6 +7,11 @@ from users_api.models.orm.users_and_posts import users_and_posts
 
 class PostsORM(Base):
     __tablename__ = "posts"
+    __table_args__ = (
+        # Keyset pagination order, see managers.base.keyset_paginate
+        Index("ix_posts_created_at_id", "created_at", "id"),
+        Index("ix_posts_last_updated_id", "last_updated", "id"),
+    )
 
     title = Column(String, nullable=True)
     description = Column(String, nullable=True)
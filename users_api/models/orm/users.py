@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String
+from sqlalchemy import Column, Index, String
 from sqlalchemy.orm import relationship
 
 from users_api.models.base import Base  # type: ignore
@@ -7,6 +7,14 @@ from users_api.models.orm.users_and_posts import users_and_posts
 
 class UsersORM(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Keyset pagination order, see managers.base.keyset_paginate
+        Index("ix_users_created_at_id", "created_at", "id"),
+        Index("ix_users_last_updated_id", "last_updated", "id"),
+        # Conflict targets of the create_or_update upsert
+        Index("ix_users_email", "email", unique=True),
+        Index("ix_users_sms", "sms", unique=True),
+    )
 
     username = Column(String, nullable=True)
     name = Column(String, nullable=True)
@@ -1,7 +1,7 @@
 # from uuid import UUID
 from sqlalchemy.dialects.postgresql import UUID
 
-from sqlalchemy import Table, Column, ForeignKey
+from sqlalchemy import Table, Column, ForeignKey, Index
 from users_api.models.base import Base
 
 users_and_posts = Table(
@@ -9,4 +9,6 @@ users_and_posts = Table(
     Base.metadata,
     Column("user_id", UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True),
     Column("post_id", UUID(as_uuid=True), ForeignKey("posts.id"), primary_key=True),
+    # The primary key covers user_id -> post_id, this covers post_id -> user_id
+    Index("ix_users_and_posts_post_id_user_id", "post_id", "user_id"),
 )
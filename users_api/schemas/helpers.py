@@ -1,9 +1,140 @@
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+from uuid import UUID
+
+from pydantic import TypeAdapter
+
+from users_api.managers.base import FieldsRow
 from users_api.models.orm.posts import PostsORM
+from users_api.models.orm.users import UsersORM
 from users_api.models.posts import Post
 from users_api.models.users import User
+from users_api.schemas.posts import PostsResponse
+from users_api.schemas.users import BulkUserResult, BulkUsersResponse, UsersResponse
+
+USER_FIELDS = tuple(User.model_fields)
+POST_FIELDS = tuple(name for name in Post.model_fields if name != "user")
+
+# Validate a whole list in one call, rather than one model_validate per row
+USERS_ADAPTER: TypeAdapter[List[User]] = TypeAdapter(List[User])
+POSTS_ADAPTER: TypeAdapter[List[Post]] = TypeAdapter(List[Post])
+
+# A payload or page as the plain dict RowsResponse renders
+Payload = Dict[str, object]
+
+
+def user_row(user: UsersORM) -> Payload:
+    """
+    The User payload of a row as a plain dict, without validating it. Only
+    for rows just read from the database, whose column types already match.
+    """
+    return {name: getattr(user, name) for name in USER_FIELDS}
+
+
+def embedded_user(post: PostsORM) -> UsersORM:
+    """
+    The user a post's payload embeds: its most recently updated one, id
+    breaking ties, so its last_updated is the latest of all the post's users
+    like post_versions() computes. Same order as users_of_posts().
+    """
+    users: List[UsersORM] = post.users
+    updated = [user for user in users if user.last_updated is not None]
+    if not updated:
+        return max(users, key=lambda user: user.id)
+    return max(updated, key=lambda user: (user.last_updated, user.id))
+
+
+def post_row(post: PostsORM) -> Payload:
+    """user_row() for a Post, embedding its user (see embedded_user)"""
+    row = {name: getattr(post, name) for name in POST_FIELDS}
+    row["user"] = user_row(embedded_user(post))
+    return row
 
 
 def post_response(post: PostsORM) -> Post:
-    return Post.model_validate(
-        {**post.__dict__, "user": User.model_validate(post.users[0])}
+    return Post.model_validate(post_row(post))
+
+
+def users_payload(users: Sequence[UsersORM]) -> List[User]:
+    return USERS_ADAPTER.validate_python(users, from_attributes=True)
+
+
+def posts_payload(posts: Sequence[PostsORM]) -> List[Post]:
+    return POSTS_ADAPTER.validate_python([post_row(post) for post in posts])
+
+
+def users_page(users: Sequence[UsersORM], next_cursor: Optional[str]) -> Payload:
+    """UsersResponse content of a page of rows, see user_row"""
+    return {
+        **UsersResponse().model_dump(),
+        "users": [user_row(user) for user in users],
+        "next_cursor": next_cursor,
+    }
+
+
+def posts_page(posts: Sequence[PostsORM], next_cursor: Optional[str]) -> Payload:
+    """PostsResponse content of a page of rows, see post_row"""
+    return {
+        **PostsResponse().model_dump(),
+        "posts": [post_row(post) for post in posts],
+        "next_cursor": next_cursor,
+    }
+
+
+def partial_row(row: object, fields: Sequence[str], prefix: str = "") -> Payload:
+    """`fields` of a row, read from its columns labelled `prefix` + field"""
+    return {field: getattr(row, prefix + field) for field in fields}
+
+
+def post_payload(post: FieldsRow, user: FieldsRow, user_prefix: str = "") -> Post:
+    """post_response() of a row of POST_FIELDS and a row of its user's fields"""
+    payload = partial_row(post, POST_FIELDS)
+    payload["user"] = partial_row(user, USER_FIELDS, user_prefix)
+    return Post.model_validate(payload)
+
+
+def partial_users_page(
+    rows: Sequence[FieldsRow], fields: Sequence[str], next_cursor: Optional[str]
+) -> Payload:
+    """users_page() of get_page_fields() rows, with only `fields`"""
+    return {
+        **UsersResponse().model_dump(),
+        "users": [partial_row(row, fields) for row in rows],
+        "next_cursor": next_cursor,
+    }
+
+
+def partial_posts_page(
+    rows: Sequence[FieldsRow],
+    fields: Sequence[str],
+    users: Dict[UUID, FieldsRow],
+    next_cursor: Optional[str],
+) -> Payload:
+    """
+    posts_page() of get_posts_page_fields() rows, with only `fields`.
+    `users` maps the post ids to their user when `user` is requested.
+    """
+    post_fields = [field for field in fields if field != "user"]
+
+    def partial_post(row: FieldsRow) -> Payload:
+        post = partial_row(row, post_fields)
+        if "user" in fields:
+            post["user"] = partial_row(users[row.id], USER_FIELDS)
+        return post
+
+    return {
+        **PostsResponse().model_dump(),
+        "posts": [partial_post(row) for row in rows],
+        "next_cursor": next_cursor,
+    }
+
+
+def bulk_users_response(results: List[BulkUserResult]) -> BulkUsersResponse:
+    counts = Counter(result.status for result in results)
+    return BulkUsersResponse(
+        results=results,
+        created=counts["created"],
+        updated=counts["updated"],
+        invalid=counts["invalid"],
+        conflict=counts["conflict"],
     )
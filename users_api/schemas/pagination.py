@@ -0,0 +1,24 @@
+import base64
+import datetime
+import json
+from typing import Tuple
+from uuid import UUID
+
+# (created_at, id) of the last row on a page. Rows are ordered by this pair,
+# `id` breaking ties between rows created in the same transaction.
+KeysetKey = Tuple[datetime.datetime, UUID]
+
+
+def encode_cursor(key: KeysetKey) -> str:
+    created_at, id_ = key
+    payload = [created_at.isoformat(), str(id_)]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> KeysetKey:
+    """Raises ValueError for anything that isn't a cursor we handed out"""
+    try:
+        created_at, id_ = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.datetime.fromisoformat(created_at), UUID(id_)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
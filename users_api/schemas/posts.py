@@ -11,6 +11,8 @@ class PostsRequest(BaseModel):
 class PostsResponse(BaseModel):
     posts: Optional[List[Post]] = None
     message: Optional[str] = None
+    # Pass back as `cursor` to fetch the next page, None on the last page
+    next_cursor: Optional[str] = None
 
 
 class CreatePostRequest(BaseModel):
@@ -1,6 +1,8 @@
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import List, Literal, Optional
+from uuid import UUID
+from pydantic import BaseModel, Field
 
+from users_api import settings
 from users_api.models.users import User
 
 
@@ -11,6 +13,8 @@ class UsersRequest(BaseModel):
 class UsersResponse(BaseModel):
     users: Optional[List[User]] = None
     message: Optional[str] = None
+    # Pass back as `cursor` to fetch the next page, None on the last page
+    next_cursor: Optional[str] = None
 
 
 class CreateUsersRequest(BaseModel):
@@ -18,5 +22,25 @@ class CreateUsersRequest(BaseModel):
     sms: Optional[str]
 
 
+class BulkCreateUsersRequest(BaseModel):
+    users: List[CreateUsersRequest] = Field(max_length=settings.BULK_MAX_ITEMS)
+
+
+class BulkUserResult(BaseModel):
+    # Position of the item in BulkCreateUsersRequest.users
+    index: int
+    id: Optional[UUID] = None
+    status: Literal["created", "updated", "invalid", "conflict"]
+    message: Optional[str] = None
+
+
+class BulkUsersResponse(BaseModel):
+    results: List[BulkUserResult]
+    created: int
+    updated: int
+    invalid: int
+    conflict: int
+
+
 class DeleteUserResponse(BaseModel):
     status: str
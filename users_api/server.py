@@ -0,0 +1,118 @@
+"""
+Production entry point: uvicorn with one worker process per available CPU.
+
+    python -m users_api.server --port 3000
+
+Every worker has its own engines, so each one's pool multiplies by the
+number of workers. When DB_CONNECTION_BUDGET is set it's divided between
+the workers, and between the sync and async engine of each database in
+async mode: every worker gets the same DB_POOL_SIZE and DB_MAX_OVERFLOW,
+in the configured ratio, and all of them together never exceed the budget.
+The sizes reach the workers through the environment, uvicorn spawns them
+as fresh interpreters that read their settings at import.
+"""
+
+import argparse
+import logging
+import math
+import os
+from typing import Optional, Sequence, Tuple
+
+import uvicorn
+
+from users_api import settings
+from users_api.logger import configure_logging
+
+logger = logging.getLogger(__name__)
+
+CGROUP_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+
+
+def available_cpus(cpu_max_path: str = CGROUP_CPU_MAX) -> int:
+    """
+    CPUs this process may run on, less when a cgroup (v2) CPU quota, as set
+    by `docker run --cpus`, allows fewer
+    """
+    cpus = len(os.sched_getaffinity(0))
+    try:
+        with open(cpu_max_path, encoding="utf-8") as cpu_max:
+            quota, period = cpu_max.read().split()
+    except (OSError, ValueError):
+        return cpus
+    if quota == "max":
+        return cpus
+    return max(1, min(cpus, math.ceil(int(quota) / int(period))))
+
+
+def worker_count() -> int:
+    return settings.WEB_CONCURRENCY or available_cpus()
+
+
+def engines_per_database() -> int:
+    """Async mode keeps a sync engine next to the async one"""
+    return 2 if settings.IS_ASYNC_DATABASE else 1
+
+
+def pool_sizes(
+    budget: int, workers: int, engines: int, pool_size: int, max_overflow: int
+) -> Tuple[int, int]:
+    """
+    (pool_size, max_overflow) of each of `engines` engines in each of
+    `workers` workers so they don't open more than `budget` connections, in
+    the ratio of the `pool_size`/`max_overflow` they replace
+    """
+    per_engine = budget // (workers * engines)
+    if per_engine < 1:
+        raise ValueError(
+            f"A DB_CONNECTION_BUDGET of {budget} can't give {workers} workers "
+            f"{engines} engine(s) each a connection"
+        )
+    sized = max(1, per_engine * pool_size // (pool_size + max_overflow))
+    return sized, per_engine - sized
+
+
+def apply_connection_budget(workers: int) -> None:
+    """
+    Sizes this process's and its workers' pools from DB_CONNECTION_BUDGET,
+    leaves them alone without one
+    """
+    if not settings.DB_CONNECTION_BUDGET:
+        return
+    pool_size, max_overflow = pool_sizes(
+        settings.DB_CONNECTION_BUDGET,
+        workers,
+        engines_per_database(),
+        settings.DB_POOL_SIZE,
+        settings.DB_MAX_OVERFLOW,
+    )
+    # A single worker runs in this process, which has already read settings
+    settings.DB_POOL_SIZE = pool_size
+    settings.DB_MAX_OVERFLOW = max_overflow
+    os.environ["DB_POOL_SIZE"] = str(pool_size)
+    os.environ["DB_MAX_OVERFLOW"] = str(max_overflow)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument(
+        "--workers", type=int, help="default: WEB_CONCURRENCY or one per CPU"
+    )
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    workers = args.workers or worker_count()
+    apply_connection_budget(workers)
+    logger.info("Starting %d workers", workers)
+    uvicorn.run(
+        "users_api.app:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        log_config=None,  # The app configures logging, see users_api.logger
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -8,3 +8,106 @@ IS_TEST = ENV == "local"
 
 DATABASE_URL = os.environ.get("DATABASE_URL")
 TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+# "sync" runs the managers on a blocking Session, "async" on an AsyncSession
+# backed by asyncpg (or aiosqlite locally).
+DATABASE_MODE = os.environ.get("DATABASE_MODE", "sync")
+IS_ASYNC_DATABASE = DATABASE_MODE == "async"
+
+# Connection pool sizing, applied to every engine (primary and replicas) in
+# every worker process. Blocking DB work called from async handlers runs on a
+# thread pool of DB_POOL_SIZE + DB_MAX_OVERFLOW threads.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 32))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 64))
+# Seconds to wait for a pooled connection before raising
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+# Seconds after which a connection is replaced on checkout, -1 to never recycle
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", -1))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+# Server processes started by `python -m users_api.server`, 0 for one per
+# available CPU. DB_CONNECTION_BUDGET, when set, caps the connections all of
+# them together open to each database server: the server splits it across the
+# workers' pools, in place of DB_POOL_SIZE/DB_MAX_OVERFLOW but in their ratio.
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", 0))
+DB_CONNECTION_BUDGET = int(os.environ.get("DB_CONNECTION_BUDGET", 0))
+# Rows per multi-row INSERT ... VALUES statement when a flush inserts many rows
+# of a table (insertmanyvalues), RETURNING included
+DB_INSERTMANYVALUES_PAGE_SIZE = int(
+    os.environ.get("DB_INSERTMANYVALUES_PAGE_SIZE", 1000)
+)
+
+# Comma separated read replica urls. GET routes read from these round-robin,
+# except for clients that wrote within READ_YOUR_WRITES_WINDOW_SECONDS, who
+# stay on the primary so they don't read back stale data.
+DATABASE_REPLICA_URLS = [
+    url for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if url
+]
+READ_YOUR_WRITES_WINDOW_SECONDS = float(
+    os.environ.get("READ_YOUR_WRITES_WINDOW_SECONDS", 5)
+)
+
+# Page sizes for the cursor paginated list endpoints. Requests asking for more
+# than MAX_PAGE_SIZE rows are rejected.
+DEFAULT_PAGE_SIZE = int(os.environ.get("DEFAULT_PAGE_SIZE", 100))
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", 500))
+
+# Rows fetched per server-side cursor round trip by the NDJSON export endpoints
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 1000))
+
+# POST /users/bulk: items accepted per request, rows per INSERT/UPDATE statement
+BULK_MAX_ITEMS = int(os.environ.get("BULK_MAX_ITEMS", 10000))
+BULK_BATCH_SIZE = int(os.environ.get("BULK_BATCH_SIZE", 1000))
+
+# Manager read-through cache of User/Post payloads, see users_api.cache.
+# CACHE_MAX_ENTRIES/CACHE_TTL_SECONDS size the in-process tier of each worker.
+# Without CACHE_REDIS_URL its entries can be up to CACHE_TTL_SECONDS stale
+# when written by another worker.
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", 10000))
+CACHE_TTL_SECONDS = float(os.environ.get("CACHE_TTL_SECONDS", 30))
+# Optional shared tier on a Redis-protocol server, workers invalidate each
+# other's in-process tier over CACHE_INVALIDATION_CHANNEL.
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "")
+CACHE_SHARED_TTL_SECONDS = float(os.environ.get("CACHE_SHARED_TTL_SECONDS", 300))
+CACHE_INVALIDATION_CHANNEL = os.environ.get(
+    "CACHE_INVALIDATION_CHANNEL", "users_api:cache:invalidate"
+)
+
+# Root log level. Records are written as JSON lines by a background thread,
+# up to LOG_QUEUE_SIZE of them can wait for it before new ones are dropped.
+# LOG_DEBUG_SAMPLE_RATE of the DEBUG records are kept.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", 0.01))
+
+# Every response reports its statement count and DB time in a Server-Timing
+# header. A statement run QUERY_REPEAT_THRESHOLD times or more within one
+# request is logged as a likely N+1.
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "true").lower() == "true"
+QUERY_REPEAT_THRESHOLD = int(os.environ.get("QUERY_REPEAT_THRESHOLD", 5))
+
+# Statements slower than SLOW_QUERY_THRESHOLD_MS are logged and the last
+# SLOW_QUERY_LOG_SIZE kept for /internal/slow-queries. A
+# SLOW_QUERY_EXPLAIN_SAMPLE_RATE fraction of them (Postgres only) get their
+# plan, with actual rows for SELECTs when SLOW_QUERY_EXPLAIN_ANALYZE is set,
+# at the cost of running them twice.
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", 250))
+SLOW_QUERY_LOG_SIZE = int(os.environ.get("SLOW_QUERY_LOG_SIZE", 100))
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(
+    os.environ.get("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", 0.1)
+)
+SLOW_QUERY_EXPLAIN_ANALYZE = (
+    os.environ.get("SLOW_QUERY_EXPLAIN_ANALYZE", "false").lower() == "true"
+)
+
+# Bearer token for the /internal/* introspection endpoints (pools, caches,
+# slow queries), which answer 404 while it is unset.
+INTERNAL_API_TOKEN = os.environ.get("INTERNAL_API_TOKEN", "")
+
+# Startup warm-up, see users_api.warmup: /health reports ready once every
+# engine has WARMUP_CONNECTIONS (at most DB_POOL_SIZE) connections open and
+# the manager queries compiled.
+WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_CONNECTIONS = int(os.environ.get("WARMUP_CONNECTIONS", 4))
+# Also run the manager writes (on MISSING_ID, rolled back) on the primary.
+# Off by default: they're real UPDATEs and DELETEs against the database.
+WARMUP_WRITES = os.environ.get("WARMUP_WRITES", "false").lower() == "true"
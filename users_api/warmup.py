@@ -0,0 +1,304 @@
+"""
+Startup warm-up.
+
+A fresh worker's first requests would otherwise pay for connecting to the
+database, configuring the ORM mappers, compiling every statement they run
+and building the OpenAPI schema. warm_up() does all of it once the app has
+started, and /health only reports the worker ready when it's done:
+
+- configure_mappers() for UsersORM, PostsORM and users_and_posts
+- app.openapi(), cached on the app from then on
+- WARMUP_CONNECTIONS connections opened on every engine's pool
+- every manager read run once on every engine the routes use, for ids
+  that don't exist and inside a transaction that's rolled back, so its SQL
+  is in the engine's compiled cache.
+
+The writes are only run on the primary with WARMUP_WRITES, they're UPDATEs
+and DELETEs of a missing id, which touch no rows but still take locks and
+reach the WAL. Upserts would insert one, so they're never run.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Mapping, Optional, Sequence, TypeVar
+
+from fastapi import FastAPI, HTTPException
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session, configure_mappers
+from typing_extensions import Protocol
+
+from users_api import settings
+from users_api.db.connection import get_all_async_db_conns, get_all_db_conns
+from users_api.db.executor import run_in_db_executor
+from users_api.managers.posts import async_posts_manager, posts_manager
+from users_api.managers.users import async_users_manager, users_manager
+from users_api.schemas.posts import CreatePostRequest, UpdatePostRequest
+
+logger = logging.getLogger(__name__)
+
+# No row has it, reads come back empty and writes touch nothing
+MISSING_ID = uuid.UUID(int=0)
+
+SessionT = TypeVar("SessionT")
+ResultT = TypeVar("ResultT")
+SessionT_contra = TypeVar("SessionT_contra", contravariant=True)
+ResultT_co = TypeVar("ResultT_co", covariant=True)
+
+# Takes the session, async calls return an awaitable
+WarmUpCall = Callable[[SessionT], ResultT]
+
+
+class UsersCalls(Protocol[SessionT_contra, ResultT_co]):
+    """The UsersManager/AsyncUsersManager methods warmed up"""
+
+    # pylint: disable=redefined-builtin,invalid-name
+    def get(self, db_session: SessionT_contra, id: uuid.UUID) -> ResultT_co: ...
+
+    def get_page(self, db_session: SessionT_contra, *, limit: int) -> ResultT_co: ...
+
+    def get_version(self, db_session: SessionT_contra, id: uuid.UUID) -> ResultT_co: ...
+
+    def get_page_versions(
+        self, db_session: SessionT_contra, *, limit: int
+    ) -> ResultT_co: ...
+
+    def delete_user(self, db_session: SessionT_contra, id: uuid.UUID) -> ResultT_co: ...
+
+
+class PostsCalls(Protocol[SessionT_contra, ResultT_co]):
+    """The PostsManager/AsyncPostsManager methods warmed up"""
+
+    def get_posts_page(
+        self, db_session: SessionT_contra, *, limit: int
+    ) -> ResultT_co: ...
+
+    def get_post_by_id(
+        self, db_session: SessionT_contra, post_id: uuid.UUID
+    ) -> ResultT_co: ...
+
+    def get_post_version(
+        self, db_session: SessionT_contra, post_id: uuid.UUID
+    ) -> ResultT_co: ...
+
+    def get_posts_page_versions(
+        self, db_session: SessionT_contra, *, limit: int
+    ) -> ResultT_co: ...
+
+    def get_users_of_posts(
+        self, db_session: SessionT_contra, post_ids: Sequence[uuid.UUID]
+    ) -> ResultT_co: ...
+
+    def create_post(
+        self, db_session: SessionT_contra, obj_in: CreatePostRequest
+    ) -> ResultT_co: ...
+
+    def update_post(
+        self, db_session: SessionT_contra, post_id: uuid.UUID, obj_in: UpdatePostRequest
+    ) -> ResultT_co: ...
+
+    def delete_post(
+        self, db_session: SessionT_contra, post_id: uuid.UUID
+    ) -> ResultT_co: ...
+
+
+@dataclass
+class WarmUpState:
+    ready: bool = False
+    # Seconds the warm-up took
+    duration: Optional[float] = None
+    # Engines that failed to warm up, with their error
+    failures: Dict[str, str] = field(default_factory=dict)
+
+
+warm_up_state = WarmUpState()
+
+
+def read_calls(
+    users: UsersCalls[SessionT, ResultT], posts: PostsCalls[SessionT, ResultT]
+) -> Dict[str, WarmUpCall[SessionT, ResultT]]:
+    """
+    The manager reads behind the routes, for the sync or async managers.
+    Each takes the session, async ones return a coroutine.
+    """
+    return {
+        "users.get": lambda s: users.get(s, id=MISSING_ID),
+        "users.get_page": lambda s: users.get_page(s, limit=1),
+        "users.get_version": lambda s: users.get_version(s, id=MISSING_ID),
+        "users.get_page_versions": lambda s: users.get_page_versions(s, limit=1),
+        "posts.get_posts_page": lambda s: posts.get_posts_page(s, limit=1),
+        "posts.get_post_by_id": lambda s: posts.get_post_by_id(s, post_id=MISSING_ID),
+        "posts.get_post_version": lambda s: posts.get_post_version(
+            s, post_id=MISSING_ID
+        ),
+        "posts.get_posts_page_versions": lambda s: posts.get_posts_page_versions(
+            s, limit=1
+        ),
+        "posts.get_users_of_posts": lambda s: posts.get_users_of_posts(s, [MISSING_ID]),
+    }
+
+
+def write_calls(
+    users: UsersCalls[SessionT, ResultT], posts: PostsCalls[SessionT, ResultT]
+) -> Dict[str, WarmUpCall[SessionT, ResultT]]:
+    """Writes that fail on MISSING_ID before committing anything"""
+    return {
+        "users.delete_user": lambda s: users.delete_user(s, id=MISSING_ID),
+        "posts.create_post": lambda s: posts.create_post(
+            s,
+            obj_in=CreatePostRequest(
+                title="", description="", content="", user_id=MISSING_ID
+            ),
+        ),
+        "posts.update_post": lambda s: posts.update_post(
+            s,
+            post_id=MISSING_ID,
+            obj_in=UpdatePostRequest(title="", content="", user_id=MISSING_ID),
+        ),
+        "posts.delete_post": lambda s: posts.delete_post(s, post_id=MISSING_ID),
+    }
+
+
+def open_connections(engine: Engine, count: int) -> None:
+    """Fills the pool with `count` connections, handed back right away"""
+    connections = []
+    try:
+        for _ in range(count):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+async def open_async_connections(engine: AsyncEngine, count: int) -> None:
+    connections = []
+    try:
+        for _ in range(count):
+            connections.append(await engine.connect())
+    finally:
+        for connection in connections:
+            await connection.close()
+
+
+def run_calls(engine: Engine, calls: Mapping[str, WarmUpCall[Session, object]]) -> None:
+    with Session(bind=engine, autoflush=False, expire_on_commit=False) as db_session:
+        try:
+            for call in calls.values():
+                try:
+                    call(db_session)
+                except HTTPException:
+                    pass  # The 404/400 of MISSING_ID
+        finally:
+            db_session.rollback()
+
+
+async def run_async_calls(
+    engine: AsyncEngine,
+    calls: Mapping[str, WarmUpCall[AsyncSession, Awaitable[object]]],
+) -> None:
+    async with AsyncSession(
+        bind=engine, autoflush=False, expire_on_commit=False
+    ) as db_session:
+        try:
+            for call in calls.values():
+                try:
+                    await call(db_session)
+                except HTTPException:
+                    pass
+        finally:
+            await db_session.rollback()
+
+
+def warm_up_engine(engine: Engine, *, connections: int, writes: bool) -> None:
+    open_connections(engine, connections)
+    calls: Dict[str, WarmUpCall[Session, object]] = read_calls(
+        users_manager, posts_manager
+    )
+    if writes:
+        calls.update(write_calls(users_manager, posts_manager))
+    run_calls(engine, calls)
+
+
+async def warm_up_async_engine(
+    engine: AsyncEngine, *, connections: int, writes: bool
+) -> None:
+    await open_async_connections(engine, connections)
+    calls: Dict[str, WarmUpCall[AsyncSession, Awaitable[object]]] = read_calls(
+        async_users_manager, async_posts_manager
+    )
+    if writes:
+        calls.update(write_calls(async_users_manager, async_posts_manager))
+    await run_async_calls(engine, calls)
+
+
+async def warm_up(app: FastAPI, state: WarmUpState = warm_up_state) -> None:
+    """
+    Warms up the engines set up in users_api.db.connection, then marks
+    `state` ready. An engine that fails is logged and recorded, the worker
+    still becomes ready: the database being down is no reason to keep it
+    out of rotation once it's back.
+    """
+    started = time.perf_counter()
+    connections = min(settings.WARMUP_CONNECTIONS, settings.DB_POOL_SIZE)
+    writes = settings.WARMUP_WRITES
+    configure_mappers()
+    app.openapi()
+
+    for i, engine in enumerate(get_all_db_conns()):
+        name = "primary" if i == 0 else f"replica_{i - 1}"
+        try:
+            if settings.IS_ASYNC_DATABASE:
+                # The routes run on the async engines, only connect these
+                await run_in_db_executor(open_connections, engine, connections)
+            else:
+                await run_in_db_executor(
+                    warm_up_engine,
+                    engine,
+                    connections=connections,
+                    writes=writes and i == 0,
+                )
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning("Warm-up of the %s engine failed", name, exc_info=True)
+            state.failures[name] = repr(e)
+    for i, async_engine in enumerate(get_all_async_db_conns()):
+        name = "async_primary" if i == 0 else f"async_replica_{i - 1}"
+        try:
+            await warm_up_async_engine(
+                async_engine, connections=connections, writes=writes and i == 0
+            )
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning("Warm-up of the %s engine failed", name, exc_info=True)
+            state.failures[name] = repr(e)
+
+    state.duration = time.perf_counter() - started
+    state.ready = True
+    logger.info("Warmed up in %.0f ms", state.duration * 1000)
+
+
+async def start_warm_up(app: FastAPI, state: WarmUpState = warm_up_state) -> None:
+    """
+    Runs warm_up() in the background, so the worker answers /health (with
+    a 503) meanwhile. Without WARMUP_ENABLED the worker is ready right away.
+    """
+    state.ready = False
+    state.duration = None
+    state.failures.clear()
+    if not settings.WARMUP_ENABLED:
+        state.ready = True
+        return
+    app.state.warm_up = asyncio.create_task(warm_up(app, state))
+
+
+async def stop_warm_up(app: FastAPI) -> None:
+    """Cancels a warm-up still running, before the pools it uses are closed"""
+    task: Optional["asyncio.Task[None]"] = getattr(app.state, "warm_up", None)
+    if task is None or task.done():
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass